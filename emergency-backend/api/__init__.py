@@ -6,6 +6,7 @@ Centraliza todas as rotas HTTP da aplicação
 from flask import Blueprint
 from .routes import create_routes_blueprint
 from .auth import create_auth_blueprint
+from .admissao import registrar_admissao
 
 def create_api_blueprint():
     """
@@ -23,4 +24,7 @@ def create_api_blueprint():
     api_bp.register_blueprint(routes_bp)
     api_bp.register_blueprint(auth_bp)
     
+    # Limite de requisições simultâneas por classe de rota (load shedding)
+    registrar_admissao(api_bp)
+    
     return api_bp
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Emergency Backend - Controle de Admissão
+Limita as requisições simultâneas de cada classe de rota (auth, leitura,
+escrita, lote) com uma fila de espera limitada
+
+Em um pico, em vez de todas as threads disputarem o SQLite ao mesmo tempo,
+cada classe executa no máximo `limite` requisições; as demais esperam na
+fila por até `espera` segundos. Com a fila cheia (ou a espera esgotada) a
+requisição recebe 503 com Retry-After na hora, e as classes baratas (login,
+status) continuam respondendo enquanto as caras estão saturadas
+"""
+
+import os
+import threading
+import time
+from flask import g, request, jsonify
+from config.settings import Config
+from utils import metrics
+from utils.health import registrar_verificacao, SAUDAVEL, DEGRADADO
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ClasseAdmissao:
+    """Semáforo com fila limitada de uma classe de rota"""
+
+    def __init__(self, nome, limite, fila, espera):
+        self.nome = nome
+        self.limite = max(1, limite)
+        self.fila = max(0, fila)
+        self.espera = espera
+        self.em_execucao = 0
+        self.aguardando = 0
+        self._cond = threading.Condition()
+
+    def admitir(self):
+        """
+        Ocupa uma vaga da classe, esperando na fila se preciso
+
+        Returns:
+            float: Segundos de espera na fila, ou None se a requisição foi
+                   rejeitada (fila cheia ou espera esgotada)
+        """
+        inicio = time.monotonic()
+        with self._cond:
+            if self.em_execucao < self.limite and not self.aguardando:
+                self.em_execucao += 1
+                return 0.0
+
+            if self.aguardando >= self.fila:
+                return None
+
+            self.aguardando += 1
+            try:
+                admitida = self._cond.wait_for(lambda: self.em_execucao < self.limite,
+                                               timeout=self.espera)
+            finally:
+                self.aguardando -= 1
+
+            if not admitida:
+                return None
+            self.em_execucao += 1
+
+        return time.monotonic() - inicio
+
+    def liberar(self):
+        """Devolve a vaga e acorda o próximo da fila"""
+        with self._cond:
+            self.em_execucao -= 1
+            self._cond.notify()
+
+    def estado(self):
+        """Ocupação atual, para o probe de prontidão"""
+        with self._cond:
+            return {'em_execucao': self.em_execucao, 'aguardando': self.aguardando}
+
+# Classes do processo, criadas em registrar_admissao
+_classes = {}
+
+def _criar_classes():
+    """(Re)cria as classes a partir de Config.ADMISSAO_CLASSES"""
+    _classes.clear()
+    for nome, cfg in Config.ADMISSAO_CLASSES.items():
+        _classes[nome] = ClasseAdmissao(nome, cfg['limite'], cfg['fila'], cfg['espera'])
+
+def classe_da_rota(endpoint):
+    """Classe de admissão de um endpoint ou None (rota não controlada)"""
+    return _classes.get(Config.ADMISSAO_ROTAS.get(endpoint))
+
+def _resposta_rejeitada():
+    response = jsonify({
+        "status": "error",
+        "mensagem": "Servidor sobrecarregado, tente novamente",
+        "dados": None
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(Config.ADMISSAO_RETRY_AFTER)
+    return response
+
+def admitir_requisicao():
+    """before_request: ocupa a vaga da classe da rota ou responde 503"""
+    if not Config.ADMISSAO_HABILITADA:
+        return None
+
+    classe = classe_da_rota(request.endpoint)
+    if classe is None:
+        return None
+
+    espera = classe.admitir()
+    if espera is None:
+        metrics.incrementar(f'admissao.rejeitadas.{classe.nome}')
+        logger.warning("Requisição rejeitada: classe %s saturada", classe.nome,
+                       extra={'classe': classe.nome, 'rota': request.endpoint})
+        return _resposta_rejeitada()
+
+    g.classe_admissao = classe
+    metrics.incrementar(f'admissao.admitidas.{classe.nome}')
+    metrics.observar(f'admissao.espera_ms.{classe.nome}', espera * 1000)
+    return None
+
+def liberar_requisicao(erro=None):
+    """teardown_request: devolve a vaga (também em requisições com exceção)"""
+    classe = g.pop('classe_admissao', None)
+    if classe is not None:
+        classe.liberar()
+
+def verificar_saude():
+    """Ocupação das classes para o probe de prontidão (degradado com fila cheia)"""
+    classes = {nome: classe.estado() for nome, classe in _classes.items()}
+    saturadas = [nome for nome, classe in _classes.items()
+                 if classes[nome]['em_execucao'] >= classe.limite
+                 and classes[nome]['aguardando'] >= classe.fila]
+    return {
+        "estado": DEGRADADO if saturadas else SAUDAVEL,
+        "classes": classes
+    }
+
+def registrar_admissao(blueprint):
+    """
+    Coloca o controle de admissão na frente das rotas de um blueprint
+
+    Os hooks do blueprint valem também para os blueprints registrados nele
+    """
+    _criar_classes()
+    blueprint.before_request(admitir_requisicao)
+    blueprint.teardown_request(liberar_requisicao)
+    registrar_verificacao('admissao', verificar_saude)
+
+def _reiniciar_apos_fork():
+    """Cada worker tem suas próprias vagas (as do pai não valem no filho)"""
+    if _classes:
+        _criar_classes()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
@@ -5,7 +5,7 @@ Gerencia autenticação completa: cadastro, login, tokens e verificação de ses
 
 from flask import Blueprint, request, jsonify
 from functools import wraps
-from database.models import Usuario
+from database.models import Usuario, EmailEmUsoError
 from utils.token_utils import gerar_token, verificar_token
 from utils.session import validar_sessao
 import logging
@@ -56,14 +56,12 @@ def create_auth_blueprint():
             if '@' not in email:
                 return create_response("error", "Email inválido"), 400
             
-            # Verificar se usuário já existe
-            usuario_existente = Usuario.buscar_por_email(email)
-            if usuario_existente:
+            # Criar usuário (email duplicado é detectado pela constraint UNIQUE)
+            try:
+                usuario = Usuario.criar_usuario(nome, email, senha)
+            except EmailEmUsoError:
                 return create_response("error", "Email já está em uso"), 409
             
-            # Criar usuário
-            usuario = Usuario.criar_usuario(nome, email, senha)
-            
             if usuario:
                 # Gerar token de autenticação
                 token = gerar_token(usuario['id'])
@@ -84,7 +82,7 @@ def create_auth_blueprint():
                 return create_response("error", "Erro ao criar usuário"), 500
                 
         except Exception as e:
-            logger.error(f"Erro no cadastro: {e}")
+            logger.error("Erro no cadastro: %s", e)
             return create_response("error", "Erro interno do servidor"), 500
     
     @auth_bp.route('/login', methods=['POST'])
@@ -132,60 +130,92 @@ def create_auth_blueprint():
                 return create_response("error", "Email ou senha incorretos"), 401
                 
         except Exception as e:
-            logger.error(f"Erro no login: {e}")
+            logger.error("Erro no login: %s", e)
             return create_response("error", "Erro interno do servidor"), 500
     
     return auth_bp
 
-def token_required(f):
-    """
-    Decorator para proteger rotas que exigem autenticação
-    Verifica token enviado no header Authorization
-    """
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        
-        # Buscar token no header
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            try:
-                # Formato esperado: "Bearer TOKEN"
-                token = auth_header.split(" ")[1] if auth_header.startswith('Bearer ') else auth_header
-            except IndexError:
-                pass
+def _autenticar(token, f, args, kwargs):
+    """Verifica token e sessão e chama a rota protegida com o usuario_id"""
+    if not token:
+        return jsonify({
+            "status": "error", 
+            "mensagem": "Token de autenticação não fornecido"
+        }), 401
+    
+    try:
+        # Verificar token
+        usuario_id = verificar_token(token)
         
-        if not token:
+        if not usuario_id:
             return jsonify({
-                "status": "error", 
-                "mensagem": "Token de autenticação não fornecido"
+                "status": "error",
+                "mensagem": "Token inválido ou expirado"
             }), 401
         
-        try:
-            # Verificar token
-            usuario_id = verificar_token(token)
-            
-            if not usuario_id:
-                return jsonify({
-                    "status": "error",
-                    "mensagem": "Token inválido ou expirado"
-                }), 401
-            
-            # Validar sessão
-            if not validar_sessao(usuario_id, token):
-                return jsonify({
-                    "status": "error",
-                    "mensagem": "Sessão inválida"
-                }), 401
-            
-            # Chamar função original passando usuario_id
-            return f(usuario_id, *args, **kwargs)
-            
-        except Exception as e:
-            logger.error(f"Erro na verificação do token: {e}")
+        # Validar sessão
+        if not validar_sessao(usuario_id, token):
             return jsonify({
                 "status": "error",
-                "mensagem": "Erro na autenticação"
+                "mensagem": "Sessão inválida"
             }), 401
+        
+        # Chamar função original passando usuario_id
+        return f(usuario_id, *args, **kwargs)
+        
+    except Exception as e:
+        logger.error("Erro na verificação do token: %s", e)
+        return jsonify({
+            "status": "error",
+            "mensagem": "Erro na autenticação"
+        }), 401
+
+def obter_token_requisicao(aceitar_query=False):
+    """
+    Extrai o token da requisição atual
+    
+    Args:
+        aceitar_query (bool): Aceita também o parâmetro de query `token`
+    
+    Returns:
+        str: Token do header Authorization ("Bearer TOKEN" ou só o token) ou None
+    """
+    token = None
+    
+    # Buscar token no header
+    if 'Authorization' in request.headers:
+        auth_header = request.headers['Authorization']
+        try:
+            # Formato esperado: "Bearer TOKEN"
+            token = auth_header.split(" ")[1] if auth_header.startswith('Bearer ') else auth_header
+        except IndexError:
+            pass
+    
+    if not token and aceitar_query:
+        token = request.args.get('token')
+    
+    return token
+
+def token_required(f):
+    """
+    Decorator para proteger rotas que exigem autenticação
+    Verifica token enviado no header Authorization
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        return _autenticar(obter_token_requisicao(), f, args, kwargs)
+    
+    return decorated
+
+def token_required_stream(f):
+    """
+    Variante de token_required para conexões de streaming (SSE/WebSocket)
+    
+    Navegadores não enviam headers customizados nessas conexões, então o
+    token também é aceito no parâmetro de query `token`
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        return _autenticar(obter_token_requisicao(aceitar_query=True), f, args, kwargs)
     
-    return decorated
\ No newline at end of file
+    return decorated
@@ -3,14 +3,33 @@ Emergency Backend - Rotas HTTP
 Define todas as rotas públicas e protegidas da API
 """
 
-from flask import Blueprint, request, jsonify
-from .auth import token_required
+from flask import Blueprint, Response, request, jsonify, current_app, send_file
+from .auth import token_required, token_required_stream
+from utils.json_utils import resposta_streaming
 from core.interpreter import processar_comando
 from core.actions import *
+from database.models import ConflitoVersaoError, BaseDivergenteError
+from utils.patch_utils import PatchInvalidoError
+from utils import metrics
+from core.eventos import barramento, formatar_sse
+from core.cache_listagens import cache_listagens
+from config.settings import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
+def registrar_upload_salvamento(delta, tamanho):
+    """
+    Registra nas métricas os bytes enviados por um salvamento
+
+    Args:
+        delta (bool): Se o salvamento veio como patch
+        tamanho (int): Bytes da requisição ou da mensagem WebSocket
+    """
+    tipo = 'delta' if delta else 'completo'
+    metrics.incrementar(f'salvar_projeto.{tipo}')
+    metrics.observar(f'salvar_projeto.bytes_upload_{tipo}', tamanho, metrics.BUCKETS_BYTES)
+
 def create_routes_blueprint():
     """Cria blueprint com todas as rotas da aplicação"""
     routes_bp = Blueprint('routes', __name__)
@@ -23,6 +42,24 @@ def create_routes_blueprint():
             "dados": dados
         })
     
+    def resposta_erro_salvamento(erro):
+        """Resposta para os erros de salvamento previstos (None se outro erro)"""
+        if isinstance(erro, ConflitoVersaoError):
+            return create_response(
+                "error",
+                "Projeto foi alterado em outra sessão",
+                {"versao_atual": erro.versao_atual}
+            ), 409
+        if isinstance(erro, BaseDivergenteError):
+            return create_response(
+                "error",
+                "Patch gerado sobre uma versão desatualizada do projeto",
+                {"hash_atual": erro.hash_atual, "versao_atual": erro.versao_atual}
+            ), 409
+        if isinstance(erro, PatchInvalidoError):
+            return create_response("error", f"Patch inválido: {erro}"), 400
+        return None
+    
     @routes_bp.route('/salvar_projeto', methods=['POST'])
     @token_required
     def salvar_projeto_route(usuario_id):
@@ -39,15 +76,31 @@ def create_routes_blueprint():
             titulo = data.get('titulo')
             conteudo_html = data.get('conteudo_html')
             projeto_id = data.get('projeto_id')  # Para atualizações
+            versao = data.get('versao')  # Versão carregada (controle otimista)
+            salvar_agora = bool(data.get('salvar_agora', False))  # Ignora o buffer de autosave
+            patch = data.get('patch')  # Delta sobre o conteúdo com hash hash_base
+            hash_base = data.get('hash_base')
+            
+            registrar_upload_salvamento(patch is not None, request.content_length or 0)
             
             if not titulo:
                 return create_response("error", "Título é obrigatório"), 400
             
-            if not conteudo_html:
+            if patch is not None:
+                if not projeto_id or not hash_base:
+                    return create_response("error", "Patch exige projeto_id e hash_base"), 400
+            elif not conteudo_html:
                 return create_response("error", "Conteúdo HTML é obrigatório"), 400
             
+            if versao is not None and (isinstance(versao, bool) or not isinstance(versao, int)):
+                return create_response("error", "Versão deve ser um número inteiro"), 400
+            
             # Salvar projeto
-            resultado = salvar_projeto(usuario_id, titulo, conteudo_html, projeto_id)
+            try:
+                resultado = salvar_projeto(usuario_id, titulo, conteudo_html, projeto_id, versao,
+                                           salvar_agora, patch, hash_base)
+            except (ConflitoVersaoError, BaseDivergenteError, PatchInvalidoError) as e:
+                return resposta_erro_salvamento(e)
             
             if resultado:
                 return create_response(
@@ -55,11 +108,13 @@ def create_routes_blueprint():
                     "Projeto salvo com sucesso",
                     resultado
                 )
+            elif projeto_id:
+                return create_response("error", "Projeto não encontrado ou não autorizado"), 404
             else:
                 return create_response("error", "Erro ao salvar projeto"), 500
                 
         except Exception as e:
-            logger.error(f"Erro na rota salvar_projeto: {e}")
+            logger.error("Erro na rota salvar_projeto: %s", e)
             return create_response("error", "Erro interno do servidor"), 500
     
     @routes_bp.route('/carregar_projeto/<int:projeto_id>', methods=['GET'])
@@ -70,7 +125,20 @@ def create_routes_blueprint():
         Requer autenticação via token
         """
         try:
-            resultado = carregar_projeto(usuario_id, projeto_id)
+            try:
+                resultado = carregar_projeto(usuario_id, projeto_id)
+            except ConflitoVersaoError as e:
+                return resposta_erro_salvamento(e)
+            
+            if resultado and len(resultado['conteudo_html']) >= current_app.config['JSON_STREAM_MIN_BYTES']:
+                # HTML grande: envelope transmitido em pedaços, sem cópia inteira em memória
+                return resposta_streaming(
+                    current_app,
+                    "success",
+                    "Projeto carregado com sucesso",
+                    resultado,
+                    'conteudo_html'
+                )
             
             if resultado:
                 return create_response(
@@ -82,27 +150,98 @@ def create_routes_blueprint():
                 return create_response("error", "Projeto não encontrado"), 404
                 
         except Exception as e:
-            logger.error(f"Erro na rota carregar_projeto: {e}")
+            logger.error("Erro na rota carregar_projeto: %s", e)
+            return create_response("error", "Erro interno do servidor"), 500
+    
+    @routes_bp.route('/carregar_projeto/<int:projeto_id>/conteudo', methods=['GET'])
+    @token_required
+    def conteudo_projeto_route(usuario_id, projeto_id):
+        """
+        Rota que entrega só o HTML de um projeto (text/html, sem envelope JSON)
+        Requer autenticação via token
+        
+        Com o armazenamento de arquivos a resposta é o próprio arquivo
+        (wsgi.file_wrapper: o servidor pode usar sendfile). ETag é o hash do
+        conteúdo, então If-None-Match responde 304
+        """
+        try:
+            try:
+                resultado = obter_conteudo_projeto(usuario_id, projeto_id)
+            except ConflitoVersaoError as e:
+                return resposta_erro_salvamento(e)
+            
+            if not resultado:
+                return create_response("error", "Projeto não encontrado"), 404
+            
+            if resultado['caminho'] is not None:
+                resposta = send_file(
+                    resultado['caminho'],
+                    mimetype='text/html',
+                    etag=resultado['hash_conteudo'],
+                    conditional=True,
+                    max_age=0
+                )
+            else:
+                resposta = Response(resultado['conteudo_html'], mimetype='text/html')
+                resposta.set_etag(resultado['hash_conteudo'])
+                resposta = resposta.make_conditional(request)
+            
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+            
+        except Exception as e:
+            logger.error("Erro na rota conteudo_projeto: %s", e)
             return create_response("error", "Erro interno do servidor"), 500
     
     @routes_bp.route('/listar_projetos', methods=['GET'])
     @token_required
     def listar_projetos_route(usuario_id):
         """
-        Rota para listar todos os projetos do usuário
+        Rota para listar os projetos do usuário
         Requer autenticação via token
+        
+        Paginação opcional com ?pagina=N&por_pagina=M. O ETag muda a cada
+        alteração nos projetos do usuário: If-None-Match com o ETag atual
+        responde 304 sem consultar o banco
         """
         try:
-            projetos = listar_projetos(usuario_id)
+            pagina = request.args.get('pagina', type=int)
+            por_pagina = request.args.get('por_pagina', type=int)
+            if pagina is not None or por_pagina is not None:
+                if (pagina is None or pagina < 1 or por_pagina is None or por_pagina < 1
+                        or por_pagina > Config.LISTAGEM_POR_PAGINA_MAXIMO):
+                    return create_response(
+                        "error",
+                        f"pagina e por_pagina devem ser inteiros positivos "
+                        f"(por_pagina até {Config.LISTAGEM_POR_PAGINA_MAXIMO})"
+                    ), 400
             
-            return create_response(
+            geracao = etag = None
+            if cache_listagens.habilitado:
+                geracao = cache_listagens.geracao(usuario_id)
+            if geracao is not None:
+                etag = cache_listagens.etag(usuario_id, geracao)
+                if request.if_none_match.contains(etag):
+                    metrics.incrementar('listar_projetos.nao_modificado')
+                    resposta = Response(status=304)
+                    resposta.set_etag(etag)
+                    resposta.headers['Cache-Control'] = 'private, no-cache'
+                    return resposta
+            
+            projetos = listar_projetos(usuario_id, pagina, por_pagina, geracao)
+            
+            resposta = create_response(
                 "success",
                 f"Encontrados {len(projetos)} projetos",
                 projetos
             )
+            if etag is not None:
+                resposta.set_etag(etag)
+                resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
             
         except Exception as e:
-            logger.error(f"Erro na rota listar_projetos: {e}")
+            logger.error("Erro na rota listar_projetos: %s", e)
             return create_response("error", "Erro interno do servidor"), 500
     
     @routes_bp.route('/deletar_projeto/<int:projeto_id>', methods=['DELETE'])
@@ -124,7 +263,33 @@ def create_routes_blueprint():
                 return create_response("error", "Projeto não encontrado ou não autorizado"), 404
                 
         except Exception as e:
-            logger.error(f"Erro na rota deletar_projeto: {e}")
+            logger.error("Erro na rota deletar_projeto: %s", e)
+            return create_response("error", "Erro interno do servidor"), 500
+    
+    @routes_bp.route('/restaurar_projeto/<int:projeto_id>', methods=['POST'])
+    @token_required
+    def restaurar_projeto_route(usuario_id, projeto_id):
+        """
+        Rota para restaurar um projeto deletado
+        Possível até EXCLUSAO_JANELA_RESTAURACAO segundos após a exclusão
+        """
+        try:
+            projeto = restaurar_projeto(usuario_id, projeto_id)
+            
+            if projeto:
+                return create_response(
+                    "success",
+                    "Projeto restaurado com sucesso",
+                    projeto
+                )
+            else:
+                return create_response(
+                    "error",
+                    "Projeto não encontrado na lixeira ou prazo de restauração expirado"
+                ), 404
+                
+        except Exception as e:
+            logger.error("Erro na rota restaurar_projeto: %s", e)
             return create_response("error", "Erro interno do servidor"), 500
     
     @routes_bp.route('/comando', methods=['POST'])
@@ -145,6 +310,10 @@ def create_routes_blueprint():
             if not acao:
                 return create_response("error", "Campo 'acao' é obrigatório"), 400
             
+            if acao == 'salvar_projeto':
+                registrar_upload_salvamento(data.get('patch') is not None,
+                                            request.content_length or 0)
+            
             # Processar comando através do interpreter
             resultado = processar_comando(usuario_id, acao, data)
             
@@ -157,13 +326,49 @@ def create_routes_blueprint():
             else:
                 return create_response(
                     "error",
-                    resultado.get('mensagem', 'Erro ao executar comando')
-                ), 400
+                    resultado.get('mensagem', 'Erro ao executar comando'),
+                    resultado.get('dados')
+                ), resultado.get('codigo_http', 400)
                 
         except Exception as e:
-            logger.error(f"Erro na rota comando: {e}")
+            logger.error("Erro na rota comando: %s", e)
             return create_response("error", "Erro interno do servidor"), 500
     
+    @routes_bp.route('/eventos', methods=['GET'])
+    @token_required_stream
+    def eventos_route(usuario_id):
+        """
+        Feed de alterações dos projetos do usuário via Server-Sent Events
+        Aceita o token no header Authorization ou no parâmetro `token`
+        Retoma a partir do header Last-Event-ID (ou parâmetro `ultimo_id`)
+        """
+        ultimo_id = request.headers.get('Last-Event-ID') or request.args.get('ultimo_id')
+        assinatura = barramento.assinar(usuario_id, ultimo_id)
+        
+        if assinatura is None:
+            return create_response("error", "Limite de conexões de eventos atingido"), 429
+        
+        heartbeat = Config.EVENTOS_HEARTBEAT
+        
+        def gerar():
+            try:
+                # Intervalo de reconexão sugerido ao EventSource
+                yield "retry: 3000\n\n"
+                while True:
+                    evento = assinatura.obter(timeout=heartbeat)
+                    if evento is None:
+                        # Comentário SSE mantém a conexão viva em proxies
+                        yield ": ping\n\n"
+                    else:
+                        yield formatar_sse(evento)
+            finally:
+                barramento.cancelar(assinatura)
+        
+        return Response(gerar(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+    
     @routes_bp.route('/status', methods=['GET'])
     def status_route():
         """Rota pública para verificar status do servidor"""
@@ -183,7 +388,7 @@ def create_routes_blueprint():
             )
             
         except Exception as e:
-            logger.error(f"Erro na rota status: {e}")
+            logger.error("Erro na rota status: %s", e)
             return create_response("error", "Erro ao verificar status"), 500
     
     return routes_bp
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Emergency Backend - Canal WebSocket
+Canal persistente para os comandos do editor: autentica uma vez no handshake
+e multiplexa as mesmas ações de /api/comando, identificadas por id
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from .auth import obter_token_requisicao
+from .routes import registrar_upload_salvamento
+from core.interpreter import processar_comando
+from utils.token_utils import verificar_token, extrair_info_token
+from utils.session import validar_sessao
+from utils.json_utils import codificar_json
+from utils import metrics
+from config.settings import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from flask_sock import Sock
+except ImportError:  # pragma: no cover - depende do ambiente
+    Sock = None
+
+# Código de fechamento WebSocket para falha de autenticação (policy violation)
+FECHAMENTO_POLITICA = 1008
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _reiniciar_apos_fork():
+    """As threads do pool não sobrevivem ao fork: o worker cria o seu"""
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
+
+def _obter_executor():
+    """Pool de threads compartilhado pelas conexões (criado no primeiro uso)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=Config.WS_WORKERS,
+                                           thread_name_prefix='ws-comando')
+        return _executor
+
+class ConexaoComandos:
+    """
+    Uma conexão WebSocket autenticada
+
+    Cada mensagem {"id", "acao", ...} vira uma chamada a processar_comando no
+    pool; a resposta leva o mesmo id e pode chegar fora de ordem. Comandos
+    com o mesmo projeto_id são executados na ordem de chegada, um de cada
+    vez (um salvamento não é ultrapassado pelo seguinte). No máximo
+    WS_MAX_EM_VOO comandos ficam em execução ou na fila por conexão: acima
+    disso a leitura do socket para até que algum termine
+    """
+
+    def __init__(self, ws, usuario_id, expiracao, encoder):
+        self.ws = ws
+        self.usuario_id = usuario_id
+        self.expiracao = expiracao
+        self.encoder = encoder
+        self._vagas = threading.BoundedSemaphore(Config.WS_MAX_EM_VOO)
+        self._lock_envio = threading.Lock()
+        # projeto_id -> comandos que esperam o comando em execução do projeto
+        self._filas = {}
+        self._lock_filas = threading.Lock()
+
+    def enviar(self, mensagem):
+        """Envia uma resposta (envios de threads diferentes são serializados)"""
+        dados = codificar_json(mensagem, self.encoder).decode('utf-8')
+        with self._lock_envio:
+            self.ws.send(dados)
+
+    def enviar_erro(self, id_requisicao, mensagem, codigo):
+        self.enviar({
+            "id": id_requisicao,
+            "status": "error",
+            "mensagem": mensagem,
+            "dados": None,
+            "codigo": codigo
+        })
+
+    def executar(self):
+        """Loop de leitura até o cliente desconectar ou o token expirar"""
+        while True:
+            mensagem = self.ws.receive()
+            if mensagem is None:
+                return
+
+            if time.time() > self.expiracao:
+                self.enviar_erro(None, "Token expirado", 401)
+                self.ws.close(FECHAMENTO_POLITICA, "Token expirado")
+                return
+
+            try:
+                dados = json.loads(mensagem)
+            except ValueError:
+                self.enviar_erro(None, "Mensagem não é um JSON válido", 400)
+                continue
+
+            if not isinstance(dados, dict):
+                self.enviar_erro(None, "Mensagem deve ser um objeto JSON", 400)
+                continue
+
+            id_requisicao = dados.get('id')
+            if not dados.get('acao'):
+                self.enviar_erro(id_requisicao, "Campo 'acao' é obrigatório", 400)
+                continue
+
+            if dados['acao'] == 'salvar_projeto':
+                tamanho = len(mensagem) if isinstance(mensagem, bytes) \
+                    else len(mensagem.encode('utf-8'))
+                registrar_upload_salvamento(dados.get('patch') is not None, tamanho)
+
+            self._vagas.acquire()
+            metrics.incrementar('ws.comandos')
+            self._enfileirar(id_requisicao, dados)
+
+    def _enfileirar(self, id_requisicao, dados):
+        """Envia o comando ao pool ou à fila do projeto, se outro estiver rodando"""
+        projeto_id = _chave_projeto(dados)
+        if projeto_id is not None:
+            with self._lock_filas:
+                fila = self._filas.get(projeto_id)
+                if fila is not None:
+                    fila.append((id_requisicao, dados))
+                    return
+                self._filas[projeto_id] = deque()
+        _obter_executor().submit(self._processar, id_requisicao, dados, projeto_id)
+
+    def _processar(self, id_requisicao, dados, projeto_id=None):
+        """Executa o comando e, na mesma thread, os que esperam pelo projeto"""
+        while True:
+            self._processar_comando(id_requisicao, dados)
+            if projeto_id is None:
+                return
+            with self._lock_filas:
+                fila = self._filas[projeto_id]
+                if not fila:
+                    del self._filas[projeto_id]
+                    return
+                id_requisicao, dados = fila.popleft()
+
+    def _processar_comando(self, id_requisicao, dados):
+        """Executa um comando e envia a resposta"""
+        inicio = time.perf_counter()
+        try:
+            resultado = processar_comando(self.usuario_id, dados['acao'], dados)
+
+            if resultado.get('status') == 'success':
+                self.enviar({
+                    "id": id_requisicao,
+                    "status": "success",
+                    "mensagem": resultado.get('mensagem', 'Comando executado com sucesso'),
+                    "dados": resultado.get('dados')
+                })
+            else:
+                self.enviar({
+                    "id": id_requisicao,
+                    "status": "error",
+                    "mensagem": resultado.get('mensagem', 'Erro ao executar comando'),
+                    "dados": resultado.get('dados'),
+                    "codigo": resultado.get('codigo_http', 400)
+                })
+        except Exception as e:
+            # Inclui o envio para um cliente que já desconectou
+            logger.warning("Resposta do comando %s não enviada: %s", id_requisicao, e)
+        finally:
+            self._vagas.release()
+            metrics.observar('ws.comando_ms', (time.perf_counter() - inicio) * 1000)
+
+def _chave_projeto(dados):
+    """projeto_id do comando normalizado ("5" e 5 são o mesmo) ou None"""
+    projeto_id = dados.get('projeto_id')
+    if projeto_id is None or isinstance(projeto_id, bool):
+        return None
+    try:
+        return int(projeto_id)
+    except (ValueError, TypeError):
+        return None
+
+def registrar_websocket(app):
+    """
+    Registra a rota /api/ws se flask-sock estiver instalado
+
+    Args:
+        app: Aplicação Flask
+
+    Returns:
+        bool: True se o canal foi registrado
+    """
+    if Sock is None:
+        logger.warning("flask-sock não instalado: canal WebSocket /api/ws desabilitado")
+        return False
+
+    sock = Sock(app)
+
+    @sock.route('/api/ws')
+    def canal_comandos(ws):
+        """Autentica o handshake e atende os comandos da conexão"""
+        # Navegadores não enviam headers no handshake: aceita ?token=
+        token = obter_token_requisicao(aceitar_query=True)
+        usuario_id = verificar_token(token) if token else None
+
+        if not usuario_id or not validar_sessao(usuario_id, token):
+            ws.close(FECHAMENTO_POLITICA, "Token inválido ou expirado")
+            return
+
+        expiracao = extrair_info_token(token)['expiracao']
+        encoder = getattr(current_app.json, 'encoder', 'stdlib')
+
+        metrics.incrementar('ws.conexoes')
+        logger.info("Canal WebSocket aberto para usuário %s", usuario_id)
+
+        ConexaoComandos(ws, usuario_id, expiracao, encoder).executar()
+
+    return True
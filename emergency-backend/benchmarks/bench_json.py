@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Emergency Backend - Benchmark de Codificação JSON
+Compara os encoders disponíveis em payloads realistas de carregar_projeto
+
+Uso:
+    python benchmarks/bench_json.py [--tamanhos 10,100,1000] [--repeticoes 50]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.json_utils import ENCODERS_DISPONIVEIS, codificar_json, gerar_envelope_streaming
+
+BLOCO_HTML = """    <section class="secao" data-editavel="true" style="padding: 40px 20px; background: #f7f7f7;">
+        <h2 class="titulo-secao">Seção {n} — Nossos "serviços"</h2>
+        <p class="texto">Lorem ipsum dolor sit amet, consectetur adipiscing elit. Ação & inovação: 100% garantido.</p>
+        <a href="https://exemplo.com.br/pagina?id={n}&ref=editor" class="botao botao-primario">Saiba mais</a>
+        <img src="data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==" alt="imagem {n}">
+    </section>
+"""
+
+def gerar_html(tamanho_kb):
+    """Gera um documento HTML com aproximadamente `tamanho_kb` KB"""
+    cabecalho = ('<!DOCTYPE html>\n<html lang="pt-BR">\n<head>\n<meta charset="UTF-8">\n'
+                 '<title>Projeto</title>\n</head>\n<body>\n')
+    partes = [cabecalho]
+    tamanho = len(cabecalho)
+    n = 0
+    while tamanho < tamanho_kb * 1024:
+        bloco = BLOCO_HTML.format(n=n)
+        partes.append(bloco)
+        tamanho += len(bloco)
+        n += 1
+    partes.append('</body>\n</html>')
+    return ''.join(partes)
+
+def gerar_payload(tamanho_kb):
+    """Envelope igual ao de /api/carregar_projeto"""
+    return {
+        "status": "success",
+        "mensagem": "Projeto carregado com sucesso",
+        "dados": {
+            "id": 42,
+            "usuario_id": 7,
+            "titulo": "Landing Page",
+            "conteudo_html": gerar_html(tamanho_kb),
+            "data_criacao": "2024-01-15 10:30:00",
+            "data_modificacao": "2024-01-15 14:20:00"
+        }
+    }
+
+def medir(funcao, repeticoes):
+    """Retorna o tempo médio em ms de `funcao`"""
+    funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) * 1000 / repeticoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de encoders JSON")
+    parser.add_argument('--tamanhos', default='10,100,1000',
+                        help="Tamanhos de HTML em KB, separados por vírgula")
+    parser.add_argument('--repeticoes', type=int, default=50)
+    args = parser.parse_args()
+
+    casos = {
+        'stdlib (indent=2, antigo)': lambda p: json.dumps(p, indent=2).encode('utf-8'),
+    }
+    for encoder in ENCODERS_DISPONIVEIS:
+        casos[f'{encoder} (compacto)'] = lambda p, e=encoder: codificar_json(p, e)
+        casos[f'{encoder} (streaming)'] = lambda p, e=encoder: [
+            pedaco for pedaco in gerar_envelope_streaming(
+                p['status'], p['mensagem'], p['dados'], 'conteudo_html', 65536, e)
+        ]
+
+    print(f"{'caso':<28} {'html':>8} {'ms/op':>9} {'MB/s':>9}")
+    print('-' * 58)
+
+    for tamanho_kb in (int(t) for t in args.tamanhos.split(',')):
+        payload = gerar_payload(tamanho_kb)
+        bytes_html = len(payload['dados']['conteudo_html'].encode('utf-8'))
+
+        for nome, funcao in casos.items():
+            ms = medir(lambda: funcao(payload), args.repeticoes)
+            mb_s = (bytes_html / (1024 * 1024)) / (ms / 1000)
+            print(f"{nome:<28} {tamanho_kb:>6}KB {ms:>9.3f} {mb_s:>9.1f}")
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Emergency Backend - Benchmark do Modo Multi-Worker
+Mede a vazão de /api/carregar_projeto (codificação JSON de um projeto grande)
+com 1, 2, 4... workers do servidor pre-fork, usando um banco temporário
+
+Uso:
+    python benchmarks/bench_workers.py [--workers 1,2,4] [--clientes 8] [--duracao 5]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.bench_json import gerar_html
+
+def porta_livre():
+    """Reserva uma porta TCP livre em localhost"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def requisitar(url, dados=None, token=None):
+    """Faz uma requisição JSON e retorna o corpo decodificado"""
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    corpo = json.dumps(dados).encode('utf-8') if dados is not None else None
+    with urllib.request.urlopen(urllib.request.Request(url, corpo, headers)) as resposta:
+        return json.loads(resposta.read())
+
+def iniciar_servidor(workers, porta, banco):
+    """Sobe prefork.py em subprocesso e espera o health check responder"""
+    env = dict(os.environ, DATABASE_PATH=banco, LOG_LEVEL='WARNING',
+               AUTOSAVE_HABILITADO='false')
+    processo = subprocess.Popen(
+        [sys.executable, 'prefork.py', '--workers', str(workers),
+         '--host', '127.0.0.1', '--port', str(porta)],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    limite = time.monotonic() + 15
+    while time.monotonic() < limite:
+        try:
+            requisitar(f'http://127.0.0.1:{porta}/health/live')
+            return processo
+        except OSError:
+            time.sleep(0.1)
+
+    processo.kill()
+    raise RuntimeError("Servidor não respondeu a tempo")
+
+def cliente(url, token, duracao, fila):
+    """Processo cliente: repete a requisição até acabar o tempo"""
+    feitas = erros = 0
+    limite = time.monotonic() + duracao
+    requisicao = urllib.request.Request(url, headers={'Authorization': f'Bearer {token}'})
+    while time.monotonic() < limite:
+        try:
+            with urllib.request.urlopen(requisicao) as resposta:
+                resposta.read()
+            feitas += 1
+        except OSError:
+            erros += 1
+    fila.put((feitas, erros))
+
+def medir(workers, clientes, duracao, tamanho_kb):
+    """Retorna (requisições/s, erros) para um número de workers"""
+    porta = porta_livre()
+    with tempfile.TemporaryDirectory() as diretorio:
+        processo = iniciar_servidor(workers, porta, os.path.join(diretorio, 'bench.db'))
+        try:
+            base = f'http://127.0.0.1:{porta}/api'
+            token = requisitar(f'{base}/cadastro', {
+                'nome': 'Bench', 'email': 'bench@exemplo.com', 'senha': 'senha123'
+            })['dados']['token']
+            projeto = requisitar(f'{base}/salvar_projeto', {
+                'titulo': 'Bench', 'conteudo_html': gerar_html(tamanho_kb)
+            }, token)['dados']
+
+            fila = multiprocessing.Queue()
+            processos = [
+                multiprocessing.Process(target=cliente, args=(
+                    f"{base}/carregar_projeto/{projeto['id']}", token, duracao, fila))
+                for _ in range(clientes)
+            ]
+            for p in processos:
+                p.start()
+            resultados = [fila.get() for _ in processos]
+            for p in processos:
+                p.join()
+        finally:
+            processo.send_signal(signal.SIGTERM)
+            processo.wait(timeout=15)
+
+    feitas = sum(r[0] for r in resultados)
+    return feitas / duracao, sum(r[1] for r in resultados)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do modo multi-worker")
+    parser.add_argument('--workers', default='1,2,4',
+                        help="Números de workers, separados por vírgula")
+    parser.add_argument('--clientes', type=int, default=8,
+                        help="Processos cliente simultâneos")
+    parser.add_argument('--duracao', type=float, default=5.0,
+                        help="Segundos de carga por medição")
+    parser.add_argument('--tamanho', type=int, default=256,
+                        help="Tamanho do HTML do projeto em KB")
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}  clientes: {args.clientes}  html: {args.tamanho}KB")
+    print(f"{'workers':>8} {'req/s':>10} {'ganho':>8} {'erros':>7}")
+    print('-' * 36)
+
+    referencia = None
+    for workers in (int(w) for w in args.workers.split(',')):
+        vazao, erros = medir(workers, args.clientes, args.duracao, args.tamanho)
+        referencia = referencia or vazao
+        print(f"{workers:>8} {vazao:>10.1f} {vazao / referencia:>7.2f}x {erros:>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Emergency Backend - Teste de Carga Ponta a Ponta
+Dispara uma mistura configurável de chamadas da API contra a aplicação de
+create_app, com usuários virtuais simultâneos, e grava latências (p50/p95/p99),
+vazão e taxa de erros por endpoint em um JSON comparável entre commits
+
+Uso:
+    python benchmarks/carga.py [--transporte cliente|socket] [--concorrencia 8]
+                               [--duracao 10] [--mix salvar_projeto=3,carregar_projeto=5]
+                               [--saida carga.json] [--comparar anterior.json]
+
+O banco é temporário. `cliente` usa o test client do Flask (só a aplicação);
+`socket` sobe um servidor WSGI local e inclui HTTP e keep-alive na medição
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.bench_json import gerar_html
+
+# Peso de cada operação na mistura padrão
+MIX_PADRAO = {
+    'login': 1,
+    'salvar_projeto': 3,
+    'carregar_projeto': 5,
+    'listar_projetos': 3,
+    'comando': 2
+}
+
+SENHA = 'senha123'
+
+class TransporteCliente:
+    """Requisições pelo test client do Flask (um por thread)"""
+
+    def __init__(self, app):
+        self.cliente = app.test_client()
+
+    def requisitar(self, metodo, caminho, corpo=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        resposta = self.cliente.open(caminho, method=metodo, json=corpo, headers=headers)
+        try:
+            return resposta.status_code, resposta.get_json(silent=True)
+        finally:
+            resposta.close()
+
+    def fechar(self):
+        pass
+
+class TransporteSocket:
+    """Requisições HTTP/1.1 com keep-alive a um servidor local (uma conexão por thread)"""
+
+    def __init__(self, porta):
+        self.conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+
+    def requisitar(self, metodo, caminho, corpo=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        dados = json.dumps(corpo).encode('utf-8') if corpo is not None else None
+        self.conexao.request(metodo, caminho, body=dados, headers=headers)
+        resposta = self.conexao.getresponse()
+        conteudo = resposta.read()
+        try:
+            return resposta.status, json.loads(conteudo)
+        except ValueError:
+            return resposta.status, None
+
+    def fechar(self):
+        self.conexao.close()
+
+class UsuarioVirtual:
+    """Um usuário com seus projetos, executando operações sorteadas da mistura"""
+
+    def __init__(self, numero, transporte, html_base, semente):
+        self.email = f'carga{numero}@exemplo.com'
+        self.transporte = transporte
+        self.html_base = html_base
+        self.aleatorio = random.Random(semente)
+        self.token = None
+        self.projetos = []
+        self.salvamentos = 0
+
+    def preparar(self, projetos):
+        """Cadastra o usuário e cria seus projetos iniciais (fora da medição)"""
+        _, resposta = self.transporte.requisitar('POST', '/api/cadastro', {
+            'nome': self.email, 'email': self.email, 'senha': SENHA
+        })
+        self.token = resposta['dados']['token']
+        for i in range(projetos):
+            _, resposta = self.transporte.requisitar('POST', '/api/salvar_projeto', {
+                'titulo': f'Projeto {i}', 'conteudo_html': self.html_base
+            }, self.token)
+            self.projetos.append(resposta['dados']['id'])
+
+    def executar(self, operacao):
+        """
+        Executa uma operação
+
+        Returns:
+            bool: True se a resposta foi de sucesso
+        """
+        if operacao == 'login':
+            status, resposta = self.transporte.requisitar('POST', '/api/login', {
+                'email': self.email, 'senha': SENHA
+            })
+            if status == 200 and resposta and resposta.get('status') == 'success':
+                self.token = resposta['dados']['token']
+
+        elif operacao == 'salvar_projeto':
+            self.salvamentos += 1
+            status, resposta = self.transporte.requisitar('POST', '/api/salvar_projeto', {
+                'projeto_id': self.aleatorio.choice(self.projetos),
+                'titulo': 'Projeto',
+                'conteudo_html': f'{self.html_base}<!-- edição {self.salvamentos} -->'
+            }, self.token)
+
+        elif operacao == 'carregar_projeto':
+            status, resposta = self.transporte.requisitar(
+                'GET', f'/api/carregar_projeto/{self.aleatorio.choice(self.projetos)}',
+                token=self.token)
+
+        elif operacao == 'listar_projetos':
+            status, resposta = self.transporte.requisitar('GET', '/api/listar_projetos',
+                                                          token=self.token)
+
+        elif operacao == 'comando':
+            status, resposta = self.transporte.requisitar('POST', '/api/comando', {
+                'acao': 'carregar_projeto',
+                'projeto_id': self.aleatorio.choice(self.projetos)
+            }, self.token)
+
+        else:
+            raise ValueError(f"Operação desconhecida: {operacao}")
+
+        return status < 400 and bool(resposta) and resposta.get('status') == 'success'
+
+def interpretar_mix(texto):
+    """'login=1,carregar_projeto=5' -> {'login': 1, 'carregar_projeto': 5}"""
+    mix = {}
+    for item in texto.split(','):
+        nome, _, peso = item.partition('=')
+        nome = nome.strip()
+        if nome not in MIX_PADRAO:
+            raise ValueError(f"Operação desconhecida no mix: {nome}")
+        mix[nome] = float(peso or 1)
+    return mix
+
+def percentil(ordenados, p):
+    """Percentil pelo método nearest-rank de uma lista já ordenada"""
+    if not ordenados:
+        return 0.0
+    rank = math.ceil(p / 100 * len(ordenados))
+    return ordenados[max(0, min(len(ordenados), rank) - 1)]
+
+def resumir(latencias, erros, duracao):
+    """Estatísticas de uma lista de latências (ms)"""
+    ordenados = sorted(latencias)
+    total = len(ordenados)
+    return {
+        'requisicoes': total,
+        'erros': erros,
+        'taxa_erros': round(erros / total, 4) if total else 0.0,
+        'vazao_rps': round(total / duracao, 2),
+        'media_ms': round(sum(ordenados) / total, 3) if total else 0.0,
+        'p50_ms': round(percentil(ordenados, 50), 3),
+        'p95_ms': round(percentil(ordenados, 95), 3),
+        'p99_ms': round(percentil(ordenados, 99), 3),
+        'max_ms': round(ordenados[-1], 3) if total else 0.0
+    }
+
+def commit_atual():
+    """Hash do commit do repositório (None fora de um checkout git)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def executar_carga(args, diretorio):
+    """
+    Prepara o banco em `diretorio`, roda a carga e monta o relatório
+
+    Returns:
+        dict: Relatório (meta, total, endpoints)
+    """
+    # Antes de importar a aplicação: Config lê o ambiente na importação
+    os.environ['DATABASE_PATH'] = os.path.join(diretorio, 'carga.db')
+    os.environ.setdefault('SHARDS_DIR', os.path.join(diretorio, 'shards'))
+    os.environ.setdefault('ARQUIVOS_DIR', os.path.join(diretorio, 'conteudo'))
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    from main import create_app
+    from core.autosave import buffer_autosave
+    from werkzeug.serving import make_server
+
+    app = create_app()
+    servidor = None
+
+    if args.transporte == 'socket':
+        # Uma linha de log por requisição distorceria a medição
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        servidor = make_server('127.0.0.1', 0, app, threaded=True)
+        servidor.daemon_threads = True
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        novo_transporte = lambda: TransporteSocket(servidor.server_port)
+    else:
+        novo_transporte = lambda: TransporteCliente(app)
+
+    mix = interpretar_mix(args.mix)
+    operacoes, pesos = list(mix), list(mix.values())
+    html_base = gerar_html(args.tamanho)
+
+    usuarios = [UsuarioVirtual(i, novo_transporte(), html_base, args.semente + i)
+                for i in range(args.concorrencia)]
+    for usuario in usuarios:
+        usuario.preparar(args.projetos)
+
+    latencias = {operacao: [] for operacao in operacoes}
+    erros = {operacao: 0 for operacao in operacoes}
+    lock = threading.Lock()
+    inicio_medicao = time.monotonic() + args.aquecimento
+    fim = inicio_medicao + args.duracao
+
+    def trabalhar(usuario):
+        locais = {operacao: [] for operacao in operacoes}
+        erros_locais = {operacao: 0 for operacao in operacoes}
+        while True:
+            agora = time.monotonic()
+            if agora >= fim:
+                break
+            operacao = usuario.aleatorio.choices(operacoes, pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                sucesso = usuario.executar(operacao)
+            except Exception:
+                sucesso = False
+            decorrido = (time.perf_counter() - inicio) * 1000
+            if agora >= inicio_medicao:
+                locais[operacao].append(decorrido)
+                if not sucesso:
+                    erros_locais[operacao] += 1
+        with lock:
+            for operacao in operacoes:
+                latencias[operacao].extend(locais[operacao])
+                erros[operacao] += erros_locais[operacao]
+
+    threads = [threading.Thread(target=trabalhar, args=(usuario,)) for usuario in usuarios]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for usuario in usuarios:
+        usuario.transporte.fechar()
+    if servidor is not None:
+        servidor.shutdown()
+    # Grava o autosave pendente enquanto o banco temporário ainda existe
+    buffer_autosave.encerrar()
+
+    return {
+        'meta': {
+            'commit': commit_atual(),
+            'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'transporte': args.transporte,
+            'concorrencia': args.concorrencia,
+            'duracao_s': args.duracao,
+            'aquecimento_s': args.aquecimento,
+            'mix': mix,
+            'tamanho_kb': args.tamanho,
+            'projetos_por_usuario': args.projetos,
+            'semente': args.semente,
+            'encoder_json': getattr(app.json, 'encoder', 'stdlib'),
+            'armazenamento': app.config.get('ARMAZENAMENTO')
+        },
+        'total': resumir([l for lista in latencias.values() for l in lista],
+                         sum(erros.values()), args.duracao),
+        'endpoints': {operacao: resumir(latencias[operacao], erros[operacao], args.duracao)
+                      for operacao in operacoes}
+    }
+
+def imprimir(relatorio, anterior=None):
+    """Tabela do relatório; com `anterior`, mostra a variação de p95 e vazão"""
+    meta = relatorio['meta']
+    print(f"commit {meta['commit']}  transporte {meta['transporte']}  "
+          f"concorrência {meta['concorrencia']}  {meta['duracao_s']}s  html {meta['tamanho_kb']}KB")
+    print(f"{'endpoint':<18} {'req':>7} {'req/s':>9} {'erros':>7} "
+          f"{'p50':>8} {'p95':>8} {'p99':>8}" + ("   Δp95    Δreq/s" if anterior else ""))
+    print('-' * (72 + (18 if anterior else 0)))
+
+    linhas = list(relatorio['endpoints'].items()) + [('TOTAL', relatorio['total'])]
+    for nome, r in linhas:
+        linha = (f"{nome:<18} {r['requisicoes']:>7} {r['vazao_rps']:>9.1f} "
+                 f"{r['taxa_erros']:>6.1%} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+                 f"{r['p99_ms']:>8.2f}")
+        if anterior:
+            antes = anterior['total'] if nome == 'TOTAL' else anterior['endpoints'].get(nome)
+            if antes and antes['p95_ms'] and antes['vazao_rps']:
+                linha += (f" {r['p95_ms'] / antes['p95_ms'] - 1:>+7.1%}"
+                          f" {r['vazao_rps'] / antes['vazao_rps'] - 1:>+9.1%}")
+        print(linha)
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga ponta a ponta")
+    parser.add_argument('--transporte', choices=('cliente', 'socket'), default='cliente')
+    parser.add_argument('--concorrencia', type=int, default=8,
+                        help="Usuários virtuais simultâneos (uma thread cada)")
+    parser.add_argument('--duracao', type=float, default=10.0,
+                        help="Segundos de medição")
+    parser.add_argument('--aquecimento', type=float, default=1.0,
+                        help="Segundos iniciais descartados")
+    parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in MIX_PADRAO.items()),
+                        help="Pesos das operações: login, salvar_projeto, "
+                             "carregar_projeto, listar_projetos, comando")
+    parser.add_argument('--tamanho', type=int, default=32,
+                        help="Tamanho do HTML dos projetos em KB")
+    parser.add_argument('--projetos', type=int, default=5,
+                        help="Projetos criados por usuário virtual")
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--saida', help="Arquivo JSON do relatório")
+    parser.add_argument('--comparar', help="Relatório anterior para comparação")
+    args = parser.parse_args()
+
+    diretorio = tempfile.mkdtemp(prefix='carga-')
+    try:
+        relatorio = executar_carga(args, diretorio)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+
+    imprimir(relatorio, anterior)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+        print(f"\nRelatório gravado em {args.saida}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Emergency Backend - Micro-benchmarks
+Mede os caminhos quentes de tokens, execute_query, CRUD de Projeto e
+despacho de processar_comando em um banco temporário e compara com a
+baseline versionada em benchmarks/baselines/. Os caches ficam fora da
+medida (caminho frio), exceto em token.verificar_token_cache
+
+Uso:
+    python benchmarks/micro.py executar [--filtro token] [--saida resultado.json]
+    python benchmarks/micro.py comparar [--tolerancia 0.4] [--resultado resultado.json]
+    python benchmarks/micro.py baseline [--execucoes 3]
+
+`comparar` roda a suíte (ou lê --resultado) e sai com código 1 se algum
+benchmark ficar mais lento que a baseline além da tolerância. As baselines
+dependem da máquina: regrave-as (`baseline`) ao trocar de máquina de CI
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+BASELINE_PADRAO = os.path.join(RAIZ, 'benchmarks', 'baselines', 'micro.json')
+
+# Tempo alvo de cada repetição e número de repetições por benchmark
+TEMPO_REPETICAO = 0.1
+REPETICOES = 7
+
+HTML = '<!DOCTYPE html><html><body>' + '<p class="texto">Conteúdo do projeto</p>' * 200 + '</body></html>'
+
+def preparar_banco(diretorio):
+    """Aponta a configuração para `diretorio` e cria o schema"""
+    # Antes de importar os módulos da aplicação: Config lê o ambiente na importação
+    os.environ['DATABASE_PATH'] = os.path.join(diretorio, 'micro.db')
+    os.environ['SHARDS_DIR'] = os.path.join(diretorio, 'shards')
+    os.environ['ARQUIVOS_DIR'] = os.path.join(diretorio, 'conteudo')
+    os.environ['AUTOSAVE_HABILITADO'] = 'false'
+    # Caminhos frios: com os caches de projetos e de listagens os comandos
+    # mediriam só acertos de cache
+    os.environ['CACHE_PROJETOS_BYTES'] = '0'
+    os.environ['CACHE_LISTAGENS_USUARIOS'] = '0'
+
+    from database.db import init_database
+    init_database()
+
+def registrar_benchmarks():
+    """
+    Monta os benchmarks sobre um usuário e um projeto de teste
+
+    Returns:
+        dict: {nome: função sem argumentos}
+    """
+    from database.db import execute_query
+    from database.models import Usuario, Projeto
+    from utils.token_utils import gerar_token, verificar_token, _tokens_verificados
+    from core.interpreter import processar_comando
+
+    usuario = Usuario.criar_usuario('Micro', 'micro@exemplo.com', 'senha123')
+    usuario_id = usuario['id']
+    token = gerar_token(usuario_id)
+    projeto_id = Projeto.criar_projeto(usuario_id, 'Micro', HTML)['id']
+    for i in range(20):
+        Projeto.criar_projeto(usuario_id, f'Projeto {i}', HTML)
+
+    # Projetos excluídos ficam na tabela até a purga: os temporários são de
+    # outro usuário para não crescerem as listagens medidas nas passadas seguintes
+    temporarios_id = Usuario.criar_usuario('Micro', 'micro-temp@exemplo.com', 'senha123')['id']
+
+    contador = iter(range(10 ** 9))
+
+    def criar_e_deletar():
+        projeto = Projeto.criar_projeto(temporarios_id, 'Temporário', HTML)
+        Projeto.deletar_projeto(projeto['id'], temporarios_id)
+
+    def verificar_token_frio():
+        # Sem o cache de tokens verificados: decodificação e hash completos
+        _tokens_verificados.limpar()
+        return verificar_token(token)
+
+    def atualizar():
+        Projeto.atualizar_projeto(projeto_id, conteudo_html=f'{HTML}<!-- {next(contador)} -->',
+                                  usuario_id=usuario_id)
+
+    return {
+        'token.gerar_token': lambda: gerar_token(usuario_id),
+        'token.verificar_token': verificar_token_frio,
+        'token.verificar_token_cache': lambda: verificar_token(token),
+        'db.execute_query.select_um': lambda: execute_query(
+            "SELECT id, nome FROM usuarios WHERE id = ?", (usuario_id,), fetch_one=True),
+        'db.execute_query.select_lista': lambda: execute_query(
+            "SELECT id, titulo FROM projetos WHERE usuario_id = ?", (usuario_id,), fetch_all=True),
+        'projeto.buscar_por_id': lambda: Projeto.buscar_por_id(projeto_id, usuario_id),
+        'projeto.buscar_metadados': lambda: Projeto.buscar_metadados(projeto_id, usuario_id),
+        'projeto.listar_por_usuario': lambda: Projeto.listar_por_usuario(usuario_id),
+        'projeto.atualizar_projeto': atualizar,
+        'projeto.criar_e_deletar': criar_e_deletar,
+        'comando.acao_invalida': lambda: processar_comando(usuario_id, 'inexistente', {}),
+        'comando.carregar_projeto': lambda: processar_comando(
+            usuario_id, 'carregar_projeto', {'projeto_id': projeto_id}),
+        'comando.listar_projetos': lambda: processar_comando(usuario_id, 'listar_projetos', {})
+    }
+
+def medir(funcao):
+    """
+    Tempo por chamada em microssegundos
+
+    Calibra o número de chamadas para ~TEMPO_REPETICAO segundos e usa a
+    menor de REPETICOES repetições: o ruído (outros processos, flush do
+    disco) só soma tempo, então o mínimo é a estimativa mais estável
+    """
+    funcao()
+    chamadas = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            funcao()
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= TEMPO_REPETICAO / 10:
+            break
+        chamadas *= 10
+    chamadas = max(1, int(chamadas * TEMPO_REPETICAO / decorrido))
+
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            funcao()
+        tempos.append((time.perf_counter() - inicio) / chamadas * 1e6)
+
+    return min(tempos)
+
+def executar_suite(benchmarks, nomes):
+    """
+    Mede os benchmarks indicados
+
+    Returns:
+        dict: {nome: us_por_chamada}
+    """
+    resultados = {}
+    for nome in nomes:
+        resultados[nome] = round(medir(benchmarks[nome]), 2)
+        print(f"{nome:<32} {resultados[nome]:>12.2f} us")
+    return resultados
+
+def acima_da_tolerancia(resultados, baseline, tolerancia):
+    """Nomes dos benchmarks mais lentos que a baseline além da tolerância"""
+    return [nome for nome, tempo in resultados.items()
+            if baseline['resultados'].get(nome)
+            and tempo / baseline['resultados'][nome] - 1 > tolerancia]
+
+def comparar(resultados, baseline, tolerancia):
+    """
+    Imprime a variação de cada benchmark em relação à baseline
+
+    Returns:
+        list: Nomes dos benchmarks que regrediram além da tolerância
+    """
+    regressoes = acima_da_tolerancia(resultados, baseline, tolerancia)
+    print(f"\n{'benchmark':<32} {'baseline':>10} {'atual':>10} {'variação':>9}")
+    print('-' * 64)
+    for nome, tempo in resultados.items():
+        referencia = baseline['resultados'].get(nome)
+        if not referencia:
+            print(f"{nome:<32} {'-':>10} {tempo:>10.2f}      novo")
+            continue
+        marca = '  REGRESSÃO' if nome in regressoes else ''
+        print(f"{nome:<32} {referencia:>10.2f} {tempo:>10.2f} "
+              f"{tempo / referencia - 1:>+8.1%}{marca}")
+    return regressoes
+
+def gravar(resultado, caminho):
+    """Grava um resultado (ou baseline) em JSON"""
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        arquivo.write('\n')
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks dos caminhos quentes")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    executar = comandos.add_parser('executar', help="Roda a suíte e mostra os tempos")
+    executar.add_argument('--filtro', help="Só benchmarks cujo nome contém o texto")
+    executar.add_argument('--saida', help="Grava o resultado em JSON")
+
+    comparacao = comandos.add_parser('comparar', help="Compara com a baseline")
+    comparacao.add_argument('--baseline', default=BASELINE_PADRAO)
+    comparacao.add_argument('--tolerancia', type=float, default=0.4,
+                            help="Lentidão aceitável relativa à baseline (0.4 = 40%%)")
+    comparacao.add_argument('--resultado', help="Resultado já gravado (sem rodar a suíte)")
+    comparacao.add_argument('--filtro')
+
+    baseline = comandos.add_parser('baseline', help="Regrava a baseline")
+    baseline.add_argument('--saida', default=BASELINE_PADRAO)
+    baseline.add_argument('--execucoes', type=int, default=3,
+                          help="Passadas da suíte; a baseline guarda a mediana")
+
+    args = parser.parse_args()
+
+    referencia = None
+    if args.comando == 'comparar':
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            referencia = json.load(arquivo)
+
+    if args.comando == 'comparar' and args.resultado:
+        with open(args.resultado, encoding='utf-8') as arquivo:
+            resultados = json.load(arquivo)['resultados']
+    else:
+        inicio = time.monotonic()
+        diretorio = tempfile.mkdtemp(prefix='micro-')
+        try:
+            preparar_banco(diretorio)
+            benchmarks = registrar_benchmarks()
+            filtro = getattr(args, 'filtro', None)
+            nomes = [nome for nome in benchmarks if not filtro or filtro in nome]
+            resultados = executar_suite(benchmarks, nomes)
+
+            if args.comando == 'baseline' and args.execucoes > 1:
+                # Mediana entre passadas: a baseline não deve refletir um
+                # momento atipicamente rápido (ou lento) da máquina
+                passadas = [resultados]
+                for _ in range(args.execucoes - 1):
+                    print()
+                    passadas.append(executar_suite(benchmarks, nomes))
+                resultados = {nome: statistics.median(p[nome] for p in passadas)
+                              for nome in nomes}
+
+            if referencia is not None:
+                # Ruído pontual não conta como regressão: os suspeitos são
+                # medidos de novo e vale o melhor tempo
+                suspeitos = acima_da_tolerancia(resultados, referencia, args.tolerancia)
+                if suspeitos:
+                    print(f"\nConfirmando {len(suspeitos)} possíveis regressões...")
+                    for nome, tempo in executar_suite(benchmarks, suspeitos).items():
+                        resultados[nome] = min(resultados[nome], tempo)
+        finally:
+            from database.db import close_db_connection
+            close_db_connection()
+            shutil.rmtree(diretorio, ignore_errors=True)
+        print(f"\nSuíte executada em {time.monotonic() - inicio:.1f}s")
+
+    resultado = {
+        'meta': {
+            'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'maquina': platform.machine(),
+            'cpus': os.cpu_count()
+        },
+        'resultados': resultados
+    }
+
+    if args.comando == 'executar':
+        if args.saida:
+            gravar(resultado, args.saida)
+
+    elif args.comando == 'baseline':
+        gravar(resultado, args.saida)
+        print(f"Baseline gravada em {args.saida}")
+
+    else:
+        regressoes = comparar(resultados, referencia, args.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} regressões acima de {args.tolerancia:.0%}: "
+                  + ', '.join(regressoes))
+            sys.exit(1)
+        print(f"\nNenhuma regressão acima de {args.tolerancia:.0%}")
+
+if __name__ == '__main__':
+    main()
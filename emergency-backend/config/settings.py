@@ -14,7 +14,130 @@ class Config:
     
     # Configurações do banco de dados
     BASE_DIR = Path(__file__).parent.parent
-    DATABASE_PATH = BASE_DIR / 'database' / 'emergency_backend.db'
+    DATABASE_PATH = Path(os.environ.get('DATABASE_PATH', BASE_DIR / 'database' / 'emergency_backend.db'))
+    
+    # Sharding dos projetos por usuario_id. O shard 0 é o próprio DATABASE_PATH,
+    # que também guarda usuários e o mapa usuário -> shard; os demais são
+    # arquivos em SHARDS_DIR. Todos os processos devem usar o mesmo valor
+    NUM_SHARDS = int(os.environ.get('NUM_SHARDS', 1))
+    SHARDS_DIR = Path(os.environ.get('SHARDS_DIR', BASE_DIR / 'database' / 'shards'))
+    
+    # Tempo máximo (segundos) que uma requisição espera um usuário em
+    # movimento entre shards antes de falhar
+    SHARD_ESPERA_MOVIMENTO = float(os.environ.get('SHARD_ESPERA_MOVIMENTO', 10.0))
+    
+    # Onde novos salvamentos guardam o HTML: 'sqlite' (coluna conteudo_html)
+    # ou 'arquivos' (árvore em ARQUIVOS_DIR endereçada pelo hash do conteúdo).
+    # Projetos já gravados são lidos de onde estiverem; para converter os
+    # existentes use tools/migrar_armazenamento.py
+    ARMAZENAMENTO = os.environ.get('ARMAZENAMENTO', 'sqlite').lower()
+    ARQUIVOS_DIR = Path(os.environ.get('ARQUIVOS_DIR', BASE_DIR / 'database' / 'conteudo'))
+    
+    # Tempo (segundos) que o snapshot de /api/status permanece em cache
+    STATUS_CACHE_TTL_SECONDS = float(os.environ.get('STATUS_CACHE_TTL_SECONDS', 5))
+    
+    # Probes de saúde (/health/ready)
+    HEALTH_CACHE_SECONDS = float(os.environ.get('HEALTH_CACHE_SECONDS', 1))
+    HEALTH_DB_TIMEOUT_MS = int(os.environ.get('HEALTH_DB_TIMEOUT_MS', 250))
+    HEALTH_LATENCIA_DEGRADADO_MS = 50
+    HEALTH_LOCK_DEGRADADO_MS = 100
+    
+    # /metrics exige "Authorization: Bearer <METRICAS_TOKEN>"; sem o token
+    # definido, só responde a clientes na própria máquina (loopback)
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN') or None
+    
+    # Threads com conexões abertas que o processo comporta. Sem
+    # DB_MAX_CONEXOES, é a soma dos limites de ADMISSAO_CLASSES mais o pool do
+    # WebSocket (WS_WORKERS) e DB_CONEXOES_RESERVA (threads de background e
+    # rotas fora da admissão). A saturação só deixa o probe degradado
+    DB_MAX_CONEXOES = int(os.environ['DB_MAX_CONEXOES']) \
+        if os.environ.get('DB_MAX_CONEXOES') else None
+    DB_CONEXOES_RESERVA = 4
+    HEALTH_SATURACAO_DEGRADADO = 0.8
+    
+    # Escritor único por arquivo SQLite: as escritas dos modelos entram em uma
+    # fila e são confirmadas em grupo (um COMMIT para até ESCRITOR_LOTE_MAXIMO
+    # operações). As escritas que chegam durante um COMMIT já formam o próximo
+    # lote; ESCRITOR_ESPERA_MS > 0 faz a primeira operação esperar por outras
+    # (útil em discos com fsync lento)
+    ESCRITOR_HABILITADO = os.environ.get('ESCRITOR_HABILITADO', 'true').lower() == 'true'
+    ESCRITOR_LOTE_MAXIMO = int(os.environ.get('ESCRITOR_LOTE_MAXIMO', 64))
+    ESCRITOR_ESPERA_MS = float(os.environ.get('ESCRITOR_ESPERA_MS', 0))
+    
+    # Buffer de autosave: grava após AUTOSAVE_ATRASO_QUIETO segundos sem novos
+    # salvamentos do projeto, ou no máximo AUTOSAVE_ATRASO_MAXIMO após o primeiro
+    AUTOSAVE_HABILITADO = os.environ.get('AUTOSAVE_HABILITADO', 'true').lower() == 'true'
+    AUTOSAVE_ATRASO_QUIETO = float(os.environ.get('AUTOSAVE_ATRASO_QUIETO', 2.0))
+    AUTOSAVE_ATRASO_MAXIMO = float(os.environ.get('AUTOSAVE_ATRASO_MAXIMO', 10.0))
+    # Gravação que falha (banco travado, prazo vencido) fica no buffer e é
+    # repetida com espera exponencial a partir de AUTOSAVE_RETENTATIVA_BASE,
+    # limitada a AUTOSAVE_RETENTATIVA_MAXIMA segundos
+    AUTOSAVE_RETENTATIVA_BASE = float(os.environ.get('AUTOSAVE_RETENTATIVA_BASE', 0.5))
+    AUTOSAVE_RETENTATIVA_MAXIMA = float(os.environ.get('AUTOSAVE_RETENTATIVA_MAXIMA', 30.0))
+    
+    # Atraso da gravação em background que deixa o probe degradado/indisponível
+    AUTOSAVE_ATRASO_DEGRADADO = 5.0
+    AUTOSAVE_ATRASO_INDISPONIVEL = 30.0
+    
+    # Backend de utils/cache.py: 'local' (memória de cada processo) ou
+    # 'compartilhado' (arquivo SQLite visto por todos os workers do host, por
+    # padrão '<DATABASE_PATH>-cache'). Com o compartilhado, cada processo
+    # guarda localmente por até CACHE_COMPARTILHADO_TTL_LOCAL segundos e lê as
+    # invalidações dos outros a cada CACHE_INVALIDACAO_INTERVALO_MS
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'local').lower()
+    CACHE_COMPARTILHADO_PATH = Path(os.environ['CACHE_COMPARTILHADO_PATH']) \
+        if os.environ.get('CACHE_COMPARTILHADO_PATH') else None
+    CACHE_COMPARTILHADO_TIMEOUT = float(os.environ.get('CACHE_COMPARTILHADO_TIMEOUT', 1.0))
+    CACHE_COMPARTILHADO_TTL_LOCAL = float(os.environ.get('CACHE_COMPARTILHADO_TTL_LOCAL', 5.0))
+    CACHE_INVALIDACAO_INTERVALO_MS = float(os.environ.get('CACHE_INVALIDACAO_INTERVALO_MS', 100))
+    CACHE_LOCAL_MAX_ENTRADAS = int(os.environ.get('CACHE_LOCAL_MAX_ENTRADAS', 10000))
+    
+    # Usuários lidos por ID (validação de sessão) ficam em cache por
+    # CACHE_USUARIOS_TTL segundos; ultima_atividade é gravada no máximo uma
+    # vez a cada SESSAO_ATIVIDADE_INTERVALO segundos por usuário
+    CACHE_USUARIOS_TTL = float(os.environ.get('CACHE_USUARIOS_TTL', 60))
+    SESSAO_ATIVIDADE_INTERVALO = float(os.environ.get('SESSAO_ATIVIDADE_INTERVALO', 60))
+    
+    # Cache de projetos carregados (com HTML), limitado pelo total de bytes;
+    # 0 desliga. CACHE_PROJETOS_VALIDAR confere a versão no banco a cada
+    # acerto ('auto': só nos workers do pre-fork, que gravam no mesmo banco)
+    CACHE_PROJETOS_BYTES = int(os.environ.get('CACHE_PROJETOS_BYTES', 32 * 1024 * 1024))
+    CACHE_PROJETOS_VALIDAR = os.environ.get('CACHE_PROJETOS_VALIDAR', 'auto').lower()
+    
+    # Cache de listagens por (usuário, geração, página): usuários guardados
+    # (0 desliga o cache e o 304 da listagem) e gerações mantidas em memória
+    CACHE_LISTAGENS_USUARIOS = int(os.environ.get('CACHE_LISTAGENS_USUARIOS', 1024))
+    CACHE_LISTAGENS_GERACOES = int(os.environ.get('CACHE_LISTAGENS_GERACOES', 65536))
+    
+    # Exclusão lógica: projetos excluídos podem ser restaurados por
+    # EXCLUSAO_JANELA_RESTAURACAO segundos; depois a purga em background os
+    # remove em lotes de PURGA_LOTE (pausa de PURGA_PAUSA segundos entre
+    # lotes) a cada PURGA_INTERVALO segundos e devolve até
+    # PURGA_VACUUM_PAGINAS páginas livres por arquivo (auto_vacuum incremental)
+    EXCLUSAO_JANELA_RESTAURACAO = float(os.environ.get('EXCLUSAO_JANELA_RESTAURACAO', 86400))
+    PURGA_HABILITADA = os.environ.get('PURGA_HABILITADA', 'true').lower() == 'true'
+    PURGA_INTERVALO = float(os.environ.get('PURGA_INTERVALO', 60))
+    PURGA_LOTE = int(os.environ.get('PURGA_LOTE', 20))
+    PURGA_PAUSA = float(os.environ.get('PURGA_PAUSA', 0.05))
+    PURGA_VACUUM_PAGINAS = int(os.environ.get('PURGA_VACUUM_PAGINAS', 2048))
+    
+    # Paginação opcional de /api/listar_projetos
+    LISTAGEM_POR_PAGINA_MAXIMO = int(os.environ.get('LISTAGEM_POR_PAGINA_MAXIMO', 100))
+    
+    # Feed de eventos (SSE): eventos guardados por usuário para retomada via
+    # Last-Event-ID, fila por conexão e intervalo de heartbeat em segundos
+    EVENTOS_HISTORICO = int(os.environ.get('EVENTOS_HISTORICO', 100))
+    EVENTOS_FILA = int(os.environ.get('EVENTOS_FILA', 50))
+    EVENTOS_HEARTBEAT = float(os.environ.get('EVENTOS_HEARTBEAT', 15.0))
+    EVENTOS_MAX_CONEXOES_USUARIO = int(os.environ.get('EVENTOS_MAX_CONEXOES_USUARIO', 5))
+    
+    # Canal WebSocket (/api/ws): comandos simultâneos por conexão e threads
+    # do processo que executam os comandos de todas as conexões
+    WS_MAX_EM_VOO = int(os.environ.get('WS_MAX_EM_VOO', 8))
+    WS_WORKERS = int(os.environ.get('WS_WORKERS', 8))
+    
+    # Opções do servidor WebSocket (flask-sock); o ping mantém a conexão em proxies
+    SOCK_SERVER_OPTIONS = {'ping_interval': 25}
     
     # Configurações de segurança
     TOKEN_EXPIRATION_HOURS = 24
@@ -22,7 +145,87 @@ class Config:
     
     # Configurações do Flask
     JSON_SORT_KEYS = False
-    JSONIFY_PRETTYPRINT_REGULAR = True
+    JSONIFY_PRETTYPRINT_REGULAR = False
+    
+    # Encoder JSON: 'auto' (orjson se instalado), 'orjson' ou 'stdlib'
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+    
+    # Projetos com HTML a partir deste tamanho são enviados em streaming
+    JSON_STREAM_MIN_BYTES = int(os.environ.get('JSON_STREAM_MIN_BYTES', 64 * 1024))
+    JSON_STREAM_CHUNK_CHARS = 64 * 1024
+    
+    # Contabilidade de consultas por requisição: cabeçalhos X-DB-* e
+    # Server-Timing nas respostas (padrão: só com FLASK_DEBUG)
+    CONSULTAS_CABECALHOS = os.environ.get(
+        'CONSULTAS_CABECALHOS', os.environ.get('FLASK_DEBUG', 'false')).lower() == 'true'
+    
+    # A mesma instrução SQL executada tantas vezes em uma requisição é
+    # registrada como possível N+1
+    CONSULTAS_REPETIDAS_LIMITE = int(os.environ.get('CONSULTAS_REPETIDAS_LIMITE', 3))
+    
+    # Máximo de consultas por requisição em cada rota (endpoint do Flask);
+    # acima disso um aviso é registrado. Rotas ausentes não têm orçamento.
+    # Valores medidos + 1: a verificação única de sharding do processo e a
+    # leitura do mapa de shards (NUM_SHARDS > 1) cabem na folga
+    ORCAMENTO_CONSULTAS = {
+        'api.auth.cadastro': 2,
+        'api.auth.login': 3,
+        'api.routes.salvar_projeto_route': 5,
+        'api.routes.carregar_projeto_route': 4,
+        'api.routes.conteudo_projeto_route': 5,
+        'api.routes.listar_projetos_route': 4,
+        'api.routes.deletar_projeto_route': 4,
+        'api.routes.restaurar_projeto_route': 4,
+        'api.routes.comando_route': 6,
+        'api.routes.status_route': 2
+    }
+    
+    # Prazo de cada requisição dentro do SQLite, em segundos (None: sem
+    # prazo). Vencido esperando o lock a resposta é 503; interrompendo uma
+    # consulta, 504
+    PRAZO_PADRAO_SEGUNDOS = float(os.environ.get('PRAZO_PADRAO_SEGUNDOS', 10.0))
+    PRAZOS_ROTAS = {
+        'api.auth.cadastro': 5.0,
+        'api.auth.login': 5.0,
+        'api.routes.carregar_projeto_route': 5.0,
+        'api.routes.conteudo_projeto_route': 5.0,
+        'api.routes.listar_projetos_route': 5.0,
+        'api.routes.status_route': 2.0,
+        # O probe tem seus próprios limites (HEALTH_DB_TIMEOUT_MS)
+        'readiness_check': None,
+        'liveness_check': None
+    }
+    
+    # Controle de admissão: requisições simultâneas (limite), fila de espera
+    # (fila) e espera máxima na fila em segundos (espera) por classe de rota.
+    # Acima disso a resposta é 503 com Retry-After
+    ADMISSAO_HABILITADA = os.environ.get('ADMISSAO_HABILITADA', 'true').lower() == 'true'
+    ADMISSAO_RETRY_AFTER = int(os.environ.get('ADMISSAO_RETRY_AFTER', 1))
+    ADMISSAO_CLASSES = {
+        'auth': {'limite': 4, 'fila': 16, 'espera': 2.0},
+        'leitura': {'limite': 16, 'fila': 64, 'espera': 1.0},
+        'escrita': {'limite': 8, 'fila': 32, 'espera': 2.0},
+        'lote': {'limite': 2, 'fila': 8, 'espera': 5.0},
+        # /api/status responde do snapshot em memória: classe própria para não
+        # disputar vagas com carregar/listar durante um pico de leituras
+        'status': {'limite': 4, 'fila': 16, 'espera': 0.5}
+    }
+    
+    # Classe de cada rota (endpoint do Flask). Rotas ausentes não passam pelo
+    # controle (ex: /api/eventos, conexões SSE longas com limite próprio)
+    ADMISSAO_ROTAS = {
+        'api.auth.cadastro': 'auth',
+        'api.auth.login': 'auth',
+        'api.routes.carregar_projeto_route': 'leitura',
+        'api.routes.conteudo_projeto_route': 'leitura',
+        'api.routes.listar_projetos_route': 'leitura',
+        'api.routes.status_route': 'status',
+        'api.routes.salvar_projeto_route': 'escrita',
+        'api.routes.deletar_projeto_route': 'escrita',
+        'api.routes.restaurar_projeto_route': 'escrita',
+        # Canal genérico de comandos (várias ações, inclusive estatísticas)
+        'api.routes.comando_route': 'lote'
+    }
     
     # Configurações de CORS
     CORS_ORIGINS = ["*"]
@@ -37,9 +240,23 @@ class Config:
     }
     
     # Configurações de logging
-    LOG_LEVEL = "INFO"
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     
+    # 'json' (estruturado) ou 'texto' (LOG_FORMAT)
+    LOG_FORMATO = os.environ.get('LOG_FORMATO', 'json')
+    
+    # Registros aguardando a thread escritora; além disso são descartados
+    LOG_FILA_TAMANHO = int(os.environ.get('LOG_FILA_TAMANHO', 10000))
+    
+    # Fração de mensagens INFO mantidas por prefixo de logger (avisos/erros: sempre)
+    LOG_AMOSTRAGEM = {
+        'utils.token_utils': 0.01,
+        'utils.session': 0.01,
+        'core.actions': 0.1,
+        'core.interpreter': 0.1
+    }
+    
     @staticmethod
     def get_database_url():
         """Retorna a URL de conexão com o banco de dados"""
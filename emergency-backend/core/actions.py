@@ -4,44 +4,199 @@ Funções diretas para operações com projetos e usuários
 Todas as funções exigem autenticação
 """
 
-from database.models import Usuario, Projeto
+from database.models import (Usuario, Projeto, ConflitoVersaoError, BaseDivergenteError,
+                             SemAlteracaoError)
+from config.settings import Config
+from utils.patch_utils import calcular_hash, aplicar_patch, PatchInvalidoError
+from utils import metrics
+from .autosave import buffer_autosave
+from .cache_projetos import cache_projetos
+from .cache_listagens import cache_listagens
+from .eventos import (barramento, PROJETO_CRIADO, PROJETO_ATUALIZADO, PROJETO_DELETADO,
+                      PROJETO_RESTAURADO)
 import logging
 
 logger = logging.getLogger(__name__)
 
-def salvar_projeto(usuario_id, titulo, conteudo_html, projeto_id=None):
+def _estado_atual_projeto(usuario_id, projeto_id, com_conteudo=False):
+    """
+    Estado atual de um projeto do usuário (buffer de autosave ou banco)
+    
+    Args:
+        usuario_id (int): ID do proprietário
+        projeto_id (int): ID do projeto
+        com_conteudo (bool): Se o conteúdo HTML é necessário
+    
+    Returns:
+        dict: Projeto (com hash_conteudo) ou None se não encontrado
+    """
+    geracao = cache_projetos.geracao(projeto_id)
+    
+    projeto = buffer_autosave.obter(projeto_id, usuario_id)
+    if projeto:
+        return projeto
+    
+    if not com_conteudo:
+        return Projeto.buscar_metadados(projeto_id, usuario_id)
+    
+    return _buscar_projeto(usuario_id, projeto_id, geracao)
+
+def _buscar_projeto(usuario_id, projeto_id, geracao):
+    """
+    Projeto completo do usuário pelo cache de projetos ou pelo banco
+    
+    Args:
+        usuario_id (int): ID do proprietário
+        projeto_id (int): ID do projeto
+        geracao (tuple): cache_projetos.geracao() tomada antes de consultar
+                         o buffer de autosave
+    
+    Returns:
+        dict: Projeto (com hash_conteudo) ou None se não encontrado ou de
+              outro usuário
+    """
+    if cache_projetos.habilitado:
+        projeto = cache_projetos.obter(projeto_id, usuario_id)
+        if projeto is not None:
+            if not cache_projetos.validar:
+                return projeto
+            # Outros workers gravam no mesmo banco sem invalidar este cache
+            if Projeto.buscar_versao(projeto_id, usuario_id) == projeto['versao']:
+                return projeto
+            cache_projetos.invalidar(projeto_id)
+            geracao = cache_projetos.geracao(projeto_id)
+    
+    projeto = Projeto.buscar_por_id(projeto_id, usuario_id)
+    if not projeto or projeto['usuario_id'] != usuario_id:
+        return None
+    
+    if projeto['hash_conteudo'] is None:
+        # Projetos gravados antes da coluna existir
+        projeto['hash_conteudo'] = calcular_hash(projeto['conteudo_html'])
+    
+    if cache_projetos.habilitado:
+        cache_projetos.guardar(projeto, geracao)
+    
+    return projeto
+
+def _publicar_alteracao(tipo, projeto):
+    """Publica no feed de eventos os metadados (sem HTML) de um projeto salvo"""
+    barramento.publicar(projeto['usuario_id'], tipo, {
+        'id': projeto['id'],
+        'titulo': projeto['titulo'],
+        'versao': projeto['versao'],
+        'hash_conteudo': projeto['hash_conteudo'],
+        'data_modificacao': projeto['data_modificacao']
+    })
+
+def _sem_alteracao(atual, conteudo_html):
+    """Resposta de um salvamento que não muda nada: o estado atual, sem gravar"""
+    metrics.incrementar('salvamentos.sem_alteracao')
+    logger.info("Projeto %s sem alterações, nada a gravar", atual['id'])
+    return dict(atual, conteudo_html=conteudo_html)
+
+def salvar_projeto(usuario_id, titulo, conteudo_html, projeto_id=None, versao_esperada=None,
+                   salvar_agora=False, patch=None, hash_base=None):
     """
     Salva ou atualiza um projeto HTML no banco de dados
     
+    Atualizações passam pelo buffer de autosave, exceto com salvar_agora.
+    Em vez do HTML completo, uma atualização pode enviar um patch sobre o
+    conteúdo com hash hash_base. Salvamentos que não mudam título nem
+    conteúdo não gravam nada
+    
     Args:
         usuario_id (int): ID do usuário proprietário
         titulo (str): Título do projeto
-        conteudo_html (str): Conteúdo HTML completo
+        conteudo_html (str): Conteúdo HTML completo (None quando há patch)
         projeto_id (int, opcional): ID para atualização (None para novo)
+        versao_esperada (int, opcional): Versão carregada pelo cliente
+        salvar_agora (bool): Grava no banco antes de retornar
+        patch (list, opcional): Operações de patch (ver utils.patch_utils)
+        hash_base (str, opcional): Hash do conteúdo sobre o qual o patch foi gerado
     
     Returns:
         dict: Dados do projeto salvo ou None se erro
+    
+    Raises:
+        ConflitoVersaoError: Se o projeto mudou desde versao_esperada
+        BaseDivergenteError: Se hash_base não for o hash do conteúdo atual
+        PatchInvalidoError: Se o patch for malformado
     """
     try:
-        logger.info(f"Salvando projeto '{titulo}' para usuário {usuario_id}")
+        logger.info("Salvando projeto '%s' para usuário %s", titulo, usuario_id)
         
         if projeto_id:
+            if patch is not None or (Config.AUTOSAVE_HABILITADO and not salvar_agora):
+                # O patch precisa do conteúdo base e o buffer dos metadados
+                # do primeiro salvamento: a leitura prévia já seria feita
+                atual = _estado_atual_projeto(usuario_id, projeto_id,
+                                              com_conteudo=patch is not None)
+                if not atual:
+                    logger.warning("Projeto %s não encontrado para atualização", projeto_id)
+                    return None
+            else:
+                # HTML completo gravado agora: a comparação vai no próprio
+                # UPDATE (somente_se_alterado); só o buffer em memória é olhado
+                atual = buffer_autosave.obter(projeto_id, usuario_id)
+            
+            if patch is not None:
+                if hash_base != atual['hash_conteudo']:
+                    raise BaseDivergenteError(projeto_id, atual['hash_conteudo'], atual['versao'])
+                conteudo_html = aplicar_patch(atual['conteudo_html'], patch)
+            
+            hash_conteudo = calcular_hash(conteudo_html)
+            
+            if (atual is not None and hash_conteudo == atual['hash_conteudo']
+                    and titulo == atual['titulo']):
+                if versao_esperada is not None and versao_esperada != atual['versao']:
+                    raise ConflitoVersaoError(projeto_id, atual['versao'])
+                return _sem_alteracao(atual, conteudo_html)
+            
             # Atualizar projeto existente
-            projeto = Projeto.atualizar_projeto(projeto_id, titulo, conteudo_html)
+            if Config.AUTOSAVE_HABILITADO:
+                projeto = buffer_autosave.salvar(usuario_id, projeto_id, titulo, conteudo_html,
+                                                 versao_esperada, imediato=salvar_agora,
+                                                 hash_conteudo=hash_conteudo, metadados=atual)
+            else:
+                projeto = Projeto.atualizar_projeto(projeto_id, titulo, conteudo_html,
+                                                    usuario_id=usuario_id,
+                                                    versao_esperada=versao_esperada,
+                                                    hash_conteudo=hash_conteudo,
+                                                    somente_se_alterado=True)
+            # Depois da gravação: leituras que começaram antes dela não
+            # guardam mais o conteúdo antigo
+            cache_projetos.invalidar(projeto_id)
+            cache_listagens.avancar(usuario_id)
             if projeto:
-                logger.info(f"Projeto {projeto_id} atualizado com sucesso")
+                _publicar_alteracao(PROJETO_ATUALIZADO, projeto)
+                logger.info("Projeto %s atualizado com sucesso", projeto_id)
             else:
-                logger.warning(f"Projeto {projeto_id} não encontrado para atualização")
+                logger.warning("Projeto %s não encontrado para atualização", projeto_id)
         else:
             # Criar novo projeto
             projeto = Projeto.criar_projeto(usuario_id, titulo, conteudo_html)
+            cache_listagens.avancar(usuario_id)
             if projeto:
-                logger.info(f"Novo projeto criado com ID {projeto['id']}")
+                _publicar_alteracao(PROJETO_CRIADO, projeto)
+                logger.info("Novo projeto criado com ID %s", projeto['id'])
         
         return projeto
         
+    except SemAlteracaoError as e:
+        return _sem_alteracao(e.projeto, conteudo_html)
+    except ConflitoVersaoError as e:
+        logger.warning("Conflito de versão ao salvar projeto %s: versão atual %s",
+                       projeto_id, e.versao_atual)
+        raise
+    except BaseDivergenteError:
+        logger.warning("Patch do projeto %s gerado sobre conteúdo desatualizado", projeto_id)
+        raise
+    except PatchInvalidoError as e:
+        logger.warning("Patch inválido para o projeto %s: %s", projeto_id, e)
+        raise
     except Exception as e:
-        logger.error(f"Erro ao salvar projeto: {e}")
+        logger.error("Erro ao salvar projeto: %s", e)
         return None
 
 def carregar_projeto(usuario_id, projeto_id):
@@ -54,49 +209,134 @@ def carregar_projeto(usuario_id, projeto_id):
     
     Returns:
         dict: Dados do projeto ou None se não encontrado
+    
+    Raises:
+        ConflitoVersaoError: Se o autosave pendente do projeto encontrou
+                             conflito com outra sessão
     """
     try:
-        logger.info(f"Carregando projeto {projeto_id} para usuário {usuario_id}")
+        logger.info("Carregando projeto %s para usuário %s", projeto_id, usuario_id)
+        
+        geracao = cache_projetos.geracao(projeto_id)
+        
+        # Conteúdo ainda no buffer de autosave (read-your-writes)
+        projeto = buffer_autosave.obter(projeto_id, usuario_id)
+        if projeto:
+            logger.info("Projeto %s carregado do buffer de autosave", projeto_id)
+            return projeto
         
-        # Buscar projeto
-        projeto = Projeto.buscar_por_id(projeto_id)
+        # Buscar projeto (cache ou banco), só se pertencer ao usuário
+        projeto = _buscar_projeto(usuario_id, projeto_id, geracao)
         
         if not projeto:
-            logger.warning(f"Projeto {projeto_id} não encontrado")
+            logger.warning("Projeto %s não encontrado para o usuário %s", projeto_id, usuario_id)
+            return None
+        
+        logger.info("Projeto %s carregado com sucesso", projeto_id)
+        return projeto
+        
+    except ConflitoVersaoError as e:
+        logger.warning("Autosave do projeto %s em conflito: versão atual %s",
+                       projeto_id, e.versao_atual)
+        raise
+    except Exception as e:
+        logger.error("Erro ao carregar projeto: %s", e)
+        return None
+
+def obter_conteudo_projeto(usuario_id, projeto_id):
+    """
+    Localiza o HTML de um projeto para ser servido como arquivo
+    
+    Com o armazenamento de arquivos a rota entrega o próprio arquivo (sem
+    carregar o HTML no processo); senão, o conteúdo vem do buffer ou do banco
+    
+    Args:
+        usuario_id (int): ID do usuário
+        projeto_id (int): ID do projeto
+    
+    Returns:
+        dict: {'hash_conteudo', 'caminho', 'conteudo_html'} (um dos dois
+              últimos None) ou None se não encontrado
+    
+    Raises:
+        ConflitoVersaoError: Se o autosave pendente do projeto encontrou
+                             conflito com outra sessão
+    """
+    try:
+        pendente = buffer_autosave.obter(projeto_id, usuario_id)
+        if pendente:
+            return {
+                'hash_conteudo': pendente['hash_conteudo'],
+                'caminho': None,
+                'conteudo_html': pendente['conteudo_html']
+            }
+        
+        arquivo = Projeto.buscar_arquivo_conteudo(projeto_id, usuario_id)
+        if not arquivo:
             return None
         
-        # Verificar se o projeto pertence ao usuário
-        if projeto['usuario_id'] != usuario_id:
-            logger.warning(f"Usuário {usuario_id} tentou acessar projeto {projeto_id} de outro usuário")
+        if arquivo['caminho'] is not None:
+            return dict(arquivo, conteudo_html=None)
+        
+        projeto = _estado_atual_projeto(usuario_id, projeto_id, com_conteudo=True)
+        if not projeto:
             return None
         
-        logger.info(f"Projeto {projeto_id} carregado com sucesso")
-        return projeto
+        return {
+            'hash_conteudo': projeto['hash_conteudo'],
+            'caminho': None,
+            'conteudo_html': projeto['conteudo_html']
+        }
         
+    except ConflitoVersaoError:
+        raise
     except Exception as e:
-        logger.error(f"Erro ao carregar projeto: {e}")
+        logger.error("Erro ao obter conteúdo do projeto: %s", e)
         return None
 
-def listar_projetos(usuario_id):
+def listar_projetos(usuario_id, pagina=None, por_pagina=None, geracao=None):
     """
-    Lista todos os projetos de um usuário
+    Lista os projetos de um usuário (todos ou uma página)
+    
+    A listagem fica no cache de listagens até a próxima alteração de um
+    projeto do usuário
     
     Args:
         usuario_id (int): ID do usuário
+        pagina (int, opcional): Página a partir de 1 (None: todos os projetos)
+        por_pagina (int, opcional): Projetos por página (exigido com pagina)
+        geracao (int, opcional): cache_listagens.geracao() já tomada por quem
+                                 chamou (ex: a rota, para o ETag)
     
     Returns:
         list: Lista de projetos (sem conteúdo HTML completo)
     """
     try:
-        logger.info(f"Listando projetos do usuário {usuario_id}")
+        logger.info("Listando projetos do usuário %s", usuario_id)
         
-        projetos = Projeto.listar_por_usuario(usuario_id)
+        chave = (pagina, por_pagina) if pagina is not None else None
+        if cache_listagens.habilitado and geracao is None:
+            geracao = cache_listagens.geracao(usuario_id)
+        if geracao is not None:
+            projetos = cache_listagens.obter(usuario_id, geracao, chave)
+            if projetos is not None:
+                return projetos
         
-        logger.info(f"Encontrados {len(projetos)} projetos para usuário {usuario_id}")
+        if pagina is not None:
+            projetos = Projeto.listar_por_usuario(usuario_id, limite=por_pagina,
+                                                  deslocamento=(pagina - 1) * por_pagina)
+        else:
+            projetos = Projeto.listar_por_usuario(usuario_id)
+        projetos = buffer_autosave.sobrepor_listagem(usuario_id, projetos)
+        
+        if geracao is not None:
+            cache_listagens.guardar(usuario_id, geracao, chave, projetos)
+        
+        logger.info("Encontrados %s projetos para usuário %s", len(projetos), usuario_id)
         return projetos
         
     except Exception as e:
-        logger.error(f"Erro ao listar projetos: {e}")
+        logger.error("Erro ao listar projetos: %s", e)
         return []
 
 def deletar_projeto(usuario_id, projeto_id):
@@ -111,21 +351,64 @@ def deletar_projeto(usuario_id, projeto_id):
         bool: True se deletado, False caso contrário
     """
     try:
-        logger.info(f"Deletando projeto {projeto_id} do usuário {usuario_id}")
+        logger.info("Deletando projeto %s do usuário %s", projeto_id, usuario_id)
         
+        # O que está no buffer já foi confirmado ao cliente: vai para o banco
+        # antes da exclusão para que a restauração traga o último salvamento
+        try:
+            buffer_autosave.descarregar(projeto_id)
+        except ConflitoVersaoError:
+            # O conteúdo pendente perdeu para outra sessão; a exclusão segue
+            pass
         sucesso = Projeto.deletar_projeto(projeto_id, usuario_id)
         
         if sucesso:
-            logger.info(f"Projeto {projeto_id} deletado com sucesso")
+            cache_projetos.invalidar(projeto_id)
+            # Só salvamentos concorrentes com a própria exclusão
+            buffer_autosave.descartar(projeto_id)
+            cache_listagens.avancar(usuario_id)
+            barramento.publicar(usuario_id, PROJETO_DELETADO, {'id': projeto_id})
+            logger.info("Projeto %s deletado com sucesso", projeto_id)
         else:
-            logger.warning(f"Falha ao deletar projeto {projeto_id}")
+            logger.warning("Falha ao deletar projeto %s", projeto_id)
         
         return sucesso
         
     except Exception as e:
-        logger.error(f"Erro ao deletar projeto: {e}")
+        logger.error("Erro ao deletar projeto: %s", e)
         return False
 
+def restaurar_projeto(usuario_id, projeto_id):
+    """
+    Restaura um projeto excluído dentro da janela de restauração
+    
+    Args:
+        usuario_id (int): ID do usuário
+        projeto_id (int): ID do projeto
+    
+    Returns:
+        dict: Metadados do projeto restaurado ou None se não houver exclusão
+              restaurável (inexistente, de outro usuário ou já purgado)
+    """
+    try:
+        logger.info("Restaurando projeto %s do usuário %s", projeto_id, usuario_id)
+        
+        projeto = Projeto.restaurar_projeto(projeto_id, usuario_id)
+        
+        if projeto:
+            cache_projetos.invalidar(projeto_id)
+            cache_listagens.avancar(usuario_id)
+            _publicar_alteracao(PROJETO_RESTAURADO, projeto)
+            logger.info("Projeto %s restaurado com sucesso", projeto_id)
+        else:
+            logger.warning("Falha ao restaurar projeto %s", projeto_id)
+        
+        return projeto
+        
+    except Exception as e:
+        logger.error("Erro ao restaurar projeto: %s", e)
+        return None
+
 def obter_estatisticas_usuario(usuario_id):
     """
     Obtém estatísticas do usuário e seus projetos
@@ -137,7 +420,7 @@ def obter_estatisticas_usuario(usuario_id):
         dict: Estatísticas do usuário
     """
     try:
-        logger.info(f"Obtendo estatísticas do usuário {usuario_id}")
+        logger.info("Obtendo estatísticas do usuário %s", usuario_id)
         
         # Buscar dados do usuário
         usuario = Usuario.buscar_por_id(usuario_id)
@@ -172,11 +455,11 @@ def obter_estatisticas_usuario(usuario_id):
             }
         }
         
-        logger.info(f"Estatísticas obtidas para usuário {usuario_id}: {total_projetos} projetos")
+        logger.info("Estatísticas obtidas para usuário %s: %s projetos", usuario_id, total_projetos)
         return estatisticas
         
     except Exception as e:
-        logger.error(f"Erro ao obter estatísticas: {e}")
+        logger.error("Erro ao obter estatísticas: %s", e)
         return None
 
 def verificar_projeto_pertence_usuario(usuario_id, projeto_id):
@@ -191,7 +474,7 @@ def verificar_projeto_pertence_usuario(usuario_id, projeto_id):
         bool: True se o projeto pertence ao usuário
     """
     try:
-        projeto = Projeto.buscar_por_id(projeto_id)
+        projeto = Projeto.buscar_por_id(projeto_id, usuario_id)
         
         if not projeto:
             return False
@@ -199,7 +482,7 @@ def verificar_projeto_pertence_usuario(usuario_id, projeto_id):
         return projeto['usuario_id'] == usuario_id
         
     except Exception as e:
-        logger.error(f"Erro ao verificar propriedade do projeto: {e}")
+        logger.error("Erro ao verificar propriedade do projeto: %s", e)
         return False
 
 def obter_preview_projeto(usuario_id, projeto_id, max_chars=500):
@@ -235,5 +518,5 @@ def obter_preview_projeto(usuario_id, projeto_id, max_chars=500):
         }
         
     except Exception as e:
-        logger.error(f"Erro ao obter preview do projeto: {e}")
+        logger.error("Erro ao obter preview do projeto: %s", e)
         return None
\ No newline at end of file
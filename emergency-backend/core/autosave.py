@@ -0,0 +1,439 @@
+"""
+Emergency Backend - Buffer de Autosave
+Coalesce os salvamentos frequentes do editor por projeto: o conteúdo mais
+recente fica em memória e é gravado no SQLite após um período sem novos
+salvamentos ou ao atingir o atraso máximo
+"""
+
+import atexit
+import os
+import threading
+import time
+from config.settings import Config
+from database.models import Projeto, ConflitoVersaoError
+from utils.patch_utils import calcular_hash
+from utils import metrics
+from utils.health import registrar_verificacao, SAUDAVEL, DEGRADADO, INDISPONIVEL
+from .cache_listagens import cache_listagens
+import logging
+
+logger = logging.getLogger(__name__)
+
+class _Pendente:
+    """Último conteúdo ainda não gravado de um projeto"""
+
+    def __init__(self, metadados, titulo, conteudo_html, hash_conteudo, agora):
+        self.projeto_id = metadados['id']
+        self.usuario_id = metadados['usuario_id']
+        self.data_criacao = metadados['data_criacao']
+        # Versão gravada no banco; a gravação é condicional a ela
+        self.versao_base = metadados['versao']
+        self.versao = self.versao_base
+        self.primeiro = agora
+        # Primeiro salvamento depois da cópia tomada pela gravação em curso
+        self.primeiro_apos_copia = None
+        # Gravações que falharam seguidas e quando tentar de novo (monotonic)
+        self.tentativas = 0
+        self.proxima_tentativa = 0.0
+        # Versão do banco quando outro processo gravou o projeto antes; a
+        # entrada fica retida até o cliente receber o conflito
+        self.conflito = None
+        self.atualizar(titulo, conteudo_html, hash_conteudo, agora)
+
+    def atualizar(self, titulo, conteudo_html, hash_conteudo, agora):
+        self.titulo = titulo
+        self.conteudo_html = conteudo_html
+        self.hash_conteudo = hash_conteudo
+        self.versao += 1
+        self.ultimo = agora
+        if self.primeiro_apos_copia is None:
+            self.primeiro_apos_copia = agora
+        # Mesmo formato de CURRENT_TIMESTAMP do SQLite (UTC)
+        self.data_modificacao = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+    def prazo(self, atraso_quieto, atraso_maximo):
+        """Momento (monotonic) em que o conteúdo deve ser gravado"""
+        return min(self.ultimo + atraso_quieto, self.primeiro + atraso_maximo)
+
+    def proxima_gravacao(self, atraso_quieto, atraso_maximo):
+        """Prazo respeitando a espera entre tentativas (None: não gravar)"""
+        if self.conflito is not None:
+            return None
+        return max(self.prazo(atraso_quieto, atraso_maximo), self.proxima_tentativa)
+
+    def adiar(self, agora):
+        """Agenda a próxima tentativa depois de uma gravação que falhou"""
+        espera = Config.AUTOSAVE_RETENTATIVA_BASE * 2 ** self.tentativas
+        self.tentativas += 1
+        self.proxima_tentativa = agora + min(espera, Config.AUTOSAVE_RETENTATIVA_MAXIMA)
+
+    def como_projeto(self):
+        """Projeto como seria retornado por Projeto.buscar_por_id"""
+        return {
+            'id': self.projeto_id,
+            'usuario_id': self.usuario_id,
+            'titulo': self.titulo,
+            'conteudo_html': self.conteudo_html,
+            'data_criacao': self.data_criacao,
+            'data_modificacao': self.data_modificacao,
+            'versao': self.versao,
+            'hash_conteudo': self.hash_conteudo
+        }
+
+class BufferAutosave:
+    """
+    Buffer de escrita por projeto com gravação em background
+
+    Cada projeto tem no máximo uma entrada pendente; novos salvamentos
+    substituem o conteúdo e incrementam a versão em memória. Ao gravar,
+    o UPDATE é condicional à versão do banco e soma todas as versões
+    coalescidas de uma vez
+    """
+
+    def __init__(self, atraso_quieto, atraso_maximo):
+        self.atraso_quieto = atraso_quieto
+        self.atraso_maximo = atraso_maximo
+        self._pendentes = {}
+        self._cond = threading.Condition()
+        # Serializa gravações (thread de background, "salvar agora" e encerramento)
+        self._lock_gravacao = threading.Lock()
+        self._thread = None
+        self._ativo = True
+
+    def salvar(self, usuario_id, projeto_id, titulo, conteudo_html,
+               versao_esperada=None, imediato=False, hash_conteudo=None, metadados=None):
+        """
+        Registra um salvamento de projeto existente
+
+        Args:
+            usuario_id (int): ID do proprietário
+            projeto_id (int): ID do projeto
+            titulo (str): Título do projeto
+            conteudo_html (str): Conteúdo HTML completo
+            versao_esperada (int, opcional): Versão carregada pelo cliente
+            imediato (bool): Grava no banco antes de retornar ("salvar agora")
+            hash_conteudo (str, opcional): Hash já calculado de conteudo_html
+            metadados (dict, opcional): Metadados já lidos do banco (evita releitura)
+
+        Returns:
+            dict: Projeto com o conteúdo salvo ou None se não encontrado
+
+        Raises:
+            ConflitoVersaoError: Se a versão esperada não for a atual ou se
+                                 a gravação pendente encontrou conflito
+            SemAlteracaoError: Se imediato e nada mudou em relação ao banco
+        """
+        metrics.incrementar('autosave.salvamentos')
+
+        if hash_conteudo is None:
+            hash_conteudo = calcular_hash(conteudo_html)
+
+        while True:
+            with self._cond:
+                entrada = self._pendentes.get(projeto_id)
+                if entrada is not None:
+                    if entrada.usuario_id != usuario_id:
+                        return None
+                    self._entregar_conflito(entrada)
+                    if versao_esperada is not None and versao_esperada != entrada.versao:
+                        raise ConflitoVersaoError(projeto_id, entrada.versao)
+
+                    entrada.atualizar(titulo, conteudo_html, hash_conteudo, time.monotonic())
+                    metrics.incrementar('autosave.coalescidos')
+
+                    if not imediato:
+                        return entrada.como_projeto()
+
+            if entrada is not None:
+                try:
+                    return self._gravar(projeto_id)
+                except ConflitoVersaoError:
+                    with self._cond:
+                        self._entregar_conflito(entrada)
+                    raise
+
+            if imediato:
+                metrics.incrementar('autosave.gravacoes')
+                return Projeto.atualizar_projeto(projeto_id, titulo, conteudo_html,
+                                                 usuario_id=usuario_id,
+                                                 versao_esperada=versao_esperada,
+                                                 hash_conteudo=hash_conteudo,
+                                                 somente_se_alterado=True)
+
+            # Primeiro salvamento do período: uma leitura leve valida dono e versão
+            if metadados is None:
+                metadados = Projeto.buscar_metadados(projeto_id, usuario_id)
+            if not metadados:
+                return None
+            if versao_esperada is not None and versao_esperada != metadados['versao']:
+                raise ConflitoVersaoError(projeto_id, metadados['versao'])
+
+            with self._cond:
+                if projeto_id in self._pendentes:
+                    # Outra thread criou a entrada enquanto líamos o banco
+                    continue
+
+                entrada = _Pendente(metadados, titulo, conteudo_html, hash_conteudo,
+                                    time.monotonic())
+                self._pendentes[projeto_id] = entrada
+                metrics.definir('autosave.pendentes', len(self._pendentes))
+                self._garantir_thread()
+                self._cond.notify()
+                return entrada.como_projeto()
+
+    def obter(self, projeto_id, usuario_id):
+        """
+        Retorna o projeto pendente (read-your-writes) ou None
+
+        Args:
+            projeto_id (int): ID do projeto
+            usuario_id (int): ID do usuário que está lendo
+
+        Raises:
+            ConflitoVersaoError: Se a gravação pendente encontrou conflito
+                                 (a entrada é descartada)
+        """
+        with self._cond:
+            entrada = self._pendentes.get(projeto_id)
+            if entrada is None or entrada.usuario_id != usuario_id:
+                return None
+            self._entregar_conflito(entrada)
+            return entrada.como_projeto()
+
+    def sobrepor_listagem(self, usuario_id, projetos):
+        """Aplica os salvamentos pendentes sobre uma listagem vinda do banco"""
+        with self._cond:
+            if not self._pendentes:
+                return projetos
+
+            for projeto in projetos:
+                entrada = self._pendentes.get(projeto['id'])
+                if (entrada is not None and entrada.usuario_id == usuario_id
+                        and entrada.conflito is None):
+                    projeto['titulo'] = entrada.titulo
+                    projeto['versao'] = entrada.versao
+                    projeto['data_modificacao'] = entrada.data_modificacao
+                    projeto['tamanho_html'] = len(entrada.conteudo_html)
+
+        return projetos
+
+    def descarregar(self, projeto_id):
+        """
+        Grava agora a entrada pendente de um projeto (ex: antes de excluí-lo)
+        
+        Salvamentos já confirmados ao cliente chegam ao banco antes da marca de
+        exclusão, então uma restauração devolve o último conteúdo salvo
+        
+        Returns:
+            dict: Projeto gravado ou None se não havia entrada pendente
+        """
+        with self._cond:
+            if projeto_id not in self._pendentes:
+                return None
+        return self._gravar(projeto_id)
+    
+    def descartar(self, projeto_id):
+        """Remove o conteúdo pendente de um projeto (ex: projeto deletado)"""
+        with self._cond:
+            self._pendentes.pop(projeto_id, None)
+            metrics.definir('autosave.pendentes', len(self._pendentes))
+
+    def descarregar_tudo(self):
+        """Grava imediatamente todos os projetos pendentes"""
+        with self._cond:
+            projetos = list(self._pendentes)
+
+        for projeto_id in projetos:
+            try:
+                self._gravar(projeto_id)
+            except Exception as e:
+                logger.error("Erro ao gravar autosave do projeto %s: %s", projeto_id, e)
+
+    def encerrar(self):
+        """Para a thread de background e grava o que estiver pendente"""
+        with self._cond:
+            self._ativo = False
+            self._cond.notify_all()
+
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        self.descarregar_tudo()
+
+    def reiniciar_apos_fork(self):
+        """
+        Descarta o estado herdado do processo pai
+        
+        Os pendentes do pai continuam sendo dele (ele os grava no próprio
+        encerramento); a thread de gravação não existe no filho e é recriada
+        no primeiro salvamento
+        """
+        self._pendentes = {}
+        self._cond = threading.Condition()
+        self._lock_gravacao = threading.Lock()
+        self._thread = None
+        self._ativo = True
+    
+    def verificar_saude(self):
+        """Atraso da gravação em background, para o probe de prontidão"""
+        agora = time.monotonic()
+        with self._cond:
+            # Conta o atraso desde o prazo original, inclusive das retentativas;
+            # entradas em conflito esperam o cliente e não atrasam
+            atrasos = [agora - e.prazo(self.atraso_quieto, self.atraso_maximo)
+                       for e in self._pendentes.values() if e.conflito is None]
+            pendentes = len(self._pendentes)
+
+        atraso = max([0.0] + atrasos)
+        if atraso >= Config.AUTOSAVE_ATRASO_INDISPONIVEL:
+            estado = INDISPONIVEL
+        elif atraso >= Config.AUTOSAVE_ATRASO_DEGRADADO:
+            estado = DEGRADADO
+        else:
+            estado = SAUDAVEL
+
+        return {
+            "estado": estado,
+            "pendentes": pendentes,
+            "atraso_segundos": round(atraso, 3)
+        }
+
+    def _garantir_thread(self):
+        """Inicia a thread de gravação no primeiro uso (chamar com _cond)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._ativo = True
+            self._thread = threading.Thread(target=self._executar,
+                                            name='autosave-flusher', daemon=True)
+            self._thread.start()
+
+    def _executar(self):
+        """Loop da thread de background: grava entradas com prazo vencido"""
+        while True:
+            with self._cond:
+                while self._ativo:
+                    agora = time.monotonic()
+                    prazos = {pid: e.proxima_gravacao(self.atraso_quieto, self.atraso_maximo)
+                              for pid, e in self._pendentes.items()}
+                    prazos = {pid: prazo for pid, prazo in prazos.items() if prazo is not None}
+                    vencidos = [pid for pid, prazo in prazos.items() if prazo <= agora]
+                    if vencidos:
+                        break
+                    espera = min(prazos.values()) - agora if prazos else None
+                    self._cond.wait(espera)
+
+                if not self._ativo:
+                    return
+
+            for projeto_id in vencidos:
+                try:
+                    self._gravar(projeto_id)
+                except Exception as e:
+                    logger.error("Erro ao gravar autosave do projeto %s: %s", projeto_id, e)
+
+    def _entregar_conflito(self, entrada):
+        """Descarta a entrada em conflito e levanta o erro (chamar com _cond)"""
+        if entrada.conflito is None:
+            return
+        if self._pendentes.get(entrada.projeto_id) is entrada:
+            del self._pendentes[entrada.projeto_id]
+            metrics.definir('autosave.pendentes', len(self._pendentes))
+        raise ConflitoVersaoError(entrada.projeto_id, entrada.conflito)
+
+    def _gravar(self, projeto_id):
+        """
+        Grava a entrada pendente de um projeto e retorna o projeto salvo
+
+        A entrada só sai do buffer quando é gravada ou quando o projeto não
+        existe mais. Se a gravação falhar (banco travado, prazo vencido) ela
+        continua pendente e é repetida com espera exponencial; em conflito
+        de versão fica retida até o próximo salvamento ou carregamento
+
+        Returns:
+            dict: Projeto salvo ou None se não havia entrada ou o projeto não
+                  foi encontrado
+
+        Raises:
+            ConflitoVersaoError: Se outro processo gravou o projeto antes
+            Exception: O erro da gravação que falhou (a entrada é mantida)
+        """
+        with self._lock_gravacao:
+            with self._cond:
+                entrada = self._pendentes.get(projeto_id)
+                if entrada is None:
+                    return None
+                if entrada.conflito is not None:
+                    raise ConflitoVersaoError(projeto_id, entrada.conflito)
+                titulo = entrada.titulo
+                conteudo_html = entrada.conteudo_html
+                hash_conteudo = entrada.hash_conteudo
+                versao_base = entrada.versao_base
+                versao = entrada.versao
+                entrada.primeiro_apos_copia = None
+
+            try:
+                projeto = Projeto.atualizar_projeto(
+                    projeto_id, titulo, conteudo_html,
+                    usuario_id=entrada.usuario_id,
+                    versao_esperada=versao_base,
+                    incremento=versao - versao_base,
+                    hash_conteudo=hash_conteudo,
+                    propagar_erros=True
+                )
+            except ConflitoVersaoError as e:
+                # Outro processo gravou o projeto enquanto ele estava no buffer
+                logger.error("Autosave do projeto %s em conflito: versão %s no banco, esperada %s",
+                             projeto_id, e.versao_atual, versao_base)
+                metrics.incrementar('autosave.conflitos')
+                with self._cond:
+                    if self._pendentes.get(projeto_id) is entrada:
+                        entrada.conflito = e.versao_atual
+                # A listagem deixa de sobrepor a entrada em conflito
+                cache_listagens.avancar(entrada.usuario_id)
+                raise
+            except Exception as e:
+                logger.warning("Autosave do projeto %s não foi gravado (tentativa %s): %s",
+                               projeto_id, entrada.tentativas + 1, e)
+                metrics.incrementar('autosave.falhas')
+                with self._cond:
+                    if self._pendentes.get(projeto_id) is entrada:
+                        entrada.adiar(time.monotonic())
+                        self._cond.notify()
+                raise
+
+            with self._cond:
+                if self._pendentes.get(projeto_id) is entrada:
+                    if projeto is not None and entrada.versao != versao:
+                        # Novos salvamentos chegaram durante a gravação: o
+                        # atraso máximo conta a partir do primeiro deles
+                        entrada.versao_base = versao
+                        entrada.primeiro = entrada.primeiro_apos_copia
+                        entrada.tentativas = 0
+                        entrada.proxima_tentativa = 0.0
+                    else:
+                        # Gravada por completo ou projeto não encontrado
+                        del self._pendentes[projeto_id]
+                metrics.definir('autosave.pendentes', len(self._pendentes))
+
+            # A listagem deixa de sobrepor a entrada e passa a vir do banco
+            cache_listagens.avancar(entrada.usuario_id)
+
+            if projeto is not None:
+                metrics.incrementar('autosave.gravacoes')
+            else:
+                logger.warning("Autosave do projeto %s descartado: projeto não encontrado",
+                               projeto_id)
+
+            return projeto
+
+# Instância única do processo
+buffer_autosave = BufferAutosave(Config.AUTOSAVE_ATRASO_QUIETO, Config.AUTOSAVE_ATRASO_MAXIMO)
+
+registrar_verificacao('autosave', buffer_autosave.verificar_saude)
+
+# Nada pendente pode ficar para trás no encerramento do processo (inclusive
+# de cada worker, que herda este handler)
+atexit.register(buffer_autosave.encerrar)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=buffer_autosave.reiniciar_apos_fork)
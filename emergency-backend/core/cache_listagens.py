@@ -0,0 +1,169 @@
+"""
+Emergency Backend - Cache de Listagens
+Geração por usuário do conjunto de projetos e cache das listagens por
+(usuário, geração, página)
+
+Toda criação, atualização e exclusão de projeto avança a geração do dono
+depois de gravar. Listagens guardadas com uma geração antiga deixam de ser
+usadas sem precisar de invalidação, e o ETag da listagem (derivado da
+geração) permite responder 304 sem consultar o SQLite
+
+Com CACHE_BACKEND=compartilhado as gerações ficam no arquivo do cache
+compartilhado (utils/cache.py) e valem para todos os workers; com o backend
+local elas são do processo e o cache fica desligado nos workers do pre-fork
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from config.settings import Config
+from utils import metrics
+from utils.cache import criar_cache
+
+# Páginas guardadas por usuário (cada combinação pagina/por_pagina conta uma)
+_MAX_PAGINAS_USUARIO = 16
+
+class CacheListagens:
+    """Gerações por usuário e listagens da geração atual, em ordem LRU"""
+
+    def __init__(self, max_usuarios, max_geracoes):
+        self.max_usuarios = max_usuarios
+        self.max_geracoes = max_geracoes
+        self.habilitado = max_usuarios > 0
+        # usuario_id -> (geracao, {pagina: projetos})
+        self._listagens = OrderedDict()
+        # usuario_id -> geracao; quem não está no dict tem a geração _base
+        self._geracoes = {}
+        self._sequencia = 0
+        self._base = 0
+        # Distingue ETags de processos diferentes (e de reinícios)
+        self._token = os.urandom(4).hex()
+        self._lock = threading.Lock()
+        # Gerações de todos os workers (None com o backend local)
+        self._compartilhadas = criar_cache('geracoes_listagens')
+        if not self._compartilhadas.compartilhado:
+            self._compartilhadas = None
+        else:
+            self._token = None
+
+    def geracao(self, usuario_id):
+        """
+        Geração atual dos projetos do usuário (tomar antes de listar)
+
+        Returns:
+            int: Geração ou None se o cache compartilhado estiver inacessível
+                 (nesse caso a listagem vai ao banco e não há ETag)
+        """
+        if self._compartilhadas is not None:
+            return self._compartilhadas.contador(usuario_id)
+        with self._lock:
+            return self._geracoes.get(usuario_id, self._base)
+
+    def avancar(self, usuario_id):
+        """
+        Avança a geração do usuário; chamar depois de gravar a alteração
+
+        As gerações locais vêm de uma sequência única do processo, então uma
+        geração nunca se repete, nem depois de o dict ser esvaziado
+        """
+        if self._compartilhadas is not None:
+            self._compartilhadas.incrementar(usuario_id)
+            with self._lock:
+                self._listagens.pop(usuario_id, None)
+            metrics.incrementar('cache_listagens.geracoes')
+            return
+
+        with self._lock:
+            self._sequencia += 1
+            if len(self._geracoes) >= self.max_geracoes:
+                # Quem sair do dict passa à geração _base, maior que todas as anteriores
+                self._geracoes.clear()
+                self._base = self._sequencia
+            else:
+                self._geracoes[usuario_id] = self._sequencia
+            self._listagens.pop(usuario_id, None)
+        metrics.incrementar('cache_listagens.geracoes')
+
+    def etag(self, usuario_id, geracao):
+        """ETag das listagens do usuário na geração"""
+        if self._token is None:
+            self._token = self._token_compartilhado()
+        return f'{self._token}-{usuario_id}-{geracao}'
+
+    def _token_compartilhado(self):
+        """
+        Token dos ETags igual em todos os workers; um arquivo de cache novo
+        (gerações recomeçando do zero) gera outro token
+        """
+        self._compartilhadas.adicionar('token', os.urandom(4).hex())
+        return self._compartilhadas.obter('token') or os.urandom(4).hex()
+
+    def obter(self, usuario_id, geracao, pagina):
+        """
+        Listagem guardada para a geração e página
+
+        Returns:
+            list: Cópia da listagem ou None se não estiver no cache
+        """
+        with self._lock:
+            guardada = self._listagens.get(usuario_id)
+            projetos = None
+            if guardada is not None and guardada[0] == geracao:
+                projetos = guardada[1].get(pagina)
+                self._listagens.move_to_end(usuario_id)
+
+        metrics.incrementar('cache_listagens.acertos' if projetos is not None
+                            else 'cache_listagens.falhas')
+        if projetos is None:
+            return None
+        return [dict(projeto) for projeto in projetos]
+
+    def guardar(self, usuario_id, geracao, pagina, projetos):
+        """
+        Guarda uma listagem lida com a geração tomada antes da leitura
+
+        Uma listagem de geração que já não é a atual é descartada (com as
+        gerações compartilhadas ela só é guardada: obter() nunca a devolve
+        para a geração nova)
+        """
+        copia = [dict(projeto) for projeto in projetos]
+        with self._lock:
+            if (self._compartilhadas is None
+                    and geracao != self._geracoes.get(usuario_id, self._base)):
+                return
+
+            guardada = self._listagens.get(usuario_id)
+            if guardada is None or guardada[0] != geracao:
+                guardada = (geracao, {})
+                self._listagens[usuario_id] = guardada
+            paginas = guardada[1]
+            if len(paginas) >= _MAX_PAGINAS_USUARIO and pagina not in paginas:
+                paginas.clear()
+            paginas[pagina] = copia
+            self._listagens.move_to_end(usuario_id)
+
+            while len(self._listagens) > self.max_usuarios:
+                self._listagens.popitem(last=False)
+
+            total = len(self._listagens)
+        metrics.definir('cache_listagens.usuarios', total)
+
+    def reiniciar_apos_fork(self):
+        """
+        Com gerações locais, desliga o cache nos workers do pre-fork
+
+        Cada worker só veria as próprias alterações: uma geração que outro
+        worker não avançou serviria listagens (e 304) desatualizados
+        """
+        self._lock = threading.Lock()
+        self._listagens.clear()
+        self._geracoes.clear()
+        if self._compartilhadas is None:
+            self._token = os.urandom(4).hex()
+            self.habilitado = False
+
+# Instância única do processo
+cache_listagens = CacheListagens(Config.CACHE_LISTAGENS_USUARIOS, Config.CACHE_LISTAGENS_GERACOES)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=cache_listagens.reiniciar_apos_fork)
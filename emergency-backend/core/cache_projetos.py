@@ -0,0 +1,170 @@
+"""
+Emergency Backend - Cache de Projetos
+Projetos carregados recentemente (com o HTML) em memória, em ordem LRU e
+limitados pelo total de bytes de conteúdo, não pelo número de entradas
+
+As ações invalidam a entrada depois de cada gravação. Para que uma leitura
+concorrente não guarde o conteúdo antigo lido antes da gravação, cada
+projeto tem uma geração: quem vai ao banco guarda o resultado só se a
+geração não mudou desde antes de começar a leitura
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from config.settings import Config
+from utils import metrics
+
+# Custo fixo estimado de uma entrada (dict, metadados) além do HTML
+_BYTES_POR_ENTRADA = 512
+
+# Acima disso as gerações individuais são descartadas de uma vez (nova época)
+_MAX_GERACOES = 4096
+
+class CacheProjetos:
+    """LRU de projetos com orçamento de bytes"""
+
+    def __init__(self, limite_bytes, validar='auto'):
+        self.limite_bytes = limite_bytes
+        self._modo_validacao = validar
+        # Conferir a versão no banco antes de usar uma entrada
+        self.validar = validar == 'true'
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._geracoes = {}
+        self._epoca = 0
+        self._acertos = 0
+        self._falhas = 0
+        self._lock = threading.Lock()
+
+    @property
+    def habilitado(self):
+        return self.limite_bytes > 0
+
+    def geracao(self, projeto_id):
+        """
+        Marca a ser passada a guardar(); tomar antes de ler o banco (e antes
+        de consultar o buffer de autosave)
+        """
+        with self._lock:
+            return (self._epoca, self._geracoes.get(projeto_id, 0))
+
+    def obter(self, projeto_id, usuario_id):
+        """
+        Projeto em cache se pertencer ao usuário
+
+        A verificação de dono usa os metadados guardados: um projeto de outro
+        usuário é tratado como não encontrado, como na leitura do banco
+
+        Returns:
+            dict: Cópia do projeto, ou None se ausente ou de outro usuário
+        """
+        with self._lock:
+            entrada = self._entradas.get(projeto_id)
+            if entrada is None:
+                self._falhas += 1
+            else:
+                self._entradas.move_to_end(projeto_id)
+                self._acertos += 1
+            taxa = self._acertos / (self._acertos + self._falhas)
+
+        metrics.incrementar('cache_projetos.acertos' if entrada else 'cache_projetos.falhas')
+        metrics.definir('cache_projetos.taxa_acerto', round(taxa, 4))
+
+        if entrada is None:
+            return None
+        projeto = entrada[0]
+        if projeto['usuario_id'] != usuario_id:
+            return None
+        return dict(projeto)
+
+    def guardar(self, projeto, geracao):
+        """
+        Guarda um projeto lido do banco
+
+        Args:
+            projeto (dict): Projeto com conteudo_html
+            geracao (tuple): Valor de geracao() tomado antes da leitura
+
+        Returns:
+            bool: False se o projeto mudou durante a leitura ou não cabe no cache
+        """
+        tamanho = len(projeto['conteudo_html']) + _BYTES_POR_ENTRADA
+        if tamanho > self.limite_bytes:
+            return False
+
+        projeto_id = projeto['id']
+        removidas = 0
+
+        with self._lock:
+            if geracao != (self._epoca, self._geracoes.get(projeto_id, 0)):
+                return False
+
+            anterior = self._entradas.pop(projeto_id, None)
+            if anterior is not None:
+                self._bytes -= anterior[1]
+
+            self._entradas[projeto_id] = (dict(projeto), tamanho)
+            self._bytes += tamanho
+
+            while self._bytes > self.limite_bytes:
+                _, (_, tamanho_removido) = self._entradas.popitem(last=False)
+                self._bytes -= tamanho_removido
+                removidas += 1
+
+            total_bytes = self._bytes
+            total_entradas = len(self._entradas)
+
+        if removidas:
+            metrics.incrementar('cache_projetos.remocoes', removidas)
+        metrics.definir('cache_projetos.bytes', total_bytes)
+        metrics.definir('cache_projetos.entradas', total_entradas)
+        return True
+
+    def invalidar(self, projeto_id):
+        """Remove o projeto e descarta leituras em andamento dele"""
+        with self._lock:
+            entrada = self._entradas.pop(projeto_id, None)
+            if entrada is not None:
+                self._bytes -= entrada[1]
+
+            if len(self._geracoes) >= _MAX_GERACOES:
+                self._geracoes.clear()
+                self._epoca += 1
+            else:
+                self._geracoes[projeto_id] = self._geracoes.get(projeto_id, 0) + 1
+
+            total_bytes = self._bytes
+            total_entradas = len(self._entradas)
+
+        if entrada is not None:
+            metrics.incrementar('cache_projetos.invalidacoes')
+            metrics.definir('cache_projetos.bytes', total_bytes)
+            metrics.definir('cache_projetos.entradas', total_entradas)
+
+    def limpar(self):
+        """Esvazia o cache"""
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+            self._geracoes.clear()
+            self._epoca += 1
+
+    def reiniciar_apos_fork(self):
+        """
+        Cada worker começa com o cache vazio e um lock novo
+
+        Os workers gravam no mesmo banco sem avisar uns aos outros, então no
+        modo 'auto' passam a conferir a versão de cada entrada
+        """
+        self._lock = threading.Lock()
+        self.limpar()
+        self._acertos = self._falhas = 0
+        if self._modo_validacao == 'auto':
+            self.validar = True
+
+# Instância única do processo
+cache_projetos = CacheProjetos(Config.CACHE_PROJETOS_BYTES, Config.CACHE_PROJETOS_VALIDAR)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=cache_projetos.reiniciar_apos_fork)
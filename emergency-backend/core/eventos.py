@@ -0,0 +1,214 @@
+"""
+Emergency Backend - Barramento de Eventos
+Pub/sub em processo das alterações de projetos, consumido pelo feed SSE
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from config.settings import Config
+from utils import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tipos de evento publicados pelas ações de projeto
+PROJETO_CRIADO = 'projeto_criado'
+PROJETO_ATUALIZADO = 'projeto_atualizado'
+PROJETO_DELETADO = 'projeto_deletado'
+PROJETO_RESTAURADO = 'projeto_restaurado'
+
+# Enviado quando o cliente perdeu eventos e deve recarregar a listagem
+RESSINCRONIZAR = 'ressincronizar'
+
+class Assinatura:
+    """Conexão de um cliente ao feed de um usuário"""
+
+    def __init__(self, usuario_id, tamanho_fila):
+        self.usuario_id = usuario_id
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+
+    def entregar(self, evento):
+        """
+        Enfileira um evento sem bloquear quem publica
+
+        Com a fila cheia (consumidor lento) os eventos pendentes são
+        descartados e substituídos por um único evento de ressincronização
+
+        Returns:
+            bool: False se houve descarte
+        """
+        try:
+            self.fila.put_nowait(evento)
+            return True
+        except queue.Full:
+            descartados = 0
+            while True:
+                try:
+                    self.fila.get_nowait()
+                    descartados += 1
+                except queue.Empty:
+                    break
+            metrics.incrementar('eventos.descartados', descartados + 1)
+            self.fila.put_nowait(dict(evento, tipo=RESSINCRONIZAR, dados=None))
+            return False
+
+    def obter(self, timeout):
+        """Próximo evento ou None se nada chegar dentro do timeout"""
+        try:
+            return self.fila.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class BarramentoEventos:
+    """
+    Distribui eventos por usuário para as assinaturas ativas
+
+    Mantém os últimos eventos de cada usuário para retomar uma conexão a
+    partir do Last-Event-ID. Os ids têm a forma "<época>-<sequência>"; uma
+    época diferente (outro processo ou reinício) força a ressincronização
+    """
+
+    def __init__(self, tamanho_historico, tamanho_fila):
+        self.tamanho_historico = tamanho_historico
+        self.tamanho_fila = tamanho_fila
+        self._lock = threading.Lock()
+        self._epoca = f"{int(time.time()):x}{os.getpid():x}"
+        self._sequencia = 0
+        self._historico = {}
+        # Maior sequência já removida do histórico de cada usuário
+        self._descartado_ate = {}
+        self._assinaturas = {}
+
+    def reiniciar_apos_fork(self):
+        """
+        Cada worker tem seu próprio barramento: nova época (o pid mudou),
+        sem histórico nem assinaturas herdadas
+        """
+        self._lock = threading.Lock()
+        self._epoca = f"{int(time.time()):x}{os.getpid():x}"
+        self._sequencia = 0
+        self._historico = {}
+        self._descartado_ate = {}
+        self._assinaturas = {}
+
+    def _ler_id(self, ultimo_id):
+        """Sequência de um id desta época ou None"""
+        epoca, _, sequencia = str(ultimo_id).rpartition('-')
+        if epoca != self._epoca or not sequencia.isdigit():
+            return None
+        return int(sequencia)
+
+    def publicar(self, usuario_id, tipo, dados):
+        """
+        Publica um evento para todas as conexões do usuário
+
+        Args:
+            usuario_id (int): Dono do projeto alterado
+            tipo (str): Tipo do evento
+            dados (dict): Dados do evento (sem conteúdo HTML)
+
+        Returns:
+            dict: Evento publicado
+        """
+        with self._lock:
+            self._sequencia += 1
+            evento = {
+                'id': f"{self._epoca}-{self._sequencia}",
+                'sequencia': self._sequencia,
+                'tipo': tipo,
+                'dados': dados
+            }
+
+            historico = self._historico.get(usuario_id)
+            if historico is None:
+                historico = self._historico[usuario_id] = deque(maxlen=self.tamanho_historico)
+            if len(historico) == historico.maxlen:
+                self._descartado_ate[usuario_id] = historico[0]['sequencia']
+            historico.append(evento)
+
+            assinaturas = list(self._assinaturas.get(usuario_id, ()))
+
+        for assinatura in assinaturas:
+            assinatura.entregar(evento)
+
+        metrics.incrementar('eventos.publicados')
+        return evento
+
+    def assinar(self, usuario_id, ultimo_id=None):
+        """
+        Abre uma assinatura para o usuário
+
+        Args:
+            usuario_id (int): ID do usuário
+            ultimo_id (str, opcional): Último evento recebido (Last-Event-ID)
+
+        Returns:
+            Assinatura: Nova assinatura ou None se o limite de conexões foi atingido
+        """
+        assinatura = Assinatura(usuario_id, self.tamanho_fila)
+
+        with self._lock:
+            ativas = self._assinaturas.setdefault(usuario_id, set())
+            if len(ativas) >= Config.EVENTOS_MAX_CONEXOES_USUARIO:
+                return None
+            ativas.add(assinatura)
+            total = sum(len(a) for a in self._assinaturas.values())
+
+            if ultimo_id:
+                sequencia = self._ler_id(ultimo_id)
+
+                if sequencia is None or sequencia < self._descartado_ate.get(usuario_id, 0):
+                    # Id de outro processo ou anterior ao histórico guardado
+                    assinatura.entregar({
+                        'id': f"{self._epoca}-{self._sequencia}",
+                        'sequencia': self._sequencia,
+                        'tipo': RESSINCRONIZAR,
+                        'dados': None
+                    })
+                else:
+                    for evento in self._historico.get(usuario_id, ()):
+                        if evento['sequencia'] > sequencia:
+                            assinatura.entregar(evento)
+
+        metrics.definir('eventos.conexoes', total)
+        return assinatura
+
+    def cancelar(self, assinatura):
+        """Remove uma assinatura (cliente desconectou)"""
+        with self._lock:
+            ativas = self._assinaturas.get(assinatura.usuario_id)
+            if ativas is not None:
+                ativas.discard(assinatura)
+                if not ativas:
+                    del self._assinaturas[assinatura.usuario_id]
+
+        metrics.definir('eventos.conexoes', self.contar_assinaturas())
+
+    def contar_assinaturas(self):
+        """Total de conexões abertas no processo"""
+        with self._lock:
+            return sum(len(ativas) for ativas in self._assinaturas.values())
+
+def formatar_sse(evento):
+    """
+    Serializa um evento no formato text/event-stream
+
+    Args:
+        evento (dict): Evento com id, tipo e dados
+
+    Returns:
+        str: Bloco SSE terminado por linha em branco
+    """
+    return (f"id: {evento['id']}\n"
+            f"event: {evento['tipo']}\n"
+            f"data: {json.dumps(evento['dados'], separators=(',', ':'))}\n\n")
+
+# Instância única do processo
+barramento = BarramentoEventos(Config.EVENTOS_HISTORICO, Config.EVENTOS_FILA)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=barramento.reiniciar_apos_fork)
@@ -5,8 +5,11 @@ Recebe comandos via JSON e redireciona para actions.py
 
 from .actions import (
     salvar_projeto, carregar_projeto, listar_projetos, 
-    deletar_projeto, obter_estatisticas_usuario
+    deletar_projeto, restaurar_projeto, obter_estatisticas_usuario
 )
+from database.models import ConflitoVersaoError, BaseDivergenteError
+from utils.patch_utils import PatchInvalidoError
+from config.settings import Config
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,7 +27,7 @@ def processar_comando(usuario_id, acao, dados):
         dict: Resultado da operação com status, mensagem e dados
     """
     
-    logger.info(f"Processando comando: {acao} para usuário {usuario_id}")
+    logger.info("Processando comando: %s para usuário %s", acao, usuario_id)
     
     try:
         # Mapeamento de ações para funções
@@ -33,6 +36,7 @@ def processar_comando(usuario_id, acao, dados):
             'carregar_projeto': _processar_carregar_projeto,
             'listar_projetos': _processar_listar_projetos,
             'deletar_projeto': _processar_deletar_projeto,
+            'restaurar_projeto': _processar_restaurar_projeto,
             'estatisticas': _processar_estatisticas,
             'status_usuario': _processar_status_usuario
         }
@@ -47,11 +51,11 @@ def processar_comando(usuario_id, acao, dados):
         # Executar ação
         resultado = acoes_disponiveis[acao](usuario_id, dados)
         
-        logger.info(f"Comando {acao} executado com sucesso para usuário {usuario_id}")
+        logger.info("Comando %s executado com sucesso para usuário %s", acao, usuario_id)
         return resultado
         
     except Exception as e:
-        logger.error(f"Erro ao processar comando {acao}: {e}")
+        logger.error("Erro ao processar comando %s: %s", acao, e)
         return {
             'status': 'error',
             'mensagem': f'Erro interno ao processar comando: {str(e)}'
@@ -62,6 +66,10 @@ def _processar_salvar_projeto(usuario_id, dados):
     titulo = dados.get('titulo')
     conteudo_html = dados.get('conteudo_html')
     projeto_id = dados.get('projeto_id')
+    versao = dados.get('versao')
+    salvar_agora = bool(dados.get('salvar_agora', False))
+    patch = dados.get('patch')
+    hash_base = dados.get('hash_base')
     
     if not titulo:
         return {
@@ -69,13 +77,46 @@ def _processar_salvar_projeto(usuario_id, dados):
             'mensagem': 'Título é obrigatório'
         }
     
-    if not conteudo_html:
+    if patch is not None:
+        if not projeto_id or not hash_base:
+            return {
+                'status': 'error',
+                'mensagem': 'Patch exige projeto_id e hash_base'
+            }
+    elif not conteudo_html:
         return {
             'status': 'error',
             'mensagem': 'Conteúdo HTML é obrigatório'
         }
     
-    resultado = salvar_projeto(usuario_id, titulo, conteudo_html, projeto_id)
+    if versao is not None and (isinstance(versao, bool) or not isinstance(versao, int)):
+        return {
+            'status': 'error',
+            'mensagem': 'Versão deve ser um número inteiro'
+        }
+    
+    try:
+        resultado = salvar_projeto(usuario_id, titulo, conteudo_html, projeto_id, versao,
+                                   salvar_agora, patch, hash_base)
+    except ConflitoVersaoError as e:
+        return {
+            'status': 'error',
+            'mensagem': 'Projeto foi alterado em outra sessão',
+            'dados': {'versao_atual': e.versao_atual},
+            'codigo_http': 409
+        }
+    except BaseDivergenteError as e:
+        return {
+            'status': 'error',
+            'mensagem': 'Patch gerado sobre uma versão desatualizada do projeto',
+            'dados': {'hash_atual': e.hash_atual, 'versao_atual': e.versao_atual},
+            'codigo_http': 409
+        }
+    except PatchInvalidoError as e:
+        return {
+            'status': 'error',
+            'mensagem': f'Patch inválido: {e}'
+        }
     
     if resultado:
         return {
@@ -107,7 +148,15 @@ def _processar_carregar_projeto(usuario_id, dados):
             'mensagem': 'ID do projeto deve ser um número'
         }
     
-    resultado = carregar_projeto(usuario_id, projeto_id)
+    try:
+        resultado = carregar_projeto(usuario_id, projeto_id)
+    except ConflitoVersaoError as e:
+        return {
+            'status': 'error',
+            'mensagem': 'Projeto foi alterado em outra sessão',
+            'dados': {'versao_atual': e.versao_atual},
+            'codigo_http': 409
+        }
     
     if resultado:
         return {
@@ -122,8 +171,19 @@ def _processar_carregar_projeto(usuario_id, dados):
         }
 
 def _processar_listar_projetos(usuario_id, dados):
-    """Processa comando de listar projetos"""
-    projetos = listar_projetos(usuario_id)
+    """Processa comando de listar projetos (paginação opcional)"""
+    pagina = dados.get('pagina')
+    por_pagina = dados.get('por_pagina')
+    
+    if pagina is not None or por_pagina is not None:
+        if not all(isinstance(v, int) and not isinstance(v, bool) and v >= 1
+                   for v in (pagina, por_pagina)) or por_pagina > Config.LISTAGEM_POR_PAGINA_MAXIMO:
+            return {
+                'status': 'error',
+                'mensagem': 'pagina e por_pagina devem ser inteiros positivos'
+            }
+    
+    projetos = listar_projetos(usuario_id, pagina, por_pagina)
     
     return {
         'status': 'success',
@@ -162,6 +222,38 @@ def _processar_deletar_projeto(usuario_id, dados):
             'mensagem': 'Projeto não encontrado ou não autorizado'
         }
 
+def _processar_restaurar_projeto(usuario_id, dados):
+    """Processa comando de restaurar projeto deletado"""
+    projeto_id = dados.get('projeto_id')
+    
+    if not projeto_id:
+        return {
+            'status': 'error',
+            'mensagem': 'ID do projeto é obrigatório'
+        }
+    
+    try:
+        projeto_id = int(projeto_id)
+    except (ValueError, TypeError):
+        return {
+            'status': 'error',
+            'mensagem': 'ID do projeto deve ser um número'
+        }
+    
+    projeto = restaurar_projeto(usuario_id, projeto_id)
+    
+    if projeto:
+        return {
+            'status': 'success',
+            'mensagem': 'Projeto restaurado com sucesso',
+            'dados': projeto
+        }
+    else:
+        return {
+            'status': 'error',
+            'mensagem': 'Projeto não encontrado na lixeira ou prazo de restauração expirado'
+        }
+
 def _processar_estatisticas(usuario_id, dados):
     """Processa comando de obter estatísticas"""
     stats = obter_estatisticas_usuario(usuario_id)
@@ -208,6 +300,7 @@ def obter_acoes_disponiveis():
         'carregar_projeto', 
         'listar_projetos',
         'deletar_projeto',
+        'restaurar_projeto',
         'estatisticas',
         'status_usuario'
     ]
\ No newline at end of file
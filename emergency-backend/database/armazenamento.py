@@ -0,0 +1,183 @@
+"""
+Emergency Backend - Armazenamento de Conteúdo
+Onde fica o HTML dos projetos: na própria linha do SQLite ou em uma árvore
+de arquivos endereçada pelo hash do conteúdo
+
+Os metadados continuam sempre no SQLite. A coluna projetos.tamanho_arquivo
+indica onde está cada conteúdo: NULL para o HTML em conteudo_html, ou o
+tamanho (em caracteres) do HTML guardado no arquivo de hash_conteudo. O
+backend configurado só decide onde os novos salvamentos vão parar; a leitura
+segue o que cada linha indica, então os dois formatos convivem durante uma
+migração
+"""
+
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from config.settings import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Sufixo dos arquivos de conteúdo
+EXTENSAO = '.html'
+
+class ArmazenamentoSQLite:
+    """HTML guardado na coluna conteudo_html (comportamento original)"""
+
+    nome = 'sqlite'
+
+    def gravar(self, conteudo_html, hash_conteudo):
+        """
+        Prepara o conteúdo para o INSERT/UPDATE
+
+        Returns:
+            tuple: (valor de conteudo_html, valor de tamanho_arquivo)
+        """
+        return conteudo_html, None
+
+class ArmazenamentoArquivos:
+    """
+    HTML em arquivos endereçados pelo SHA-256: raiz/ab/cd/<hash>.html
+
+    Conteúdos iguais (entre versões ou projetos) ocupam um único arquivo.
+    Arquivos nunca são alterados depois de escritos; os que nenhuma linha
+    referencia mais são removidos pela coleta de tools/migrar_armazenamento.py
+    """
+
+    nome = 'arquivos'
+
+    def __init__(self, raiz):
+        self.raiz = Path(raiz)
+
+    def caminho(self, hash_conteudo):
+        """Caminho do arquivo de um conteúdo"""
+        return self.raiz / hash_conteudo[:2] / hash_conteudo[2:4] / (hash_conteudo + EXTENSAO)
+
+    def gravar(self, conteudo_html, hash_conteudo):
+        """
+        Escreve o conteúdo de forma atômica e prepara a linha do banco
+
+        O arquivo é escrito em um temporário no mesmo diretório, sincronizado
+        com fsync e renomeado (os.replace): um leitor nunca vê um arquivo
+        parcial. O diretório também é sincronizado depois da renomeação (e
+        cada diretório criado, no seu pai), senão uma queda de energia pode
+        perder a entrada já referenciada pela linha do banco. Se o arquivo
+        já existe, o conteúdo é o mesmo: só a data de modificação é renovada,
+        para a coleta não removê-lo
+
+        Returns:
+            tuple: ('' para conteudo_html, tamanho em caracteres)
+        """
+        destino = self.caminho(hash_conteudo)
+
+        try:
+            os.utime(destino)
+        except FileNotFoundError:
+            _criar_diretorios(destino.parent)
+            fd, temporario = tempfile.mkstemp(dir=destino.parent, prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as arquivo:
+                    arquivo.write(conteudo_html.encode('utf-8'))
+                    arquivo.flush()
+                    os.fsync(arquivo.fileno())
+                os.replace(temporario, destino)
+            except BaseException:
+                try:
+                    os.unlink(temporario)
+                except FileNotFoundError:
+                    pass
+                raise
+            _sincronizar_diretorio(destino.parent)
+
+        return '', len(conteudo_html)
+
+    def ler(self, hash_conteudo):
+        """
+        Lê um conteúdo mapeando o arquivo em memória (mmap)
+
+        A decodificação lê direto das páginas mapeadas, sem cópia
+        intermediária em bytes
+
+        Raises:
+            FileNotFoundError: Se o arquivo não existir
+        """
+        with open(self.caminho(hash_conteudo), 'rb') as arquivo:
+            if os.fstat(arquivo.fileno()).st_size == 0:
+                return ''
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                return str(mapa, 'utf-8')
+
+    def listar_hashes(self):
+        """Itera (hash, caminho) de todos os arquivos de conteúdo"""
+        for caminho in self.raiz.glob('*/*/*' + EXTENSAO):
+            yield caminho.name[:-len(EXTENSAO)], caminho
+
+def _sincronizar_diretorio(diretorio):
+    """fsync de um diretório (persiste as entradas criadas ou renomeadas nele)"""
+    if os.name == 'nt':
+        # Sem fsync de diretório no Windows (o NTFS registra o rename no journal)
+        return
+    fd = os.open(diretorio, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _criar_diretorios(diretorio):
+    """Cria o diretório e os pais ausentes, sincronizando cada entrada nova"""
+    novos = []
+    atual = diretorio
+    while not atual.exists():
+        novos.append(atual)
+        atual = atual.parent
+
+    for novo in reversed(novos):
+        try:
+            novo.mkdir()
+        except FileExistsError:
+            # Criado por outra escrita ao mesmo tempo; sincronizar de novo é inofensivo
+            pass
+        _sincronizar_diretorio(novo.parent)
+
+_sqlite = ArmazenamentoSQLite()
+_arquivos = None
+
+def armazenamento_arquivos():
+    """Backend de arquivos em Config.ARQUIVOS_DIR (usado na leitura mesmo com o SQLite ativo)"""
+    global _arquivos
+    if _arquivos is None or _arquivos.raiz != Path(Config.ARQUIVOS_DIR):
+        _arquivos = ArmazenamentoArquivos(Config.ARQUIVOS_DIR)
+    return _arquivos
+
+def armazenamento_ativo():
+    """
+    Backend que recebe os novos salvamentos (Config.ARMAZENAMENTO)
+
+    Returns:
+        ArmazenamentoSQLite ou ArmazenamentoArquivos
+    """
+    if Config.ARMAZENAMENTO == ArmazenamentoArquivos.nome:
+        return armazenamento_arquivos()
+    return _sqlite
+
+def hidratar_conteudo(projeto):
+    """
+    Preenche conteudo_html de uma linha de projetos guardada em arquivo
+
+    A coluna interna tamanho_arquivo é removida do dicionário
+
+    Args:
+        projeto (dict): Linha completa de projetos (SELECT *) ou None
+
+    Returns:
+        dict: O mesmo projeto, com o HTML
+    """
+    if projeto is None:
+        return None
+
+    if projeto.pop('tamanho_arquivo', None) is not None:
+        projeto['conteudo_html'] = armazenamento_arquivos().ler(projeto['hash_conteudo'])
+
+    return projeto
@@ -3,10 +3,16 @@ Emergency Backend - Gerenciador de Banco de Dados
 Responsável pela conexão e inicialização do SQLite
 """
 
+import os
 import sqlite3
 import threading
+import time
+import weakref
 from pathlib import Path
 from config.settings import Config
+from database.migrations import (migrar, versao_mais_recente, MIGRACOES_PRINCIPAL,
+                                 MIGRACOES_SHARD)
+from utils import consultas, prazos
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,40 +20,212 @@ logger = logging.getLogger(__name__)
 # Thread-local storage para conexões SQLite
 _local = threading.local()
 
-def get_db_connection():
+# INSERT/UPDATE/DELETE ... RETURNING existe a partir do SQLite 3.35
+SUPORTA_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Espera máxima pelo lock sem prazo de requisição (segundos)
+BUSY_TIMEOUT_PADRAO = 30.0
+
+# Instruções da VM do SQLite entre verificações do prazo da requisição
+_PASSOS_PROGRESSO = 1000
+
+# Diferença tolerada entre o busy_timeout da conexão e o prazo restante
+# antes de reconfigurá-lo (evita um PRAGMA por consulta)
+_TOLERANCIA_BUSY_MS = 50
+
+class _ConexoesDaThread(dict):
+    """shard -> conexão de uma thread (dict com weakref, ver _conexoes_vivas)"""
+
+    # Identidade, não conteúdo: dicts de threads diferentes nunca são iguais
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+# Conexões de cada thread, usado pelo probe de prontidão. Quando a thread
+# termina (no servidor threaded, uma por requisição) o thread-local é
+# descartado, as conexões são fechadas pelo coletor e saem da contagem
+_conexoes_vivas = weakref.WeakSet()
+_conexoes_lock = threading.Lock()
+
+# Snapshot em memória usado pela rota pública /api/status
+_info_cache = {'dados': None, 'expira_em': 0.0}
+_info_lock = threading.Lock()
+
+def _reiniciar_apos_fork():
+    """
+    Descarta o estado herdado do processo pai (modo multi-worker)
+    
+    Conexões SQLite não podem atravessar um fork: cada worker abre as suas
+    sob demanda na primeira consulta de cada thread
+    """
+    global _local, _conexoes_vivas, _conexoes_lock, _info_lock
+    
+    _local = threading.local()
+    _conexoes_vivas = weakref.WeakSet()
+    _conexoes_lock = threading.Lock()
+    _info_lock = threading.Lock()
+    _info_cache['dados'] = None
+    _info_cache['expira_em'] = 0.0
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
+
+def caminho_shard(shard):
+    """
+    Arquivo SQLite de um shard de projetos
+    
+    O shard 0 é o próprio banco principal (diretório de usuários); os demais
+    ficam em Config.SHARDS_DIR
+    
+    Args:
+        shard (int): Número do shard
+    
+    Returns:
+        Path: Caminho do arquivo
+    """
+    if shard == 0:
+        return Config.DATABASE_PATH
+    return Config.SHARDS_DIR / f"projetos_{shard}.db"
+
+def listar_shards():
+    """Shards existentes: 0..NUM_SHARDS-1 e arquivos de shards criados antes"""
+    shards = set(range(max(Config.NUM_SHARDS, 1)))
+    if Config.SHARDS_DIR.exists():
+        for arquivo in Config.SHARDS_DIR.glob('projetos_*.db'):
+            sufixo = arquivo.stem.rpartition('_')[2]
+            if sufixo.isdigit():
+                shards.add(int(sufixo))
+    return sorted(shards)
+
+def get_db_connection(shard=0):
     """
     Obtém uma conexão com o banco de dados
     Usa thread-local storage para segurança em threading
+    
+    Args:
+        shard (int): Shard de projetos (0 = banco principal)
     """
-    if not hasattr(_local, 'connection'):
+    conexoes = getattr(_local, 'conexoes', None)
+    if conexoes is None:
+        conexoes = _local.conexoes = _ConexoesDaThread()
+        with _conexoes_lock:
+            _conexoes_vivas.add(conexoes)
+        # busy_timeout atual de cada conexão (ver _ajustar_busy_timeout)
+        _local.busy_timeout_ms = {}
+    
+    conn = conexoes.get(shard)
+    if conn is None:
+        caminho = caminho_shard(shard)
+        
         # Garantir que o diretório existe
-        Config.ensure_database_directory()
+        caminho.parent.mkdir(parents=True, exist_ok=True)
         
         # Criar conexão
-        _local.connection = sqlite3.connect(
-            str(Config.DATABASE_PATH),
-            timeout=30.0,
+        conn = sqlite3.connect(
+            str(caminho),
+            timeout=BUSY_TIMEOUT_PADRAO,
             check_same_thread=False
         )
         
         # Configurar row factory para dicionários
-        _local.connection.row_factory = sqlite3.Row
+        conn.row_factory = sqlite3.Row
         
         # Habilitar foreign keys
-        _local.connection.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA foreign_keys = ON")
+        
+        # Interrompe a consulta quando o prazo da requisição vence
+        conn.set_progress_handler(prazos.vencido, _PASSOS_PROGRESSO)
         
-        logger.info(f"Nova conexão estabelecida: {Config.DATABASE_PATH}")
+        conexoes[shard] = conn
+        _local.busy_timeout_ms[shard] = int(BUSY_TIMEOUT_PADRAO * 1000)
+        
+        logger.info("Nova conexão estabelecida: %s", caminho)
     
-    return _local.connection
+    return conn
 
 def close_db_connection():
-    """Fecha a conexão atual se existir"""
-    if hasattr(_local, 'connection'):
-        _local.connection.close()
-        delattr(_local, 'connection')
+    """Fecha as conexões da thread atual (banco principal e shards)"""
+    conexoes = getattr(_local, 'conexoes', None)
+    if conexoes:
+        for conn in conexoes.values():
+            conn.close()
+        conexoes.clear()
         logger.info("Conexão com banco fechada")
 
-def execute_query(query, params=None, fetch_one=False, fetch_all=False):
+def contar_conexoes_abertas():
+    """Retorna quantas conexões thread-local estão abertas no processo (threads vivas)"""
+    with _conexoes_lock:
+        return sum(len(conexoes) for conexoes in list(_conexoes_vivas))
+
+def contar_threads_com_conexao():
+    """
+    Retorna quantas threads vivas têm conexões abertas
+    
+    Cada thread usa uma conexão por vez, mesmo com uma aberta por shard: é
+    esta contagem que se compara aos limites de requisições simultâneas
+    """
+    with _conexoes_lock:
+        return sum(1 for conexoes in list(_conexoes_vivas) if conexoes)
+
+def ping_database(timeout):
+    """
+    Verifica o banco com tempo limitado, sem usar a conexão da thread
+    
+    Executa uma leitura simples e mede quanto tempo leva para obter o
+    lock de escrita (BEGIN IMMEDIATE seguido de ROLLBACK)
+    
+    Args:
+        timeout (float): Orçamento máximo em segundos para cada etapa
+    
+    Returns:
+        dict: latencia_ms e espera_lock_ms; erro preenchido em caso de falha
+    """
+    resultado = {"latencia_ms": None, "espera_lock_ms": None, "erro": None}
+    conn = None
+    
+    try:
+        inicio = time.monotonic()
+        limite = inicio + timeout
+        
+        conn = sqlite3.connect(str(Config.DATABASE_PATH), timeout=timeout,
+                               isolation_level=None)
+        # Interrompe a leitura se estourar o orçamento
+        conn.set_progress_handler(lambda: 1 if time.monotonic() > limite else 0, 1000)
+        conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        resultado["latencia_ms"] = round((time.monotonic() - inicio) * 1000, 2)
+        
+        inicio_lock = time.monotonic()
+        conn.execute("BEGIN IMMEDIATE")
+        resultado["espera_lock_ms"] = round((time.monotonic() - inicio_lock) * 1000, 2)
+        conn.execute("ROLLBACK")
+        
+    except Exception as e:
+        resultado["erro"] = str(e)
+    finally:
+        if conn is not None:
+            conn.close()
+    
+    return resultado
+
+def _ajustar_busy_timeout(conn, shard, limite):
+    """
+    Limita a espera pelo lock ao prazo restante da requisição
+    
+    Sem prazo volta ao BUSY_TIMEOUT_PADRAO. O PRAGMA só é executado quando o
+    valor atual difere do desejado além de _TOLERANCIA_BUSY_MS
+    """
+    padrao_ms = int(BUSY_TIMEOUT_PADRAO * 1000)
+    if limite is None:
+        desejado_ms = padrao_ms
+    else:
+        desejado_ms = min(padrao_ms, max(1, int((limite - time.monotonic()) * 1000)))
+    
+    atual_ms = _local.busy_timeout_ms.get(shard, padrao_ms)
+    if abs(atual_ms - desejado_ms) > _TOLERANCIA_BUSY_MS:
+        conn.execute(f"PRAGMA busy_timeout = {desejado_ms}")
+        _local.busy_timeout_ms[shard] = desejado_ms
+
+def execute_query(query, params=None, fetch_one=False, fetch_all=False, commit=False,
+                  shard=0):
     """
     Executa uma query no banco de dados
     
@@ -56,12 +234,25 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False):
         params (tuple): Parâmetros para a query
         fetch_one (bool): Se deve retornar apenas um resultado
         fetch_all (bool): Se deve retornar todos os resultados
+        commit (bool): Confirma a transação após o fetch (escritas com RETURNING)
+        shard (int): Shard de projetos onde executar (0 = banco principal)
     
     Returns:
         Resultado da query ou cursor
+    
+    Raises:
+        PrazoExcedidoError: Se o prazo da requisição vencer antes ou durante
+            a query (espera pelo lock limitada ao tempo restante)
     """
-    conn = get_db_connection()
+    conn = get_db_connection(shard)
+    # Espera pelo lock limitada ao prazo; o progress handler da conexão
+    # interrompe a execução quando ele vence
+    limite = prazos.limite()
+    _ajustar_busy_timeout(conn, shard, limite)
+    
     cursor = conn.cursor()
+    inicio = time.perf_counter()
+    linhas = 0
     
     try:
         if params:
@@ -71,124 +262,210 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False):
         
         if fetch_one:
             result = cursor.fetchone()
+            if commit:
+                conn.commit()
+            linhas = 1 if result else 0
             return dict(result) if result else None
         elif fetch_all:
             results = cursor.fetchall()
+            if commit:
+                conn.commit()
+            linhas = len(results)
             return [dict(row) for row in results]
         else:
             conn.commit()
             return cursor
+    except sqlite3.IntegrityError:
+        # Violação de constraint é tratada por quem chamou (ex: email duplicado)
+        conn.rollback()
+        raise
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        if limite is not None:
+            mensagem = str(e)
+            if 'interrupted' in mensagem:
+                raise prazos.expirar(prazos.CONSULTA) from e
+            if 'locked' in mensagem or 'busy' in mensagem:
+                raise prazos.expirar(prazos.ESPERA_LOCK) from e
+        logger.error("Erro ao executar query: %s", e)
+        raise
     except Exception as e:
         conn.rollback()
-        logger.error(f"Erro ao executar query: {e}")
+        logger.error("Erro ao executar query: %s", e)
         raise
     finally:
         cursor.close()
+        # Contabilidade da requisição em andamento (nada fora de uma requisição)
+        consultas.registrar(query, time.perf_counter() - inicio, linhas)
 
-def init_database():
+def _habilitar_auto_vacuum(caminho):
     """
-    Inicializa o banco de dados criando todas as tabelas necessárias
+    Liga auto_vacuum = INCREMENTAL em um arquivo ainda sem tabelas
+    
+    Nesse modo a purga de projetos excluídos devolve as páginas livres ao
+    sistema com PRAGMA incremental_vacuum. O modo só muda com um VACUUM, que
+    em um arquivo vazio é instantâneo; bancos que já têm dados continuam
+    como estão (ver tools/manutencao.py auto-vacuum)
+    
+    Args:
+        caminho (Path): Arquivo SQLite
     """
-    logger.info("Inicializando banco de dados...")
+    conn = sqlite3.connect(str(caminho), timeout=BUSY_TIMEOUT_PADRAO, isolation_level=None)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return
+        if conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone() is None:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        else:
+            logger.info("%s sem auto_vacuum incremental: o espaço dos projetos purgados "
+                        "fica livre no arquivo (tools/manutencao.py auto-vacuum)", caminho.name)
+    finally:
+        conn.close()
+
+def inicializar_shard(shard):
+    """
+    Leva o schema de projetos de um shard separado (shard > 0) à versão atual
     
-    # Garantir que o diretório existe
-    Config.ensure_database_directory()
+    Args:
+        shard (int): Número do shard
+    """
+    caminho = caminho_shard(shard)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    _habilitar_auto_vacuum(caminho)
+    migrar(caminho, MIGRACOES_SHARD)
+
+def _inicializar_diretorio_shards(cursor):
+    """
+    Prepara o mapa usuário -> shard quando há mais de um shard
     
-    # Queries de criação das tabelas
-    create_tables_queries = [
-        # Tabela de usuários
-        """
-        CREATE TABLE IF NOT EXISTS usuarios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome VARCHAR(100) NOT NULL,
-            email VARCHAR(255) NOT NULL UNIQUE,
-            senha_hash VARCHAR(255) NOT NULL,
-            data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP,
-            ultima_atividade DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        """,
-        
-        # Tabela de projetos
-        """
-        CREATE TABLE IF NOT EXISTS projetos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            usuario_id INTEGER NOT NULL,
-            titulo VARCHAR(255) NOT NULL,
-            conteudo_html TEXT NOT NULL,
-            data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP,
-            data_modificacao DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (usuario_id) REFERENCES usuarios (id) ON DELETE CASCADE
-        )
-        """,
-        
-        # Índices para melhor performance
-        """
-        CREATE INDEX IF NOT EXISTS idx_usuarios_email ON usuarios(email)
-        """,
-        
-        """
-        CREATE INDEX IF NOT EXISTS idx_projetos_usuario ON projetos(usuario_id)
-        """,
-        
-        """
-        CREATE INDEX IF NOT EXISTS idx_projetos_titulo ON projetos(titulo)
-        """
-    ]
+    Todo projeto anterior ao sharding está no shard 0, então usuários ainda
+    sem mapeamento são fixados nele. Os IDs de projeto passam a vir de um
+    contador global, iniciado acima do maior ID existente em qualquer shard
+    """
+    cursor.execute("""
+        INSERT INTO shards_usuarios (usuario_id, shard)
+        SELECT id, 0 FROM usuarios
+        WHERE id NOT IN (SELECT usuario_id FROM shards_usuarios)
+    """)
     
-    # Executar queries de criação
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    maior_id = 0
+    for shard in listar_shards():
+        if shard > 0:
+            row = execute_query("SELECT MAX(id) AS maior FROM projetos", fetch_one=True,
+                                shard=shard)
+            maior_id = max(maior_id, row['maior'] or 0)
+    
+    cursor.execute("SELECT MAX(id) AS maior FROM projetos")
+    maior_id = max(maior_id, cursor.fetchone()['maior'] or 0)
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'projetos'")
+    row = cursor.fetchone()
+    maior_id = max(maior_id, row['seq'] if row else 0)
+    
+    cursor.execute("""
+        INSERT INTO contadores (nome, valor) VALUES ('projetos_ultimo_id', ?)
+        ON CONFLICT(nome) DO UPDATE SET valor = MAX(valor, excluded.valor)
+    """, (maior_id,))
+
+def init_database():
+    """
+    Inicializa o banco de dados aplicando as migrações pendentes
+    
+    O banco principal guarda usuários, o mapa de shards e o shard 0 de
+    projetos; com NUM_SHARDS > 1 os demais shards também são migrados. Com
+    todos os arquivos na versão atual, cada um custa só a leitura de
+    PRAGMA user_version
+    """
+    # Garantir que o diretório existe
+    Config.ensure_database_directory()
     
     try:
-        for query in create_tables_queries:
-            cursor.execute(query)
-        
-        conn.commit()
-        logger.info("Banco de dados inicializado com sucesso!")
-        
-        # Verificar se existem tabelas
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name NOT LIKE 'sqlite_%'
-        """)
-        
-        tables = cursor.fetchall()
-        logger.info(f"Tabelas criadas: {[table['name'] for table in tables]}")
+        # Shards separados primeiro: o diretório lê o maior ID de cada um
+        for shard in listar_shards():
+            if shard > 0:
+                inicializar_shard(shard)
         
+        _habilitar_auto_vacuum(Config.DATABASE_PATH)
+        aplicadas = migrar(Config.DATABASE_PATH, MIGRACOES_PRINCIPAL)
+        if aplicadas:
+            logger.info("Banco de dados migrado para a versão %s",
+                        versao_mais_recente(MIGRACOES_PRINCIPAL))
     except Exception as e:
-        conn.rollback()
-        logger.error(f"Erro ao inicializar banco: {e}")
+        logger.error("Erro ao inicializar banco: %s", e)
         raise
-    finally:
-        cursor.close()
-
-def get_database_info():
-    """Retorna informações sobre o banco de dados"""
-    try:
+    
+    if Config.NUM_SHARDS > 1:
         conn = get_db_connection()
         cursor = conn.cursor()
+        try:
+            _inicializar_diretorio_shards(cursor)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error("Erro ao preparar o diretório de shards: %s", e)
+            raise
+        finally:
+            cursor.close()
+
+def get_database_info():
+    """
+    Retorna informações sobre o banco de dados
+    
+    Os totais vêm da tabela contadores (mantida por triggers) e o resultado,
+    incluindo o tamanho do arquivo, fica em cache por STATUS_CACHE_TTL_SECONDS
+    
+    Returns:
+        dict: Informações do banco ou None se erro
+    """
+    agora = time.monotonic()
+    dados = _info_cache['dados']
+    if dados is not None and agora < _info_cache['expira_em']:
+        return dict(dados)
+    
+    with _info_lock:
+        # Outra thread pode ter renovado o snapshot enquanto esperávamos
+        agora = time.monotonic()
+        dados = _info_cache['dados']
+        if dados is not None and agora < _info_cache['expira_em']:
+            return dict(dados)
         
-        # Contar usuários
-        cursor.execute("SELECT COUNT(*) as count FROM usuarios")
-        usuarios_count = cursor.fetchone()['count']
-        
-        # Contar projetos
-        cursor.execute("SELECT COUNT(*) as count FROM projetos") 
-        projetos_count = cursor.fetchone()['count']
-        
-        # Tamanho do arquivo do banco
-        db_size = Config.DATABASE_PATH.stat().st_size if Config.DATABASE_PATH.exists() else 0
-        
-        cursor.close()
-        
-        return {
-            "database_path": str(Config.DATABASE_PATH),
-            "usuarios_total": usuarios_count,
-            "projetos_total": projetos_count,
-            "tamanho_db_bytes": db_size,
-            "tamanho_db_mb": round(db_size / (1024 * 1024), 2)
-        }
-        
-    except Exception as e:
-        logger.error(f"Erro ao obter informações do banco: {e}")
-        return None
\ No newline at end of file
+        try:
+            contadores = {
+                row['nome']: row['valor']
+                for row in execute_query("SELECT nome, valor FROM contadores", fetch_all=True)
+            }
+            
+            # Projetos e tamanho somados sobre todos os shards
+            projetos_total = contadores.get('projetos', 0)
+            db_size = 0
+            for shard in listar_shards():
+                caminho = caminho_shard(shard)
+                if caminho.exists():
+                    db_size += caminho.stat().st_size
+                if shard > 0:
+                    row = execute_query("SELECT valor FROM contadores WHERE nome = 'projetos'",
+                                        fetch_one=True, shard=shard)
+                    projetos_total += row['valor'] if row else 0
+            
+            dados = {
+                "database_path": str(Config.DATABASE_PATH),
+                "usuarios_total": contadores.get('usuarios', 0),
+                "projetos_total": projetos_total,
+                "shards": len(listar_shards()),
+                "tamanho_db_bytes": db_size,
+                "tamanho_db_mb": round(db_size / (1024 * 1024), 2)
+            }
+            
+            _info_cache['dados'] = dados
+            _info_cache['expira_em'] = agora + Config.STATUS_CACHE_TTL_SECONDS
+            return dict(dados)
+            
+        except Exception as e:
+            logger.error("Erro ao obter informações do banco: %s", e)
+            return None
+
+def invalidar_cache_info():
+    """Descarta o snapshot usado por get_database_info"""
+    with _info_lock:
+        _info_cache['dados'] = None
+        _info_cache['expira_em'] = 0.0
@@ -0,0 +1,304 @@
+"""
+Emergency Backend - Escritor Único
+Todas as escritas dos modelos em um arquivo SQLite passam por uma thread
+dedicada, que as confirma em grupo
+
+O SQLite aceita um escritor por vez: com cada thread do Flask escrevendo e
+confirmando por conta própria, as escritas disputam o lock (timeout de 30s)
+e cada uma paga seu próprio COMMIT (fsync). Aqui as operações entram em uma
+fila por arquivo; a thread do escritor junta as que chegaram até
+ESCRITOR_LOTE_MAXIMO ou ESCRITOR_ESPERA_MS e aplica todas em uma única
+transação, cada uma dentro de um SAVEPOINT: o erro de uma operação desfaz só
+ela e volta para quem a enviou, sem afetar as demais do lote
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from config.settings import Config
+from database.db import execute_query, caminho_shard
+from utils import metrics, consultas, prazos
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ResultadoEscrita:
+    """Resultado de uma escrita sem fetch (equivalente ao cursor de execute_query)"""
+
+    __slots__ = ('rowcount', 'lastrowid')
+
+    def __init__(self, rowcount, lastrowid):
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+
+class _Operacao:
+    """Uma escrita na fila e o future de quem a enviou"""
+
+    __slots__ = ('query', 'params', 'fetch_one', 'fetch_all', 'future')
+
+    def __init__(self, query, params, fetch_one, fetch_all):
+        self.query = query
+        self.params = params
+        self.fetch_one = fetch_one
+        self.fetch_all = fetch_all
+        self.future = Future()
+
+class EscritorUnico:
+    """
+    Thread que aplica as escritas de um arquivo SQLite em commits de grupo
+
+    A conexão é exclusiva da thread e trabalha em modo autocommit
+    (isolation_level=None): BEGIN IMMEDIATE, SAVEPOINTs e COMMIT são
+    explícitos. O future de cada operação só é completado depois do COMMIT
+    do lote, então quem espera por ele já lê o dado gravado
+    """
+
+    def __init__(self, caminho, lote_maximo, espera):
+        self.caminho = caminho
+        self.lote_maximo = max(1, lote_maximo)
+        self.espera = espera
+        # Tamanho do lote anterior: a espera só vale a pena com concorrência
+        self._ultimo_lote = 0
+        self._fila = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._executar,
+                                        name=f'escritor-{caminho.stem}', daemon=True)
+        self._thread.start()
+
+    def enviar(self, query, params=None, fetch_one=False, fetch_all=False):
+        """
+        Enfileira uma escrita
+
+        Returns:
+            Future: Resolve com dict (fetch_one), list (fetch_all) ou
+                    ResultadoEscrita; ou com a exceção da operação
+        """
+        operacao = _Operacao(query, params, fetch_one, fetch_all)
+        self._fila.put(operacao)
+        return operacao.future
+
+    def encerrar(self, timeout=5):
+        """Aplica o que já está na fila e para a thread"""
+        self._fila.put(None)
+        self._thread.join(timeout)
+
+    def _conectar(self):
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.caminho), timeout=30.0, isolation_level=None,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _proximo_lote(self):
+        """
+        Bloqueia até a primeira operação e junta as seguintes
+
+        As que já estão na fila entram sem espera. Só se o lote anterior teve
+        mais de uma operação (há escritores concorrentes) a primeira espera
+        até `espera` segundos por outras; um escritor isolado não paga atraso
+
+        Returns:
+            tuple: (operações, encerrar)
+        """
+        primeira = self._fila.get()
+        if primeira is None:
+            return [], True
+
+        lote = [primeira]
+        limite = time.monotonic() + (self.espera if self._ultimo_lote > 1 else 0)
+
+        while len(lote) < self.lote_maximo:
+            try:
+                restante = limite - time.monotonic()
+                if restante > 0:
+                    operacao = self._fila.get(timeout=restante)
+                else:
+                    operacao = self._fila.get_nowait()
+            except queue.Empty:
+                break
+
+            if operacao is None:
+                return lote, True
+            lote.append(operacao)
+
+        self._ultimo_lote = len(lote)
+        return lote, False
+
+    def _executar(self):
+        """Loop da thread: um lote por transação até o encerramento"""
+        conn = None
+        encerrar = False
+
+        while not encerrar:
+            lote, encerrar = self._proximo_lote()
+            if not lote:
+                continue
+
+            try:
+                if conn is None:
+                    conn = self._conectar()
+                self._aplicar(conn, lote)
+            except Exception as e:
+                # Falha do lote inteiro (lock, COMMIT, disco): todas as
+                # operações ainda sem resposta recebem o erro
+                logger.error("Erro no lote de %s escritas em %s: %s",
+                             len(lote), self.caminho.name, e)
+                metrics.incrementar('escritor.lotes_com_erro')
+                for operacao in lote:
+                    if not operacao.future.done():
+                        operacao.future.set_exception(e)
+                if conn is not None:
+                    conn.close()
+                    conn = None
+
+        if conn is not None:
+            conn.close()
+
+    def _aplicar(self, conn, lote):
+        """Executa o lote em uma transação e completa os futures após o COMMIT"""
+        inicio = time.perf_counter()
+        resultados = []
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for operacao in lote:
+                if not operacao.future.set_running_or_notify_cancel():
+                    # Cancelada na fila (prazo da requisição vencido)
+                    continue
+                conn.execute("SAVEPOINT operacao")
+                try:
+                    cursor = conn.execute(operacao.query, operacao.params or ())
+                    if operacao.fetch_one:
+                        row = cursor.fetchone()
+                        resultado = dict(row) if row else None
+                    elif operacao.fetch_all:
+                        resultado = [dict(row) for row in cursor.fetchall()]
+                    else:
+                        resultado = ResultadoEscrita(cursor.rowcount, cursor.lastrowid)
+                    cursor.close()
+                    conn.execute("RELEASE operacao")
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO operacao")
+                    conn.execute("RELEASE operacao")
+                    if not isinstance(e, sqlite3.IntegrityError):
+                        logger.error("Erro ao executar escrita: %s", e)
+                    operacao.future.set_exception(e)
+                    continue
+
+                resultados.append((operacao, resultado))
+
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+        for operacao, resultado in resultados:
+            operacao.future.set_result(resultado)
+
+        metrics.incrementar('escritor.commits')
+        metrics.incrementar('escritor.operacoes', len(lote))
+        metrics.observar('escritor.lote', len(lote), _BUCKETS_LOTE)
+        metrics.observar('escritor.commit_ms', (time.perf_counter() - inicio) * 1000)
+
+# Limites do histograma de operações por commit
+_BUCKETS_LOTE = (1, 2, 4, 8, 16, 32, 64, 128)
+
+_escritores = {}
+_escritores_lock = threading.Lock()
+_encerrado = False
+
+def _escritor(shard):
+    """Escritor do arquivo do shard, criado no primeiro uso"""
+    escritor = _escritores.get(shard)
+    if escritor is None:
+        with _escritores_lock:
+            escritor = _escritores.get(shard)
+            if escritor is None and not _encerrado:
+                escritor = _escritores[shard] = EscritorUnico(
+                    caminho_shard(shard), Config.ESCRITOR_LOTE_MAXIMO,
+                    Config.ESCRITOR_ESPERA_MS / 1000)
+    return escritor
+
+def executar_escrita(query, params=None, fetch_one=False, fetch_all=False, shard=0):
+    """
+    Executa uma escrita pelo escritor único do arquivo e espera o COMMIT
+
+    Mesma interface de execute_query para escritas: com fetch_one/fetch_all
+    (RETURNING) retorna dict/list; sem eles, um objeto com rowcount e
+    lastrowid. Com ESCRITOR_HABILITADO = false, ou depois do encerramento,
+    a escrita é feita direto na conexão da thread
+
+    Args:
+        query (str): INSERT, UPDATE ou DELETE (opcionalmente com RETURNING)
+        params (tuple): Parâmetros da query
+        fetch_one (bool): Retorna a primeira linha do RETURNING
+        fetch_all (bool): Retorna todas as linhas do RETURNING
+        shard (int): Shard de projetos onde executar (0 = banco principal)
+
+    Com prazo de requisição, a espera na fila é limitada ao tempo restante:
+    uma operação que ainda não começou é cancelada; uma que já está no lote
+    em execução termina com ele
+
+    Raises:
+        sqlite3.Error: O erro da própria operação (ex: IntegrityError)
+        PrazoExcedidoError: Se o prazo vencer antes da operação ser aplicada
+    """
+    escritor = _escritor(shard) if Config.ESCRITOR_HABILITADO else None
+    if escritor is None:
+        return execute_query(query, params, fetch_one=fetch_one, fetch_all=fetch_all,
+                             commit=True, shard=shard)
+
+    limite = prazos.limite()
+    inicio = time.perf_counter()
+    resultado = None
+    try:
+        future = escritor.enviar(query, params, fetch_one, fetch_all)
+        try:
+            resultado = future.result(
+                None if limite is None else max(0.0, limite - time.monotonic()))
+        except FuturesTimeoutError:
+            if future.cancel():
+                raise prazos.expirar(prazos.ESPERA_LOCK)
+            resultado = future.result()
+        return resultado
+    finally:
+        # Inclui a espera na fila e o COMMIT do lote: é o tempo que a
+        # requisição passou no banco
+        linhas = len(resultado) if fetch_all and resultado else int(bool(fetch_one and resultado))
+        consultas.registrar(query, time.perf_counter() - inicio, linhas)
+
+def encerrar():
+    """Para os escritores depois de aplicar as escritas já enfileiradas"""
+    global _encerrado
+
+    with _escritores_lock:
+        _encerrado = True
+        escritores = list(_escritores.values())
+        _escritores.clear()
+
+    for escritor in escritores:
+        escritor.encerrar()
+
+def _reiniciar_apos_fork():
+    """
+    Descarta os escritores herdados do processo pai
+
+    As threads não existem no filho; cada worker cria os seus no primeiro uso
+    """
+    global _escritores, _escritores_lock, _encerrado
+
+    _escritores = {}
+    _escritores_lock = threading.Lock()
+    _encerrado = False
+
+# Registrado antes do buffer de autosave (que importa os modelos), então roda
+# depois dele no encerramento: a última gravação do autosave ainda passa aqui
+atexit.register(encerrar)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
@@ -0,0 +1,300 @@
+"""
+Emergency Backend - Migrações de Schema
+Migrações versionadas e transacionais, controladas por PRAGMA user_version
+
+Cada arquivo SQLite guarda em user_version a última migração aplicada. Na
+inicialização basta ler esse número: se estiver na versão mais recente,
+nenhum DDL é executado. As migrações pendentes rodam em ordem, cada uma em
+sua própria transação junto com a atualização de user_version
+
+Bancos criados antes das migrações estão na versão 0 e já têm parte do
+schema, então as migrações até a versão que os cobre são idempotentes
+(IF NOT EXISTS, coluna adicionada só se ausente). Migrações novas podem
+assumir o schema da versão anterior
+
+O banco principal, os shards separados de projetos e o arquivo do cache
+compartilhado têm sequências próprias
+"""
+
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _adicionar_coluna_se_ausente(conn, tabela, coluna, definicao):
+    """Executa ALTER TABLE ADD COLUMN quando a coluna ainda não existe"""
+    colunas = {row[1] for row in conn.execute(f"PRAGMA table_info({tabela})")}
+    if coluna not in colunas:
+        conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+
+def _criar_projetos(conn, com_chave_estrangeira):
+    """Tabela de projetos original e seus índices"""
+    chave_estrangeira = """,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id) ON DELETE CASCADE""" \
+        if com_chave_estrangeira else ""
+
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS projetos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            titulo VARCHAR(255) NOT NULL,
+            conteudo_html TEXT NOT NULL,
+            data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            data_modificacao DATETIME DEFAULT CURRENT_TIMESTAMP{chave_estrangeira}
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_projetos_usuario ON projetos(usuario_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_projetos_titulo ON projetos(titulo)")
+
+def _criar_contador(conn, tabela):
+    """Contador de linhas de `tabela` mantido por triggers (evita COUNT(*))"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS contadores (
+            nome VARCHAR(50) PRIMARY KEY,
+            valor INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute(f"""
+        INSERT INTO contadores (nome, valor)
+        SELECT '{tabela}', (SELECT COUNT(*) FROM {tabela})
+        WHERE NOT EXISTS (SELECT 1 FROM contadores WHERE nome = '{tabela}')
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{tabela}_contador_insert
+        AFTER INSERT ON {tabela}
+        BEGIN
+            UPDATE contadores SET valor = valor + 1 WHERE nome = '{tabela}';
+        END
+    """)
+    # Em projetos, também disparado pelo ON DELETE CASCADE de usuarios
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{tabela}_contador_delete
+        AFTER DELETE ON {tabela}
+        BEGIN
+            UPDATE contadores SET valor = valor - 1 WHERE nome = '{tabela}';
+        END
+    """)
+
+# --- Banco principal (usuários, mapa de shards e shard 0 de projetos) ---
+
+def _principal_001_esquema_inicial(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome VARCHAR(100) NOT NULL,
+            email VARCHAR(255) NOT NULL UNIQUE,
+            senha_hash VARCHAR(255) NOT NULL,
+            data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            ultima_atividade DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    _criar_projetos(conn, com_chave_estrangeira=True)
+
+def _principal_002_contadores(conn):
+    _criar_contador(conn, 'usuarios')
+    _criar_contador(conn, 'projetos')
+
+def _projetos_versao(conn):
+    _adicionar_coluna_se_ausente(conn, 'projetos', 'versao', 'INTEGER NOT NULL DEFAULT 1')
+
+def _projetos_hash_conteudo(conn):
+    _adicionar_coluna_se_ausente(conn, 'projetos', 'hash_conteudo', 'VARCHAR(64)')
+
+def _principal_005_shards_usuarios(conn):
+    # movendo = 1 enquanto o rebalanceamento copia os projetos do usuário
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS shards_usuarios (
+            usuario_id INTEGER PRIMARY KEY,
+            shard INTEGER NOT NULL,
+            movendo INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+def _projetos_tamanho_arquivo(conn):
+    # NULL: HTML em conteudo_html; senão, no armazenamento de arquivos
+    _adicionar_coluna_se_ausente(conn, 'projetos', 'tamanho_arquivo', 'INTEGER')
+
+def _principal_007_remover_idx_usuarios_email(conn):
+    # A constraint UNIQUE de email já cria um índice (sqlite_autoindex_usuarios_1)
+    conn.execute("DROP INDEX IF EXISTS idx_usuarios_email")
+
+def _projetos_exclusao_logica(conn):
+    # Projetos excluídos ficam em uma tabela à parte até a purga: marcar a
+    # própria linha reescreveria o HTML (cadeia de páginas de overflow)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS projetos_excluidos (
+            projeto_id INTEGER PRIMARY KEY,
+            usuario_id INTEGER NOT NULL,
+            deletado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_projetos_excluidos_deletado_em
+        ON projetos_excluidos(deletado_em)
+    """)
+    # O contador de projetos conta só os vivos: a exclusão lógica desconta,
+    # a restauração devolve e a purga (linha já descontada) não mexe nele
+    conn.execute("DROP TRIGGER IF EXISTS trg_projetos_contador_delete")
+    conn.execute("""
+        CREATE TRIGGER trg_projetos_contador_delete
+        AFTER DELETE ON projetos
+        BEGIN
+            UPDATE contadores SET valor = valor - 1 WHERE nome = 'projetos'
+                AND NOT EXISTS (SELECT 1 FROM projetos_excluidos WHERE projeto_id = OLD.id);
+            DELETE FROM projetos_excluidos WHERE projeto_id = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_projetos_excluidos_insert
+        AFTER INSERT ON projetos_excluidos
+        BEGIN
+            UPDATE contadores SET valor = valor - 1 WHERE nome = 'projetos';
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_projetos_excluidos_delete
+        AFTER DELETE ON projetos_excluidos
+        WHEN EXISTS (SELECT 1 FROM projetos WHERE id = OLD.projeto_id)
+        BEGIN
+            UPDATE contadores SET valor = valor + 1 WHERE nome = 'projetos';
+        END
+    """)
+
+MIGRACOES_PRINCIPAL = [
+    (1, "esquema inicial", _principal_001_esquema_inicial),
+    (2, "contadores mantidos por triggers", _principal_002_contadores),
+    (3, "projetos.versao", _projetos_versao),
+    (4, "projetos.hash_conteudo", _projetos_hash_conteudo),
+    (5, "mapa usuário -> shard", _principal_005_shards_usuarios),
+    (6, "projetos.tamanho_arquivo", _projetos_tamanho_arquivo),
+    (7, "remove idx_usuarios_email redundante", _principal_007_remover_idx_usuarios_email),
+    (8, "exclusão lógica de projetos", _projetos_exclusao_logica),
+]
+
+# --- Shards separados de projetos (shard > 0) ---
+
+def _shard_001_projetos(conn):
+    # Shards não têm a tabela usuarios: sem chave estrangeira
+    _criar_projetos(conn, com_chave_estrangeira=False)
+    _criar_contador(conn, 'projetos')
+
+MIGRACOES_SHARD = [
+    (1, "projetos e contador", _shard_001_projetos),
+    (2, "projetos.versao", _projetos_versao),
+    (3, "projetos.hash_conteudo", _projetos_hash_conteudo),
+    (4, "projetos.tamanho_arquivo", _projetos_tamanho_arquivo),
+    (5, "exclusão lógica de projetos", _projetos_exclusao_logica),
+]
+
+# --- Arquivo do cache compartilhado entre workers (utils/cache.py) ---
+
+def _cache_001_entradas(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS entradas (
+            namespace TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            valor TEXT NOT NULL,
+            expira REAL,
+            PRIMARY KEY (namespace, chave)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS contadores (
+            namespace TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            valor INTEGER NOT NULL,
+            PRIMARY KEY (namespace, chave)
+        ) WITHOUT ROWID
+    """)
+    # Difusão de invalidações: cada processo lê as linhas com seq maior que a
+    # última vista e descarta do seu cache local as chaves que outros
+    # processos (origem = pid) alteraram
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS invalidacoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            namespace TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            origem INTEGER NOT NULL,
+            criado_em REAL NOT NULL
+        )
+    """)
+
+MIGRACOES_CACHE = [
+    (1, "entradas, contadores e invalidações", _cache_001_entradas),
+]
+
+def versao_mais_recente(migracoes):
+    """Versão de schema após aplicar todas as migrações da sequência"""
+    return migracoes[-1][0] if migracoes else 0
+
+def versao_atual(caminho):
+    """
+    Lê PRAGMA user_version de um arquivo SQLite
+
+    Returns:
+        int: Versão do schema (0 para um arquivo novo ou anterior às migrações)
+    """
+    conn = sqlite3.connect(str(caminho), timeout=30.0)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+def migrar(caminho, migracoes):
+    """
+    Leva um arquivo SQLite à versão mais recente da sequência
+
+    Cada migração roda em uma transação BEGIN IMMEDIATE junto com a
+    atualização de user_version: uma falha desfaz só aquela migração e
+    interrompe as seguintes. Processos iniciando ao mesmo tempo não aplicam
+    a mesma migração duas vezes (a versão é relida já com o lock)
+
+    Args:
+        caminho (Path): Arquivo SQLite
+        migracoes (list): Sequência (versão, descrição, função(conn))
+
+    Returns:
+        int: Número de migrações aplicadas (0 no caminho rápido)
+    """
+    alvo = versao_mais_recente(migracoes)
+
+    # isolation_level=None: as transações (inclusive de DDL) são explícitas
+    conn = sqlite3.connect(str(caminho), timeout=30.0, isolation_level=None)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= alvo:
+            return 0
+
+        conn.execute("PRAGMA foreign_keys = ON")
+        aplicadas = 0
+
+        for versao, descricao, aplicar in migracoes:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= versao:
+                    conn.execute("ROLLBACK")
+                    continue
+
+                aplicar(conn)
+                conn.execute(f"PRAGMA user_version = {int(versao)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                logger.error("Migração %s (%s) falhou em %s", versao, descricao, caminho)
+                raise
+
+            aplicadas += 1
+            logger.info("Migração %s aplicada em %s: %s", versao, caminho.name, descricao)
+
+        return aplicadas
+    finally:
+        conn.close()
+
+def _validar(migracoes):
+    """As versões devem ser 1, 2, 3... sem lacunas"""
+    versoes = [versao for versao, _, _ in migracoes]
+    if versoes != list(range(1, len(versoes) + 1)):
+        raise RuntimeError(f"Sequência de migrações inválida: {versoes}")
+
+_validar(MIGRACOES_PRINCIPAL)
+_validar(MIGRACOES_SHARD)
+_validar(MIGRACOES_CACHE)
@@ -3,13 +3,55 @@ Emergency Backend - Modelos de Dados
 Define a estrutura das tabelas usuarios e projetos
 """
 
-from database.db import execute_query
+from database.db import execute_query, SUPORTA_RETURNING
+from database.escritor import executar_escrita
+from database.shards import shard_do_usuario, sharding_ativo, alocar_id_projeto, localizar_projeto
+from database.armazenamento import armazenamento_ativo, armazenamento_arquivos, hidratar_conteudo
+from utils.patch_utils import calcular_hash
+from utils.cache import criar_cache
+from config.settings import Config
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import sqlite3
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Usuários lidos por ID (a validação de sessão lê o usuário a cada requisição)
+_cache_usuarios = criar_cache('usuarios', ttl=Config.CACHE_USUARIOS_TTL)
+
+# Projetos excluídos continuam na tabela até a purga (database/purga.py);
+# toda consulta de projetos vivos leva esta condição
+_NAO_EXCLUIDO = ("NOT EXISTS (SELECT 1 FROM projetos_excluidos "
+                 "WHERE projeto_id = projetos.id)")
+
+class EmailEmUsoError(Exception):
+    """Email já cadastrado (detectado pela constraint UNIQUE de usuarios.email)"""
+
+class ConflitoVersaoError(Exception):
+    """O projeto foi alterado por outro salvamento desde a versão esperada"""
+    
+    def __init__(self, projeto_id, versao_atual):
+        super().__init__(f"Projeto {projeto_id} está na versão {versao_atual}")
+        self.projeto_id = projeto_id
+        self.versao_atual = versao_atual
+
+class SemAlteracaoError(Exception):
+    """O salvamento não muda título nem conteúdo: nada foi gravado"""
+    
+    def __init__(self, projeto):
+        super().__init__(f"Projeto {projeto['id']} sem alterações")
+        self.projeto = projeto
+
+class BaseDivergenteError(Exception):
+    """O patch foi gerado sobre um conteúdo diferente do atual"""
+    
+    def __init__(self, projeto_id, hash_atual, versao_atual):
+        super().__init__(f"Projeto {projeto_id} tem hash {hash_atual}")
+        self.projeto_id = projeto_id
+        self.hash_atual = hash_atual
+        self.versao_atual = versao_atual
+
 class Usuario:
     """Modelo para gerenciar usuários do sistema"""
     
@@ -27,6 +69,9 @@ class Usuario:
         """
         Cria um novo usuário no banco de dados
         
+        Um único INSERT ... RETURNING; email duplicado é detectado pela
+        constraint UNIQUE, sem consulta prévia
+        
         Args:
             nome (str): Nome do usuário
             email (str): Email do usuário
@@ -34,32 +79,43 @@ class Usuario:
         
         Returns:
             dict: Dados do usuário criado ou None se erro
+        
+        Raises:
+            EmailEmUsoError: Se o email já estiver cadastrado
+            sqlite3.IntegrityError: Se outra constraint for violada
         """
         try:
-            # Verificar se email já existe
-            usuario_existente = Usuario.buscar_por_email(email)
-            if usuario_existente:
-                return None
-            
             # Criptografar senha
             senha_hash = generate_password_hash(senha)
             
-            # Inserir usuário
-            cursor = execute_query(
+            if SUPORTA_RETURNING:
+                return executar_escrita(
+                    """
+                    INSERT INTO usuarios (nome, email, senha_hash) 
+                    VALUES (?, ?, ?)
+                    RETURNING *
+                    """,
+                    (nome, email, senha_hash),
+                    fetch_one=True
+                )
+            
+            # SQLite < 3.35: INSERT seguido de SELECT pelo lastrowid
+            cursor = executar_escrita(
                 """
                 INSERT INTO usuarios (nome, email, senha_hash) 
                 VALUES (?, ?, ?)
                 """,
                 (nome, email, senha_hash)
             )
+            return Usuario.buscar_por_id(cursor.lastrowid)
             
-            usuario_id = cursor.lastrowid
-            
-            # Buscar usuário criado
-            return Usuario.buscar_por_id(usuario_id)
-            
+        except sqlite3.IntegrityError as e:
+            # Outras constraints (NOT NULL, CHECK, triggers) não são email em uso
+            if 'UNIQUE constraint failed: usuarios.email' not in str(e):
+                raise
+            raise EmailEmUsoError(email)
         except Exception as e:
-            logger.error(f"Erro ao criar usuário: {e}")
+            logger.error("Erro ao criar usuário: %s", e)
             return None
     
     @staticmethod
@@ -80,13 +136,13 @@ class Usuario:
                 fetch_one=True
             )
         except Exception as e:
-            logger.error(f"Erro ao buscar usuário por email: {e}")
+            logger.error("Erro ao buscar usuário por email: %s", e)
             return None
     
     @staticmethod
     def buscar_por_id(usuario_id):
         """
-        Busca usuário por ID
+        Busca usuário por ID (cache de usuários ou banco)
         
         Args:
             usuario_id (int): ID do usuário
@@ -95,13 +151,20 @@ class Usuario:
             dict: Dados do usuário ou None se não encontrado
         """
         try:
-            return execute_query(
+            usuario = _cache_usuarios.obter(usuario_id)
+            if usuario is not None:
+                return usuario
+            
+            usuario = execute_query(
                 "SELECT * FROM usuarios WHERE id = ?",
                 (usuario_id,),
                 fetch_one=True
             )
+            if usuario:
+                _cache_usuarios.definir(usuario_id, usuario)
+            return usuario
         except Exception as e:
-            logger.error(f"Erro ao buscar usuário por ID: {e}")
+            logger.error("Erro ao buscar usuário por ID: %s", e)
             return None
     
     @staticmethod
@@ -129,7 +192,7 @@ class Usuario:
             return None
             
         except Exception as e:
-            logger.error(f"Erro ao verificar senha: {e}")
+            logger.error("Erro ao verificar senha: %s", e)
             return None
     
     @staticmethod
@@ -141,12 +204,13 @@ class Usuario:
             usuario_id (int): ID do usuário
         """
         try:
-            execute_query(
+            executar_escrita(
                 "UPDATE usuarios SET ultima_atividade = CURRENT_TIMESTAMP WHERE id = ?",
                 (usuario_id,)
             )
+            _cache_usuarios.remover(usuario_id)
         except Exception as e:
-            logger.error(f"Erro ao atualizar última atividade: {e}")
+            logger.error("Erro ao atualizar última atividade: %s", e)
     
     @staticmethod
     def listar_todos():
@@ -162,9 +226,55 @@ class Usuario:
                 fetch_all=True
             )
         except Exception as e:
-            logger.error(f"Erro ao listar usuários: {e}")
+            logger.error("Erro ao listar usuários: %s", e)
             return []
 
+def _no_shard_do_usuario(usuario_id, consulta, projeto_id=None):
+    """
+    Executa consulta(shard) no shard de projetos do usuário
+    
+    Se nada for encontrado e o usuário mudou de shard entre a leitura do mapa
+    e a consulta (rebalanceamento em andamento), repete no shard novo. Sem
+    usuário conhecido, o shard é localizado pelo projeto
+    """
+    if usuario_id is None:
+        return consulta(localizar_projeto(projeto_id))
+    
+    shard = shard_do_usuario(usuario_id)
+    resultado = consulta(shard)
+    
+    if not resultado and sharding_ativo():
+        atual = shard_do_usuario(usuario_id, reler=True)
+        if atual != shard:
+            resultado = consulta(atual)
+    
+    return resultado
+
+def _versao_atual(projeto_id, usuario_id=None):
+    """Versão de um projeto não excluído ou None (erros do banco sobem)"""
+    if usuario_id is None:
+        row = execute_query(
+            f"SELECT versao FROM projetos WHERE id = ? AND {_NAO_EXCLUIDO}",
+            (projeto_id,),
+            fetch_one=True,
+            shard=localizar_projeto(projeto_id)
+        )
+    else:
+        row = _no_shard_do_usuario(usuario_id, lambda shard: execute_query(
+            f"SELECT versao FROM projetos WHERE id = ? AND usuario_id = ? AND {_NAO_EXCLUIDO}",
+            (projeto_id, usuario_id),
+            fetch_one=True,
+            shard=shard
+        ))
+    return row['versao'] if row else None
+
+def _com_conteudo(projeto, conteudo_html):
+    """Linha recém-gravada com o HTML que já está em memória (sem reler o arquivo)"""
+    if projeto is not None:
+        projeto.pop('tamanho_arquivo', None)
+        projeto['conteudo_html'] = conteudo_html
+    return projeto
+
 class Projeto:
     """Modelo para gerenciar projetos HTML dos usuários"""
     
@@ -191,98 +301,303 @@ class Projeto:
             dict: Dados do projeto criado ou None se erro
         """
         try:
-            cursor = execute_query(
-                """
-                INSERT INTO projetos (usuario_id, titulo, conteudo_html) 
-                VALUES (?, ?, ?)
-                """,
-                (usuario_id, titulo, conteudo_html)
-            )
+            hash_conteudo = calcular_hash(conteudo_html)
+            # Com o armazenamento de arquivos o HTML é escrito antes da linha
+            coluna_html, tamanho_arquivo = armazenamento_ativo().gravar(conteudo_html, hash_conteudo)
+            # Com sharding o ID vem do contador global; sem ele, do AUTOINCREMENT
+            projeto_id = alocar_id_projeto()
+            
+            def inserir(shard):
+                params = (projeto_id, usuario_id, titulo, coluna_html, hash_conteudo,
+                          tamanho_arquivo)
+                
+                if SUPORTA_RETURNING:
+                    return executar_escrita(
+                        """
+                        INSERT INTO projetos (id, usuario_id, titulo, conteudo_html, hash_conteudo,
+                                              tamanho_arquivo) 
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        RETURNING *
+                        """,
+                        params,
+                        fetch_one=True,
+                        shard=shard
+                    )
+                
+                cursor = executar_escrita(
+                    """
+                    INSERT INTO projetos (id, usuario_id, titulo, conteudo_html, hash_conteudo,
+                                          tamanho_arquivo) 
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    params,
+                    shard=shard
+                )
+                return execute_query("SELECT * FROM projetos WHERE id = ?",
+                                     (cursor.lastrowid,), fetch_one=True, shard=shard)
+            
+            shard = shard_do_usuario(usuario_id)
+            projeto = inserir(shard)
+            
+            if projeto and sharding_ativo():
+                atual = shard_do_usuario(usuario_id, reler=True)
+                if atual != shard:
+                    # O usuário mudou de shard durante o INSERT: o projeto já foi
+                    # copiado junto ou ficou órfão na origem
+                    executar_escrita("DELETE FROM projetos WHERE id = ?", (projeto_id,), shard=shard)
+                    projeto = Projeto.buscar_por_id(projeto_id, usuario_id) or inserir(atual)
             
-            projeto_id = cursor.lastrowid
-            return Projeto.buscar_por_id(projeto_id)
+            return _com_conteudo(projeto, conteudo_html)
             
         except Exception as e:
-            logger.error(f"Erro ao criar projeto: {e}")
+            logger.error("Erro ao criar projeto: %s", e)
             return None
     
     @staticmethod
-    def buscar_por_id(projeto_id):
-        """Busca projeto por ID"""
+    def buscar_por_id(projeto_id, usuario_id=None):
+        """
+        Busca projeto por ID
+        
+        Args:
+            projeto_id (int): ID do projeto
+            usuario_id (int, opcional): Dono esperado, usado para achar o shard
+        
+        Returns:
+            dict: Projeto ou None se não encontrado
+        """
         try:
-            return execute_query(
-                "SELECT * FROM projetos WHERE id = ?",
+            return hidratar_conteudo(_no_shard_do_usuario(usuario_id, lambda shard: execute_query(
+                f"SELECT * FROM projetos WHERE id = ? AND {_NAO_EXCLUIDO}",
                 (projeto_id,),
-                fetch_one=True
-            )
+                fetch_one=True,
+                shard=shard
+            ), projeto_id))
         except Exception as e:
-            logger.error(f"Erro ao buscar projeto por ID: {e}")
+            logger.error("Erro ao buscar projeto por ID: %s", e)
             return None
     
     @staticmethod
-    def listar_por_usuario(usuario_id):
+    def listar_por_usuario(usuario_id, limite=None, deslocamento=0):
         """
-        Lista todos os projetos de um usuário
+        Lista os projetos de um usuário, do modificado mais recentemente
         
         Args:
             usuario_id (int): ID do usuário
+            limite (int, opcional): Máximo de projetos (None: todos)
+            deslocamento (int): Projetos a pular (paginação)
         
         Returns:
             list: Lista de projetos do usuário
         """
         try:
-            return execute_query(
-                """
-                SELECT id, titulo, data_criacao, data_modificacao,
-                       LENGTH(conteudo_html) as tamanho_html
+            return _no_shard_do_usuario(usuario_id, lambda shard: execute_query(
+                f"""
+                SELECT id, titulo, data_criacao, data_modificacao, versao,
+                       COALESCE(tamanho_arquivo, LENGTH(conteudo_html)) as tamanho_html
                 FROM projetos 
-                WHERE usuario_id = ?
-                ORDER BY data_modificacao DESC
+                WHERE usuario_id = ? AND {_NAO_EXCLUIDO}
+                ORDER BY data_modificacao DESC, id DESC
+                LIMIT ? OFFSET ?
                 """,
-                (usuario_id,),
-                fetch_all=True
-            )
+                (usuario_id, -1 if limite is None else limite, deslocamento),
+                fetch_all=True,
+                shard=shard
+            ))
         except Exception as e:
-            logger.error(f"Erro ao listar projetos do usuário: {e}")
+            logger.error("Erro ao listar projetos do usuário: %s", e)
             return []
     
     @staticmethod
-    def atualizar_projeto(projeto_id, titulo=None, conteudo_html=None):
+    def atualizar_projeto(projeto_id, titulo=None, conteudo_html=None,
+                          usuario_id=None, versao_esperada=None, incremento=1,
+                          hash_conteudo=None, somente_se_alterado=False,
+                          propagar_erros=False):
         """
-        Atualiza um projeto existente
+        Atualiza um projeto existente e incrementa sua versão
+        
+        Campos None mantêm o valor atual (COALESCE), sem SELECT prévio.
+        Com versao_esperada o UPDATE é condicional (controle otimista). Com
+        somente_se_alterado ele também exige título ou hash diferentes, e a
+        linha só é lida quando nada foi atualizado
         
         Args:
             projeto_id (int): ID do projeto
             titulo (str, opcional): Novo título
             conteudo_html (str, opcional): Novo conteúdo HTML
+            usuario_id (int, opcional): Restringe a atualização ao proprietário
+            versao_esperada (int, opcional): Versão que o cliente carregou
+            incremento (int): Quanto somar à versão (salvamentos coalescidos)
+            hash_conteudo (str, opcional): Hash já calculado de conteudo_html
+            somente_se_alterado (bool): Não grava salvamentos sem mudança
+                                        (exige usuario_id)
+            propagar_erros (bool): Levanta os erros do banco (lock, prazo) em
+                                   vez de retornar None, que passa a
+                                   significar só "não encontrado"
         
         Returns:
-            dict: Projeto atualizado ou None se erro
+            dict: Projeto atualizado ou None se não encontrado/erro
+        
+        Raises:
+            ConflitoVersaoError: Se o projeto estiver em outra versão
+            SemAlteracaoError: Com somente_se_alterado, se título e conteúdo
+                               já forem os atuais
         """
         try:
-            # Buscar projeto atual
-            projeto = Projeto.buscar_por_id(projeto_id)
-            if not projeto:
-                return None
+            coluna_html = tamanho_arquivo = None
+            if conteudo_html is not None:
+                if hash_conteudo is None:
+                    hash_conteudo = calcular_hash(conteudo_html)
+                coluna_html, tamanho_arquivo = armazenamento_ativo().gravar(conteudo_html,
+                                                                            hash_conteudo)
             
-            # Preparar valores para atualização
-            novo_titulo = titulo if titulo is not None else projeto['titulo']
-            novo_conteudo = conteudo_html if conteudo_html is not None else projeto['conteudo_html']
-            
-            # Atualizar no banco
-            execute_query(
-                """
+            query = f"""
                 UPDATE projetos 
-                SET titulo = ?, conteudo_html = ?, data_modificacao = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                (novo_titulo, novo_conteudo, projeto_id)
-            )
+                SET titulo = COALESCE(?, titulo),
+                    conteudo_html = COALESCE(?, conteudo_html),
+                    tamanho_arquivo = CASE WHEN ? THEN ? ELSE tamanho_arquivo END,
+                    hash_conteudo = COALESCE(?, hash_conteudo),
+                    data_modificacao = CURRENT_TIMESTAMP,
+                    versao = versao + ?
+                WHERE id = ? AND {_NAO_EXCLUIDO}
+            """
+            params = [titulo, coluna_html, conteudo_html is not None, tamanho_arquivo,
+                      hash_conteudo, incremento, projeto_id]
+            
+            if usuario_id is not None:
+                query += " AND usuario_id = ?"
+                params.append(usuario_id)
+            
+            if versao_esperada is not None:
+                query += " AND versao = ?"
+                params.append(versao_esperada)
             
-            return Projeto.buscar_por_id(projeto_id)
+            if somente_se_alterado:
+                query += (" AND (hash_conteudo IS NOT COALESCE(?, hash_conteudo)"
+                          " OR titulo IS NOT COALESCE(?, titulo))")
+                params.extend([hash_conteudo, titulo])
+            
+            def atualizar(shard):
+                if SUPORTA_RETURNING:
+                    return executar_escrita(query + " RETURNING *", tuple(params),
+                                            fetch_one=True, shard=shard)
+                
+                cursor = executar_escrita(query, tuple(params), shard=shard)
+                if not cursor.rowcount:
+                    return None
+                return execute_query("SELECT * FROM projetos WHERE id = ?", (projeto_id,),
+                                     fetch_one=True, shard=shard)
+            
+            projeto = _no_shard_do_usuario(usuario_id, atualizar, projeto_id)
+            
+            if projeto is None and somente_se_alterado:
+                # Só no caminho de falha: distinguir salvamento sem mudança,
+                # conflito e projeto inexistente
+                atual = Projeto.buscar_metadados(projeto_id, usuario_id)
+                if atual is not None:
+                    if versao_esperada is not None and versao_esperada != atual['versao']:
+                        raise ConflitoVersaoError(projeto_id, atual['versao'])
+                    if ((hash_conteudo is None or hash_conteudo == atual['hash_conteudo'])
+                            and (titulo is None or titulo == atual['titulo'])):
+                        raise SemAlteracaoError(atual)
+                    # Outro salvamento mudou o projeto entre o UPDATE e a leitura
+                    raise ConflitoVersaoError(projeto_id, atual['versao'])
+            elif projeto is None and versao_esperada is not None:
+                # Só no caminho de falha: distinguir conflito de projeto inexistente
+                atual = _versao_atual(projeto_id, usuario_id)
+                if atual is not None:
+                    raise ConflitoVersaoError(projeto_id, atual)
+            
+            if conteudo_html is not None:
+                return _com_conteudo(projeto, conteudo_html)
+            return hidratar_conteudo(projeto)
+            
+        except (ConflitoVersaoError, SemAlteracaoError):
+            raise
+        except Exception as e:
+            if propagar_erros:
+                raise
+            logger.error("Erro ao atualizar projeto: %s", e)
+            return None
+    
+    @staticmethod
+    def buscar_metadados(projeto_id, usuario_id):
+        """
+        Busca os dados de um projeto do usuário sem o conteúdo HTML
+        
+        Args:
+            projeto_id (int): ID do projeto
+            usuario_id (int): ID do proprietário
+        
+        Returns:
+            dict: Metadados do projeto ou None se não encontrado
+        """
+        try:
+            return _no_shard_do_usuario(usuario_id, lambda shard: execute_query(
+                f"""
+                SELECT id, usuario_id, titulo, data_criacao, data_modificacao, versao,
+                       hash_conteudo
+                FROM projetos
+                WHERE id = ? AND usuario_id = ? AND {_NAO_EXCLUIDO}
+                """,
+                (projeto_id, usuario_id),
+                fetch_one=True,
+                shard=shard
+            ))
+        except Exception as e:
+            logger.error("Erro ao buscar metadados do projeto: %s", e)
+            return None
+    
+    @staticmethod
+    def buscar_arquivo_conteudo(projeto_id, usuario_id):
+        """
+        Caminho do arquivo com o HTML de um projeto do usuário
+        
+        Args:
+            projeto_id (int): ID do projeto
+            usuario_id (int): ID do proprietário
+        
+        Returns:
+            dict: {'hash_conteudo', 'caminho'} (caminho None se o HTML está no
+                  SQLite) ou None se não encontrado
+        """
+        try:
+            row = _no_shard_do_usuario(usuario_id, lambda shard: execute_query(
+                f"""
+                SELECT hash_conteudo, tamanho_arquivo
+                FROM projetos
+                WHERE id = ? AND usuario_id = ? AND {_NAO_EXCLUIDO}
+                """,
+                (projeto_id, usuario_id),
+                fetch_one=True,
+                shard=shard
+            ))
+            if not row:
+                return None
             
+            caminho = None
+            if row['tamanho_arquivo'] is not None:
+                caminho = armazenamento_arquivos().caminho(row['hash_conteudo'])
+            return {'hash_conteudo': row['hash_conteudo'], 'caminho': caminho}
         except Exception as e:
-            logger.error(f"Erro ao atualizar projeto: {e}")
+            logger.error("Erro ao buscar arquivo do projeto: %s", e)
+            return None
+    
+    @staticmethod
+    def buscar_versao(projeto_id, usuario_id=None):
+        """
+        Retorna a versão atual de um projeto
+        
+        Args:
+            projeto_id (int): ID do projeto
+            usuario_id (int, opcional): Restringe ao proprietário
+        
+        Returns:
+            int: Versão atual ou None se não encontrado
+        """
+        try:
+            return _versao_atual(projeto_id, usuario_id)
+        except Exception as e:
+            logger.error("Erro ao buscar versão do projeto: %s", e)
             return None
     
     @staticmethod
@@ -290,6 +605,11 @@ class Projeto:
         """
         Deleta um projeto (verificando se pertence ao usuário)
         
+        A exclusão é lógica: só a marca em projetos_excluidos é gravada, sem
+        tocar na linha com o HTML. A linha é removida pela purga depois de
+        EXCLUSAO_JANELA_RESTAURACAO segundos; até lá restaurar_projeto a
+        traz de volta. A verificação de propriedade fica no próprio INSERT
+        
         Args:
             projeto_id (int): ID do projeto
             usuario_id (int): ID do usuário (para verificação)
@@ -298,27 +618,53 @@ class Projeto:
             bool: True se deletado, False caso contrário
         """
         try:
-            # Verificar se o projeto pertence ao usuário
-            projeto = execute_query(
-                "SELECT id FROM projetos WHERE id = ? AND usuario_id = ?",
+            return _no_shard_do_usuario(usuario_id, lambda shard: executar_escrita(
+                """
+                INSERT INTO projetos_excluidos (projeto_id, usuario_id)
+                SELECT id, usuario_id FROM projetos WHERE id = ? AND usuario_id = ?
+                ON CONFLICT(projeto_id) DO NOTHING
+                """,
                 (projeto_id, usuario_id),
-                fetch_one=True
-            )
+                shard=shard
+            ).rowcount > 0)
             
-            if not projeto:
-                return False
-            
-            # Deletar projeto
-            execute_query(
-                "DELETE FROM projetos WHERE id = ? AND usuario_id = ?",
-                (projeto_id, usuario_id)
-            )
+        except Exception as e:
+            logger.error("Erro ao deletar projeto: %s", e)
+            return False
+    
+    @staticmethod
+    def restaurar_projeto(projeto_id, usuario_id):
+        """
+        Desfaz a exclusão de um projeto ainda dentro da janela de restauração
+        
+        Só a marca de exclusão é apagada: a linha do projeto continua como
+        estava, com a mesma versão
+        
+        Args:
+            projeto_id (int): ID do projeto
+            usuario_id (int): ID do proprietário
+        
+        Returns:
+            dict: Metadados do projeto restaurado ou None se não havia
+                  exclusão restaurável
+        """
+        try:
+            restaurado = _no_shard_do_usuario(usuario_id, lambda shard: executar_escrita(
+                """
+                DELETE FROM projetos_excluidos
+                WHERE projeto_id = ? AND usuario_id = ? AND deletado_em > datetime('now', ?)
+                """,
+                (projeto_id, usuario_id, f"-{int(Config.EXCLUSAO_JANELA_RESTAURACAO)} seconds"),
+                shard=shard
+            ).rowcount > 0)
             
-            return True
+            if not restaurado:
+                return None
+            return Projeto.buscar_metadados(projeto_id, usuario_id)
             
         except Exception as e:
-            logger.error(f"Erro ao deletar projeto: {e}")
-            return False
+            logger.error("Erro ao restaurar projeto: %s", e)
+            return None
     
     @staticmethod
     def contar_projetos_usuario(usuario_id):
@@ -332,12 +678,13 @@ class Projeto:
             int: Número de projetos
         """
         try:
-            result = execute_query(
-                "SELECT COUNT(*) as count FROM projetos WHERE usuario_id = ?",
+            result = _no_shard_do_usuario(usuario_id, lambda shard: execute_query(
+                f"SELECT COUNT(*) as count FROM projetos WHERE usuario_id = ? AND {_NAO_EXCLUIDO}",
                 (usuario_id,),
-                fetch_one=True
-            )
+                fetch_one=True,
+                shard=shard
+            ))
             return result['count'] if result else 0
         except Exception as e:
-            logger.error(f"Erro ao contar projetos: {e}")
+            logger.error("Erro ao contar projetos: %s", e)
             return 0
\ No newline at end of file
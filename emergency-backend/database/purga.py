@@ -0,0 +1,170 @@
+"""
+Emergency Backend - Purga de Projetos Excluídos
+Remove em background os projetos cuja janela de restauração venceu e
+devolve o espaço ao sistema com PRAGMA incremental_vacuum
+
+A exclusão na requisição só grava a marca em projetos_excluidos. Aqui as
+linhas (com o HTML) saem em lotes pequenos de PURGA_LOTE projetos, cada lote
+pelo escritor único do arquivo e com uma pausa entre eles, para que os
+salvamentos não esperem atrás de um DELETE de muitos megabytes. Em arquivos
+com auto_vacuum = INCREMENTAL, até PURGA_VACUUM_PAGINAS páginas livres são
+devolvidas por ciclo
+
+A thread roda em um único processo: no modo multi-worker, no master
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from config.settings import Config
+from database.db import listar_shards, caminho_shard, BUSY_TIMEOUT_PADRAO
+from database.escritor import executar_escrita
+from utils import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+_thread = None
+_parar = threading.Event()
+
+def purgar_shard(shard, janela=None, lote=None):
+    """
+    Remove os projetos excluídos há mais de `janela` segundos em um shard
+
+    Args:
+        shard (int): Shard de projetos
+        janela (float, opcional): Padrão EXCLUSAO_JANELA_RESTAURACAO
+        lote (int, opcional): Projetos por DELETE (padrão PURGA_LOTE)
+
+    Returns:
+        int: Número de projetos removidos
+    """
+    janela = Config.EXCLUSAO_JANELA_RESTAURACAO if janela is None else janela
+    lote = max(1, Config.PURGA_LOTE if lote is None else lote)
+    removidos = 0
+
+    while not _parar.is_set():
+        # O trigger de projetos apaga a marca junto com a linha
+        apagados = executar_escrita(
+            """
+            DELETE FROM projetos WHERE id IN (
+                SELECT projeto_id FROM projetos_excluidos
+                WHERE deletado_em <= datetime('now', ?)
+                ORDER BY deletado_em
+                LIMIT ?
+            )
+            """,
+            (f"-{int(janela)} seconds", lote),
+            shard=shard
+        ).rowcount
+        removidos += apagados
+        if apagados < lote:
+            break
+        _parar.wait(Config.PURGA_PAUSA)
+
+    if removidos:
+        metrics.incrementar('purga.projetos', removidos)
+    return removidos
+
+def liberar_paginas(shard, paginas=None):
+    """
+    Devolve ao sistema até `paginas` páginas livres do arquivo do shard
+
+    Sem auto_vacuum = INCREMENTAL no arquivo nada é feito (as páginas livres
+    continuam sendo reaproveitadas pelas próximas escritas)
+
+    Returns:
+        int: Páginas devolvidas
+    """
+    paginas = Config.PURGA_VACUUM_PAGINAS if paginas is None else paginas
+    if paginas <= 0:
+        return 0
+
+    conn = sqlite3.connect(str(caminho_shard(shard)), timeout=BUSY_TIMEOUT_PADRAO,
+                           isolation_level=None)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not livres:
+            return 0
+
+        # executescript executa o PRAGMA até o fim; com execute() o módulo
+        # sqlite3 para no primeiro passo e só uma página é liberada
+        conn.executescript(f"PRAGMA incremental_vacuum({int(paginas)})")
+        liberadas = livres - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+
+    if liberadas:
+        metrics.incrementar('purga.paginas_liberadas', liberadas)
+    return liberadas
+
+def executar_ciclo():
+    """
+    Purga e libera páginas em todos os shards
+
+    Returns:
+        tuple: (projetos removidos, páginas liberadas)
+    """
+    inicio = time.perf_counter()
+    removidos = liberadas = 0
+
+    for shard in listar_shards():
+        if _parar.is_set():
+            break
+        try:
+            removidos += purgar_shard(shard)
+            liberadas += liberar_paginas(shard)
+        except Exception as e:
+            logger.error("Erro na purga do shard %s: %s", shard, e)
+
+    metrics.observar('purga.ciclo_ms', (time.perf_counter() - inicio) * 1000)
+    if removidos or liberadas:
+        logger.info("Purga: %s projetos removidos, %s páginas liberadas", removidos, liberadas)
+    return removidos, liberadas
+
+def _executar():
+    """Loop da thread: um ciclo a cada PURGA_INTERVALO segundos"""
+    while not _parar.wait(Config.PURGA_INTERVALO):
+        executar_ciclo()
+
+def iniciar():
+    """Inicia a thread de purga do processo (nada se desabilitada ou já ativa)"""
+    global _thread
+
+    if not Config.PURGA_HABILITADA:
+        return
+    if _thread is not None and _thread.is_alive():
+        return
+
+    _parar.clear()
+    _thread = threading.Thread(target=_executar, name='purga-projetos', daemon=True)
+    _thread.start()
+
+def encerrar(timeout=5):
+    """Interrompe a purga entre lotes e espera a thread terminar"""
+    global _thread
+
+    _parar.set()
+    if _thread is not None:
+        _thread.join(timeout=timeout)
+        _thread = None
+
+def _reiniciar_apos_fork():
+    """
+    Workers do pre-fork não purgam: a thread do master não existe no filho e
+    não é recriada
+    """
+    global _thread, _parar
+
+    _thread = None
+    _parar = threading.Event()
+
+# Registrado depois do escritor: roda antes dele no encerramento
+atexit.register(encerrar)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
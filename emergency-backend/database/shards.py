@@ -0,0 +1,273 @@
+"""
+Emergency Backend - Roteamento de Shards
+Mapa usuário -> shard de projetos, alocação global de IDs de projeto e
+movimentação de usuários entre shards
+"""
+
+import contextvars
+import sqlite3
+import time
+from config.settings import Config
+from database.db import (execute_query, get_db_connection, caminho_shard, listar_shards,
+                         inicializar_shard, SUPORTA_RETURNING)
+from database.escritor import executar_escrita
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre consultas enquanto um usuário está sendo movido
+_INTERVALO_ESPERA_MOVIMENTO = 0.05
+
+_ativo = None
+
+# Shard de cada usuário já resolvido na requisição em andamento ({usuario_id:
+# shard}); None fora de uma requisição (threads de background, ferramentas)
+_shards_da_requisicao = contextvars.ContextVar('shards_da_requisicao', default=None)
+
+class ShardEmMovimentoError(Exception):
+    """O usuário continuou em movimento além de SHARD_ESPERA_MOVIMENTO"""
+
+def sharding_ativo():
+    """
+    Indica se os projetos estão distribuídos em mais de um shard
+
+    Com um único shard e nenhum usuário mapeado fora do shard 0, o roteamento
+    é dispensado e nenhuma consulta extra é feita. O resultado vale para o
+    processo inteiro
+    """
+    global _ativo
+
+    if _ativo is None:
+        if Config.NUM_SHARDS > 1:
+            _ativo = True
+        else:
+            row = execute_query(
+                "SELECT 1 AS existe FROM shards_usuarios WHERE shard <> 0 LIMIT 1",
+                fetch_one=True
+            )
+            _ativo = row is not None
+
+    return _ativo
+
+def iniciar_requisicao():
+    """Começa a memória de shards da requisição na thread (contexto) atual"""
+    _shards_da_requisicao.set({})
+
+def finalizar_requisicao():
+    """Descarta a memória de shards da requisição"""
+    _shards_da_requisicao.set(None)
+
+def shard_do_usuario(usuario_id, reler=False):
+    """
+    Retorna o shard onde estão os projetos de um usuário
+
+    Usuários sem mapeamento recebem usuario_id % NUM_SHARDS. Enquanto o
+    usuário está sendo movido a chamada espera o fim da movimentação. Dentro
+    de uma requisição o mapa é lido uma vez por usuário: mover_usuario espera
+    as requisições que já leram o shard antigo terminarem
+
+    Args:
+        usuario_id (int): ID do usuário
+        reler (bool): Ignora o shard já resolvido na requisição (verificação
+                      de movimento depois de uma consulta)
+
+    Returns:
+        int: Número do shard
+
+    Raises:
+        ShardEmMovimentoError: Se a movimentação não terminar a tempo
+    """
+    if not sharding_ativo():
+        return 0
+
+    memoria = _shards_da_requisicao.get()
+    if memoria is not None and not reler and usuario_id in memoria:
+        return memoria[usuario_id]
+
+    shard = _ler_shard(usuario_id)
+    if memoria is not None:
+        memoria[usuario_id] = shard
+    return shard
+
+def _ler_shard(usuario_id):
+    """Lê o shard do usuário no mapa, criando o mapeamento e esperando movimentos"""
+    limite = time.monotonic() + Config.SHARD_ESPERA_MOVIMENTO
+
+    while True:
+        row = execute_query(
+            "SELECT shard, movendo FROM shards_usuarios WHERE usuario_id = ?",
+            (usuario_id,),
+            fetch_one=True
+        )
+
+        if row is None:
+            executar_escrita(
+                "INSERT OR IGNORE INTO shards_usuarios (usuario_id, shard) VALUES (?, ?)",
+                (usuario_id, usuario_id % Config.NUM_SHARDS)
+            )
+            continue
+
+        if not row['movendo']:
+            return row['shard']
+
+        if time.monotonic() > limite:
+            raise ShardEmMovimentoError(f"Usuário {usuario_id} em movimento entre shards")
+        time.sleep(_INTERVALO_ESPERA_MOVIMENTO)
+
+def alocar_id_projeto(quantidade=1):
+    """
+    Reserva um ID de projeto único entre todos os shards
+
+    Args:
+        quantidade (int): Tamanho do bloco de IDs consecutivos (cargas em lote)
+
+    Returns:
+        int: Primeiro ID reservado ou None sem sharding (o AUTOINCREMENT do
+             shard 0 decide)
+    """
+    if not sharding_ativo():
+        return None
+
+    if SUPORTA_RETURNING:
+        row = executar_escrita(
+            """
+            UPDATE contadores SET valor = valor + ?
+            WHERE nome = 'projetos_ultimo_id'
+            RETURNING valor
+            """,
+            (quantidade,),
+            fetch_one=True
+        )
+        return row['valor'] - quantidade + 1
+
+    # Sem RETURNING: incremento e leitura na mesma transação de escrita
+    conn = get_db_connection()
+    try:
+        conn.execute("UPDATE contadores SET valor = valor + ? WHERE nome = 'projetos_ultimo_id'",
+                     (quantidade,))
+        valor = conn.execute(
+            "SELECT valor FROM contadores WHERE nome = 'projetos_ultimo_id'"
+        ).fetchone()['valor']
+        conn.commit()
+        return valor - quantidade + 1
+    except Exception:
+        conn.rollback()
+        raise
+
+def localizar_projeto(projeto_id):
+    """
+    Procura o shard de um projeto quando o dono não é conhecido
+
+    Args:
+        projeto_id (int): ID do projeto
+
+    Returns:
+        int: Shard do projeto (0 se não encontrado)
+    """
+    if not sharding_ativo():
+        return 0
+
+    for shard in listar_shards():
+        if execute_query("SELECT 1 AS existe FROM projetos WHERE id = ?",
+                         (projeto_id,), fetch_one=True, shard=shard):
+            return shard
+    return 0
+
+def _esquema(conn, shard, apelido):
+    """Nome do schema do shard na conexão do diretório (ATTACH se preciso)"""
+    if shard == 0:
+        return 'main'
+    conn.execute("ATTACH DATABASE ? AS " + apelido, (str(caminho_shard(shard)),))
+    return apelido
+
+def mover_usuario(usuario_id, destino, espera=2.0):
+    """
+    Move todos os projetos de um usuário para outro shard, com o servidor no ar
+
+    1. Marca o usuário como "movendo": novas requisições dele aguardam
+    2. Espera `espera` segundos para as requisições que já leram o shard
+       antigo terminarem
+    3. Em uma única transação sobre os dois arquivos (ATTACH): copia os
+       projetos e as marcas de exclusão, apaga da origem e aponta o mapa
+       para o destino
+
+    Uma escrita atrasada que ainda chegue à origem não encontra mais os
+    projetos; os modelos repetem a operação no shard novo
+
+    Args:
+        usuario_id (int): ID do usuário
+        destino (int): Shard de destino
+        espera (float): Período de carência em segundos
+
+    Returns:
+        int: Número de projetos movidos
+    """
+    if Config.NUM_SHARDS <= 1:
+        raise ValueError("Defina NUM_SHARDS > 1 antes de mover usuários entre shards")
+    if destino < 0:
+        raise ValueError("Shard de destino inválido")
+
+    origem = shard_do_usuario(usuario_id)
+    if origem == destino:
+        return 0
+
+    if destino > 0:
+        inicializar_shard(destino)
+
+    cursor = execute_query(
+        "UPDATE shards_usuarios SET movendo = 1 WHERE usuario_id = ? AND movendo = 0",
+        (usuario_id,)
+    )
+    if cursor.rowcount == 0:
+        raise ShardEmMovimentoError(f"Usuário {usuario_id} já está em movimento")
+
+    conn = None
+    try:
+        time.sleep(espera)
+
+        conn = sqlite3.connect(str(Config.DATABASE_PATH), timeout=30.0, isolation_level=None)
+        esquema_origem = _esquema(conn, origem, 'origem')
+        esquema_destino = _esquema(conn, destino, 'destino')
+
+        colunas = ("id, usuario_id, titulo, conteudo_html, data_criacao, "
+                   "data_modificacao, versao, hash_conteudo, tamanho_arquivo")
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            movidos = conn.execute(
+                f"INSERT INTO {esquema_destino}.projetos ({colunas}) "
+                f"SELECT {colunas} FROM {esquema_origem}.projetos WHERE usuario_id = ?",
+                (usuario_id,)
+            ).rowcount
+            # Exclusões ainda na janela de restauração vão junto (antes de
+            # apagar a origem, cujo trigger remove as marcas de lá)
+            conn.execute(
+                f"INSERT INTO {esquema_destino}.projetos_excluidos "
+                f"(projeto_id, usuario_id, deletado_em) "
+                f"SELECT projeto_id, usuario_id, deletado_em "
+                f"FROM {esquema_origem}.projetos_excluidos WHERE usuario_id = ?",
+                (usuario_id,)
+            )
+            conn.execute(f"DELETE FROM {esquema_origem}.projetos WHERE usuario_id = ?",
+                         (usuario_id,))
+            conn.execute(
+                "UPDATE main.shards_usuarios SET shard = ?, movendo = 0 WHERE usuario_id = ?",
+                (destino, usuario_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        logger.info("Usuário %s movido do shard %s para o %s (%s projetos)",
+                    usuario_id, origem, destino, movidos)
+        return movidos
+
+    except Exception:
+        # Libera o usuário no shard de origem
+        execute_query("UPDATE shards_usuarios SET movendo = 0 WHERE usuario_id = ?",
+                      (usuario_id,))
+        raise
+    finally:
+        if conn is not None:
+            conn.close()
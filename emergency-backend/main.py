@@ -4,21 +4,42 @@ Emergency Backend - Servidor Flask Principal
 Sistema completo de gerenciamento de projetos HTML com autenticação
 """
 
-from flask import Flask
+from flask import Flask, request, jsonify
 from flask_cors import CORS
 from api import create_api_blueprint
+from api.websocket import registrar_websocket
 from database.db import init_database
+from database import purga, shards
+from utils.health import verificar_vivacidade, verificar_prontidao, INDISPONIVEL
 from config.settings import Config
-import logging
+from utils.log_utils import configurar_logging
+from utils.json_utils import JSONProviderRapido
+from utils.metrics import obter_metricas
+from utils import consultas, prazos
+import hmac
 import os
+import signal
+import sys
 
-def create_app():
-    """Cria e configura a aplicação Flask"""
+def create_app(inicializar_banco=True):
+    """
+    Cria e configura a aplicação Flask
+    
+    Args:
+        inicializar_banco (bool): Cria/atualiza o schema (False quando o
+            master do modo multi-worker já fez isso antes do fork)
+    """
     app = Flask(__name__)
     
     # Configurações
     app.config.from_object(Config)
     
+    # Logging assíncrono e estruturado (antes de qualquer log da inicialização)
+    configurar_logging(Config)
+    
+    # Respostas JSON compactas com o encoder mais rápido disponível
+    app.json = JSONProviderRapido(app)
+    
     # CORS para permitir requisições do frontend
     CORS(app, resources={
         r"/api/*": {
@@ -28,18 +49,64 @@ def create_app():
         }
     })
     
+    def resposta_prazo_excedido(erro):
+        """Resposta 503 (banco ocupado) ou 504 (consulta interrompida)"""
+        response = jsonify({
+            "status": "error",
+            "mensagem": "Banco de dados ocupado, tente novamente"
+                        if erro.status == 503
+                        else "Tempo limite da requisição excedido",
+            "dados": None
+        })
+        response.status_code = erro.status
+        if erro.status == 503:
+            response.headers['Retry-After'] = '1'
+        return response
+    
+    # Contabilidade de consultas SQL e prazo de cada requisição
+    @app.before_request
+    def iniciar_contabilidade():
+        rota = request.endpoint or 'desconhecida'
+        consultas.iniciar(rota)
+        prazos.iniciar(rota, prazos.prazo_da_rota(rota))
+        shards.iniciar_requisicao()
+    
+    @app.after_request
+    def finalizar_contabilidade(response):
+        erro_prazo = prazos.finalizar()
+        if erro_prazo is not None:
+            # As camadas abaixo tratam o erro como "não encontrado" ou erro
+            # interno; a resposta real é a do prazo vencido
+            response = resposta_prazo_excedido(erro_prazo)
+        
+        contabilidade = consultas.finalizar()
+        if contabilidade is not None and Config.CONSULTAS_CABECALHOS:
+            response.headers.update(consultas.cabecalhos(contabilidade))
+        return response
+    
+    @app.errorhandler(prazos.PrazoExcedidoError)
+    def prazo_excedido(erro):
+        return resposta_prazo_excedido(erro)
+    
+    @app.teardown_request
+    def descartar_contabilidade(erro=None):
+        # Requisições que terminaram em exceção não passam pelo after_request
+        prazos.finalizar()
+        consultas.finalizar()
+        shards.finalizar_requisicao()
+    
     # Inicializar banco de dados
-    init_database()
+    if inicializar_banco:
+        init_database()
+        # No modo multi-worker a purga é iniciada pelo master (prefork.py)
+        purga.iniciar()
     
     # Registrar blueprints
     api_blueprint = create_api_blueprint()
     app.register_blueprint(api_blueprint, url_prefix='/api')
     
-    # Configurar logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    # Canal WebSocket de comandos (opcional, requer flask-sock)
+    registrar_websocket(app)
     
     @app.route('/')
     def root():
@@ -54,23 +121,82 @@ def create_app():
                 "/api/carregar_projeto",
                 "/api/listar_projetos",
                 "/api/deletar_projeto",
-                "/api/comando"
+                "/api/restaurar_projeto",
+                "/api/comando",
+                "/api/eventos",
+                "/api/ws"
             ]
         }
     
+    @app.route('/health/live')
+    def liveness_check():
+        """Liveness: apenas confirma que o processo responde"""
+        return {
+            "status": "success",
+            "mensagem": "Processo ativo",
+            "dados": verificar_vivacidade()
+        }
+    
     @app.route('/health')
-    def health_check():
+    @app.route('/health/ready')
+    def readiness_check():
+        """Readiness: verifica banco, lock de escrita e conexões"""
+        prontidao = verificar_prontidao()
+        
+        if prontidao["estado"] == INDISPONIVEL:
+            return {
+                "status": "error",
+                "mensagem": "Servidor indisponível",
+                "dados": prontidao
+            }, 503
+        
+        return {
+            "status": "success",
+            "mensagem": "Servidor pronto para receber tráfego",
+            "dados": prontidao
+        }
+    
+    def metricas_autorizadas():
+        """Bearer METRICAS_TOKEN ou, sem token configurado, cliente local"""
+        if Config.METRICAS_TOKEN:
+            recebido = request.headers.get('Authorization', '').encode('utf-8')
+            esperado = f"Bearer {Config.METRICAS_TOKEN}".encode('utf-8')
+            return hmac.compare_digest(recebido, esperado)
+        return request.remote_addr in ('127.0.0.1', '::1')
+    
+    @app.route('/metrics')
+    def metrics():
+        """Métricas internas do processo (contadores, medidores e histogramas)"""
+        if not metricas_autorizadas():
+            return {
+                "status": "error",
+                "mensagem": "Acesso às métricas não autorizado",
+                "dados": None
+            }, 401 if Config.METRICAS_TOKEN else 403
+        
         return {
             "status": "success",
-            "mensagem": "Servidor funcionando normalmente",
-            "database": "conectado"
+            "mensagem": "Métricas do processo",
+            "dados": obter_metricas()
         }
     
     return app
 
 if __name__ == '__main__':
+    workers = int(os.getenv('WORKERS', 1))
+    
+    if workers > 1:
+        # Modo multi-processo (ver prefork.py)
+        from prefork import servir
+        servir(os.getenv('HOST', '0.0.0.0'), int(os.getenv('PORT', 8001)), workers)
+        sys.exit(0)
+    
     app = create_app()
     
+    # SIGTERM encerra via sys.exit para que os handlers de atexit rodem
+    # (ex: gravação do buffer de autosave)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
     # Configurações do servidor
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     port = int(os.getenv('PORT', 8001))
@@ -93,6 +219,7 @@ if __name__ == '__main__':
 ║    • GET  /api/carregar_projeto/<id> - Carregar projeto     ║
 ║    • GET  /api/listar_projetos - Listar projetos do usuário ║
 ║    • DELETE /api/deletar_projeto/<id> - Deletar projeto     ║
+║    • POST /api/restaurar_projeto/<id> - Restaurar projeto   ║
 ║    • POST /api/comando - Executar comandos via JSON         ║
 ║                                                              ║
 ╚══════════════════════════════════════════════════════════════╝
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Emergency Backend - Servidor Multi-Processo (pre-fork)
+Um processo master prepara o banco e o socket e cria N workers, cada um com
+seu próprio servidor WSGI aceitando conexões do mesmo socket
+
+Uso:
+    python prefork.py --workers 4
+    WORKERS=4 python main.py
+"""
+
+import argparse
+import atexit
+import os
+import signal
+import socket
+import threading
+import time
+from werkzeug.serving import make_server
+from database.db import init_database, close_db_connection
+from database import purga
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre recriações de um worker que morreu (evita loop de fork)
+ESPERA_RECRIAR_WORKER = 1.0
+
+# Intervalo (segundos) entre verificações dos workers pelo master. Os handlers
+# de sinal do Python só rodam na thread principal: bloqueada em os.wait(), ela
+# não atenderia um SIGTERM entregue a outra thread (log, purga) até um worker morrer
+INTERVALO_VERIFICAR_WORKERS = 0.2
+
+def _executar_worker(app, sock, numero):
+    """
+    Loop de um worker: atende requisições até receber SIGTERM/SIGINT
+
+    O encerramento é gracioso: o servidor para de aceitar conexões e os
+    handlers de atexit (gravação do autosave, fila de logs) rodam ao sair
+    """
+    servidor = make_server(*sock.getsockname()[:2], app, threaded=True, fd=sock.fileno())
+
+    def encerrar(signum, frame):
+        # shutdown() espera o loop terminar, então não pode rodar nesta thread
+        threading.Thread(target=servidor.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    logger.info("Worker %s iniciado (pid %s)", numero, os.getpid())
+    servidor.serve_forever()
+    logger.info("Worker %s encerrando (pid %s)", numero, os.getpid())
+
+def _criar_worker(app, sock, numero):
+    """Cria um processo worker e retorna seu pid (no master)"""
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # Processo filho: nunca retorna ao código do master
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    codigo = 0
+    try:
+        _executar_worker(app, sock, numero)
+    except SystemExit as e:
+        codigo = e.code or 0
+    except BaseException:
+        logger.exception("Worker %s terminou com erro", numero)
+        codigo = 1
+    finally:
+        # Os handlers de atexit herdados gravam os buffers deste worker
+        atexit._run_exitfuncs()
+        os._exit(codigo)
+
+def servir(host, port, workers, app=None):
+    """
+    Executa a aplicação em modo pre-fork
+
+    O schema é inicializado uma única vez, no master, antes do fork; os
+    workers abrem suas conexões SQLite sob demanda. Workers que morrem são
+    recriados; SIGTERM/SIGINT no master encerra todos de forma graciosa
+
+    Args:
+        host (str): Endereço de escuta
+        port (int): Porta de escuta
+        workers (int): Número de processos worker
+        app: Aplicação já criada (padrão: create_app sem inicializar o banco)
+    """
+    from main import create_app
+
+    if not hasattr(os, 'fork'):
+        raise RuntimeError("Modo multi-worker requer os.fork (Linux/macOS)")
+
+    if app is None:
+        app = create_app(inicializar_banco=False)
+
+    init_database()
+    # Nenhuma conexão SQLite pode ser herdada pelos workers
+    close_db_connection()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    filhos = {}
+    encerrando = False
+
+    def encerrar(signum, frame):
+        nonlocal encerrando
+        encerrando = True
+        for pid in list(filhos):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    for numero in range(workers):
+        filhos[_criar_worker(app, sock, numero)] = (numero, time.monotonic())
+
+    # Purga de projetos excluídos só no master (os workers não a herdam)
+    purga.iniciar()
+
+    logger.info("Master %s servindo em %s:%s com %s workers",
+                os.getpid(), host, sock.getsockname()[1], workers)
+
+    while filhos:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(INTERVALO_VERIFICAR_WORKERS)
+            continue
+
+        numero, iniciado_em = filhos.pop(pid, (None, 0.0))
+        if numero is None or encerrando:
+            continue
+
+        logger.warning("Worker %s (pid %s) terminou com status %s; recriando",
+                       numero, pid, os.waitstatus_to_exitcode(status))
+        espera = ESPERA_RECRIAR_WORKER - (time.monotonic() - iniciado_em)
+        if espera > 0:
+            time.sleep(espera)
+        if not encerrando:
+            filhos[_criar_worker(app, sock, numero)] = (numero, time.monotonic())
+
+    sock.close()
+    logger.info("Todos os workers encerrados")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 8001)))
+    args = parser.parse_args()
+
+    servir(args.host, args.port, args.workers)
@@ -0,0 +1,40 @@
+"""
+Emergency Backend - Fixtures dos Testes
+Banco, shards e cache compartilhado em um diretório temporário, definidos
+antes de importar a configuração
+"""
+
+import os
+import tempfile
+import uuid
+
+_DIRETORIO = tempfile.mkdtemp(prefix='emergency-testes-')
+os.environ['DATABASE_PATH'] = os.path.join(_DIRETORIO, 'emergency_backend.db')
+os.environ['SHARDS_DIR'] = os.path.join(_DIRETORIO, 'shards')
+os.environ['ARQUIVOS_DIR'] = os.path.join(_DIRETORIO, 'conteudo')
+os.environ['PURGA_HABILITADA'] = 'false'
+
+import pytest
+
+@pytest.fixture(scope='session')
+def app():
+    from main import create_app
+    return create_app()
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+@pytest.fixture
+def cadastrar(cliente):
+    """Cadastra um usuário novo e retorna (usuario_id, headers com o token)"""
+    def cadastrar():
+        resposta = cliente.post('/api/cadastro', json={
+            'nome': 'Teste',
+            'email': f'{uuid.uuid4().hex}@exemplo.com',
+            'senha': '123456'
+        })
+        assert resposta.status_code == 200, resposta.get_json()
+        dados = resposta.get_json()['dados']
+        return dados['usuario']['id'], {'Authorization': f"Bearer {dados['token']}"}
+    return cadastrar
@@ -0,0 +1,37 @@
+"""
+Testes do controle de admissão por classe de rota
+"""
+
+from api import admissao
+
+def _saturar(classe):
+    """Ocupa todas as vagas e a fila: a próxima requisição é rejeitada"""
+    with classe._cond:
+        classe.em_execucao += classe.limite
+        classe.aguardando += classe.fila
+
+def _liberar(classe):
+    with classe._cond:
+        classe.em_execucao -= classe.limite
+        classe.aguardando -= classe.fila
+
+def test_status_responde_com_leituras_saturadas(cliente, cadastrar):
+    _, headers = cadastrar()
+    leitura = admissao._classes['leitura']
+    _saturar(leitura)
+    try:
+        resposta = cliente.get('/api/listar_projetos', headers=headers)
+        assert resposta.status_code == 503
+        assert resposta.headers['Retry-After']
+        assert cliente.get('/api/status').status_code == 200
+    finally:
+        _liberar(leitura)
+
+    assert cliente.get('/api/listar_projetos', headers=headers).status_code == 200
+
+def test_classe_admite_ate_o_limite():
+    classe = admissao.ClasseAdmissao('teste', limite=1, fila=0, espera=0.01)
+    assert classe.admitir() == 0.0
+    assert classe.admitir() is None
+    classe.liberar()
+    assert classe.admitir() == 0.0
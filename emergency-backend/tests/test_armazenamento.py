@@ -0,0 +1,125 @@
+"""
+Testes do armazenamento de conteúdo em arquivos: escrita atômica e
+sincronizada, leitura por mmap, entrega do arquivo pela rota de conteúdo e
+migração entre o SQLite e os arquivos
+"""
+
+import os
+import pytest
+from config.settings import Config
+from database import armazenamento
+from database.armazenamento import ArmazenamentoArquivos
+from database.models import Projeto
+from tools.migrar_armazenamento import para_arquivos, para_sqlite
+from utils.patch_utils import calcular_hash
+
+HTML = '<p>Olá, 世界 😀</p>'
+
+@pytest.fixture
+def sincronizados(monkeypatch):
+    """Diretórios sincronizados com fsync, na ordem"""
+    diretorios = []
+    original = armazenamento._sincronizar_diretorio
+
+    def sincronizar(diretorio):
+        diretorios.append(diretorio)
+        original(diretorio)
+
+    monkeypatch.setattr(armazenamento, '_sincronizar_diretorio', sincronizar)
+    return diretorios
+
+def test_gravar_e_atomico_e_sincroniza_os_diretorios(tmp_path, sincronizados):
+    arquivos = ArmazenamentoArquivos(tmp_path / 'conteudo')
+    hash_conteudo = calcular_hash(HTML)
+    destino = arquivos.caminho(hash_conteudo)
+
+    assert arquivos.gravar(HTML, hash_conteudo) == ('', len(HTML))
+    assert destino.read_bytes() == HTML.encode('utf-8')
+    assert not list(destino.parent.glob('.tmp-*'))
+    # raiz, ab/ e ab/cd/ criados (cada um sincronizado no pai) e o rename
+    assert sincronizados == [tmp_path, tmp_path / 'conteudo', destino.parent.parent,
+                             destino.parent]
+
+    # Conteúdo já gravado: só a data de modificação é renovada
+    del sincronizados[:]
+    os.utime(destino, (0, 0))
+    arquivos.gravar(HTML, hash_conteudo)
+    assert destino.stat().st_mtime > 0
+    assert sincronizados == []
+
+def test_falha_na_escrita_nao_deixa_arquivo(tmp_path, monkeypatch):
+    arquivos = ArmazenamentoArquivos(tmp_path)
+    hash_conteudo = calcular_hash(HTML)
+
+    def falhar(origem, destino):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(os, 'replace', falhar)
+    with pytest.raises(OSError):
+        arquivos.gravar(HTML, hash_conteudo)
+
+    destino = arquivos.caminho(hash_conteudo)
+    assert not destino.exists()
+    assert not list(destino.parent.iterdir())
+
+def test_ler_por_mmap(tmp_path):
+    arquivos = ArmazenamentoArquivos(tmp_path)
+    arquivos.gravar(HTML, calcular_hash(HTML))
+    arquivos.gravar('', calcular_hash(''))
+
+    assert arquivos.ler(calcular_hash(HTML)) == HTML
+    assert arquivos.ler(calcular_hash('')) == ''
+    with pytest.raises(FileNotFoundError):
+        arquivos.ler(calcular_hash('ausente'))
+
+def test_rota_de_conteudo_entrega_o_arquivo(cliente, cadastrar, monkeypatch):
+    monkeypatch.setattr(Config, 'ARMAZENAMENTO', 'arquivos')
+    _, headers = cadastrar()
+    projeto = cliente.post('/api/salvar_projeto', headers=headers, json={
+        'titulo': 'T', 'conteudo_html': HTML}).get_json()['dados']
+
+    entregues = []
+
+    class FileWrapper:
+        """wsgi.file_wrapper do servidor (onde entraria o sendfile)"""
+
+        def __init__(self, arquivo, tamanho_bloco=8192):
+            entregues.append(arquivo.name)
+            self.arquivo = arquivo
+
+        def __iter__(self):
+            return iter(lambda: self.arquivo.read(8192), b'')
+
+        def close(self):
+            self.arquivo.close()
+
+    url = f"/api/carregar_projeto/{projeto['id']}/conteudo"
+    resposta = cliente.get(url, headers=headers,
+                           environ_overrides={'wsgi.file_wrapper': FileWrapper})
+    assert resposta.status_code == 200
+    assert resposta.get_data(as_text=True) == HTML
+    assert entregues == [str(armazenamento.armazenamento_arquivos().caminho(
+        projeto['hash_conteudo']))]
+    assert resposta.headers['ETag'] == f'"{projeto["hash_conteudo"]}"'
+
+    resposta = cliente.get(url, headers=dict(headers, **{
+        'If-None-Match': f'"{projeto["hash_conteudo"]}"'}))
+    assert resposta.status_code == 304
+
+def test_migracao_nos_dois_sentidos(cliente, cadastrar):
+    usuario_id, headers = cadastrar()
+    projeto_id = cliente.post('/api/salvar_projeto', headers=headers, json={
+        'titulo': 'T', 'conteudo_html': HTML}).get_json()['dados']['id']
+
+    def linha():
+        return Projeto.buscar_por_id(projeto_id)
+
+    assert para_arquivos(lote=2)[0] >= 1
+    arquivo = Projeto.buscar_arquivo_conteudo(projeto_id, usuario_id)
+    assert arquivo['caminho'] is not None and arquivo['caminho'].exists()
+    assert linha()['conteudo_html'] == HTML
+
+    assert para_sqlite(lote=2)[0] >= 1
+    assert Projeto.buscar_arquivo_conteudo(projeto_id, usuario_id)['caminho'] is None
+    assert linha()['conteudo_html'] == HTML
+    assert linha()['versao'] == 1
@@ -0,0 +1,123 @@
+"""
+Testes do buffer de autosave: salvamentos que chegam durante uma gravação,
+gravações que falham e conflitos com outra sessão
+"""
+
+import sqlite3
+import time
+import pytest
+from core import autosave
+from core.autosave import BufferAutosave
+from database.models import Projeto, ConflitoVersaoError
+
+@pytest.fixture
+def buffer():
+    buffer = BufferAutosave(atraso_quieto=60, atraso_maximo=60)
+    yield buffer
+    buffer.encerrar()
+
+def _criar(cliente, headers):
+    resposta = cliente.post('/api/salvar_projeto', json={'titulo': 'T', 'conteudo_html': '<p>1</p>'},
+                            headers=headers)
+    return resposta.get_json()['dados']['id']
+
+def test_atraso_maximo_recomeca_no_salvamento_durante_a_gravacao(cliente, cadastrar, buffer,
+                                                                 monkeypatch):
+    usuario_id, headers = cadastrar()
+    projeto_id = _criar(cliente, headers)
+
+    buffer.salvar(usuario_id, projeto_id, 'T', '<p>2</p>')
+    primeiro = buffer._pendentes[projeto_id].primeiro
+    time.sleep(0.01)
+
+    original = Projeto.atualizar_projeto
+    chegada = {}
+
+    def atualizar_projeto(*args, **kwargs):
+        # Um salvamento chega depois de a gravação copiar a entrada
+        chegada['antes'] = time.monotonic()
+        buffer.salvar(usuario_id, projeto_id, 'T', '<p>3</p>')
+        chegada['depois'] = time.monotonic()
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(autosave.Projeto, 'atualizar_projeto', staticmethod(atualizar_projeto))
+    assert buffer._gravar(projeto_id)['versao'] == 2
+
+    entrada = buffer._pendentes[projeto_id]
+    assert entrada.versao_base == 2 and entrada.versao == 3
+    assert entrada.primeiro > primeiro
+    assert chegada['antes'] <= entrada.primeiro <= chegada['depois']
+
+    monkeypatch.setattr(autosave.Projeto, 'atualizar_projeto', original)
+    assert buffer._gravar(projeto_id)['versao'] == 3
+    assert projeto_id not in buffer._pendentes
+
+def test_gravacao_que_falha_mantem_a_entrada_e_tenta_de_novo(cliente, cadastrar, buffer,
+                                                             monkeypatch):
+    usuario_id, headers = cadastrar()
+    projeto_id = _criar(cliente, headers)
+    buffer.salvar(usuario_id, projeto_id, 'T', '<p>2</p>')
+
+    original = Projeto.atualizar_projeto
+
+    def travado(*args, **kwargs):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(autosave.Projeto, 'atualizar_projeto', staticmethod(travado))
+    with pytest.raises(sqlite3.OperationalError):
+        buffer._gravar(projeto_id)
+
+    # O salvamento já confirmado continua no buffer, com a próxima tentativa adiada
+    entrada = buffer._pendentes[projeto_id]
+    assert entrada.versao == 2 and entrada.tentativas == 1
+    assert entrada.proxima_gravacao(0, 0) > time.monotonic()
+    assert buffer.obter(projeto_id, usuario_id)['conteudo_html'] == '<p>2</p>'
+
+    monkeypatch.setattr(autosave.Projeto, 'atualizar_projeto', original)
+    assert buffer._gravar(projeto_id)['versao'] == 2
+    assert projeto_id not in buffer._pendentes
+    assert Projeto.buscar_por_id(projeto_id)['conteudo_html'] == '<p>2</p>'
+
+def test_conflito_fica_retido_ate_o_proximo_carregamento(cliente, cadastrar, buffer):
+    usuario_id, headers = cadastrar()
+    projeto_id = _criar(cliente, headers)
+    buffer.salvar(usuario_id, projeto_id, 'T', '<p>buffer</p>')
+    # Outra sessão grava o projeto direto no banco
+    Projeto.atualizar_projeto(projeto_id, 'T', '<p>outra</p>', usuario_id=usuario_id)
+
+    with pytest.raises(ConflitoVersaoError):
+        buffer._gravar(projeto_id)
+    assert buffer._pendentes[projeto_id].conflito == 2
+
+    with pytest.raises(ConflitoVersaoError) as erro:
+        buffer.obter(projeto_id, usuario_id)
+    assert erro.value.versao_atual == 2
+    # Entregue uma vez: o próximo carregamento vem do banco
+    assert projeto_id not in buffer._pendentes
+    assert buffer.obter(projeto_id, usuario_id) is None
+
+def test_conflito_retido_responde_409_ao_carregar(cliente, cadastrar):
+    usuario_id, headers = cadastrar()
+    projeto_id = _criar(cliente, headers)
+    cliente.post('/api/salvar_projeto', headers=headers, json={
+        'titulo': 'T', 'conteudo_html': '<p>buffer</p>', 'projeto_id': projeto_id})
+    Projeto.atualizar_projeto(projeto_id, 'T', '<p>outra</p>', usuario_id=usuario_id)
+
+    with pytest.raises(ConflitoVersaoError):
+        autosave.buffer_autosave.descarregar(projeto_id)
+
+    resposta = cliente.get(f'/api/carregar_projeto/{projeto_id}', headers=headers)
+    assert resposta.status_code == 409
+    assert resposta.get_json()['dados'] == {'versao_atual': 2}
+    resposta = cliente.get(f'/api/carregar_projeto/{projeto_id}', headers=headers)
+    assert resposta.get_json()['dados']['conteudo_html'] == '<p>outra</p>'
+
+def test_projeto_inexistente_descarta_a_entrada(cliente, cadastrar, buffer, monkeypatch):
+    usuario_id, headers = cadastrar()
+    projeto_id = _criar(cliente, headers)
+    buffer.salvar(usuario_id, projeto_id, 'T', '<p>2</p>')
+
+    monkeypatch.setattr(autosave.Projeto, 'atualizar_projeto',
+                        staticmethod(lambda *args, **kwargs: None))
+    assert buffer._gravar(projeto_id) is None
+    assert projeto_id not in buffer._pendentes
@@ -0,0 +1,110 @@
+"""
+Testes do cache local/compartilhado (utils/cache.py) e do cache de tokens
+verificados
+"""
+
+import time
+from utils import cache, token_utils
+from utils.cache import CacheLocal, criar_cache
+
+def test_local_expira_pelo_ttl():
+    c = CacheLocal('teste_ttl', ttl=0.05)
+    c.definir('a', 1)
+    assert c.obter('a') == 1
+    time.sleep(0.06)
+    assert c.obter('a') is None
+
+def test_local_ttl_zero_nao_guarda():
+    c = CacheLocal('teste_ttl_zero', ttl=60)
+    c.definir('a', 1, 0)
+    assert c.obter('a') is None
+    # adicionar com ttl 0 sempre "ganha": nada fica guardado
+    assert c.adicionar('b', True, 0)
+    assert c.adicionar('b', True, 0)
+
+def test_local_ttl_none_nao_expira():
+    c = CacheLocal('teste_sem_ttl')
+    c.definir('a', {'x': 1})
+    valor = c.obter('a')
+    valor['x'] = 2
+    assert c.obter('a') == {'x': 1}
+
+def test_local_adicionar_e_remover():
+    c = CacheLocal('teste_adicionar', ttl=60)
+    assert c.adicionar('k', 1)
+    assert not c.adicionar('k', 2)
+    assert c.obter('k') == 1
+    c.remover('k')
+    assert c.adicionar('k', 3)
+
+def test_local_lru_limitado():
+    c = CacheLocal('teste_lru', max_entradas=2)
+    c.definir('a', 1)
+    c.definir('b', 2)
+    c.obter('a')
+    c.definir('c', 3)
+    assert c.obter('b') is None
+    assert c.obter('a') == 1 and c.obter('c') == 3
+
+def test_compartilhado_ttl_zero_e_invalidacao(app):
+    c = criar_cache('teste_compartilhado', ttl=60, compartilhado=True)
+    c.definir('a', 1)
+    assert c.obter('a') == 1
+    c.definir('a', 2, 0)
+    assert c.obter('a') is None
+    assert c.adicionar('b', True, 0)
+    assert c.adicionar('b', True, 0)
+
+    # Outro processo invalida 'x': a entrada local é descartada na sincronização
+    c.definir('x', 'antigo')
+    conn = cache._arquivo.conexao()
+    conn.execute("UPDATE entradas SET valor = '\"novo\"' WHERE namespace = ? AND chave = 'x'",
+                 (c.namespace,))
+    conn.execute("INSERT INTO invalidacoes (namespace, chave, origem, criado_em) "
+                 "VALUES (?, 'x', -1, ?)", (c.namespace, time.time()))
+    time.sleep(0.2)
+    assert c.obter('x') == 'novo'
+
+def test_compartilhado_adicionar_so_escreve_com_a_chave_ausente(app):
+    c = criar_cache('teste_adicionar_compartilhado', ttl=60, compartilhado=True)
+    comandos = []
+    conn = cache._arquivo.conexao()
+    conn.set_trace_callback(comandos.append)
+    try:
+        assert c.adicionar('k', 1)
+        assert any(sql.lstrip().startswith('INSERT') for sql in comandos)
+
+        # Válida no cache local: nem lê o arquivo
+        del comandos[:]
+        assert not c.adicionar('k', 2)
+        assert not [sql for sql in comandos if 'entradas' in sql]
+
+        # Só no arquivo (ex: guardada por outro processo): lê sem escrever
+        c.local.limpar()
+        del comandos[:]
+        assert not c.adicionar('k', 3)
+        assert [sql for sql in comandos if 'entradas' in sql]
+        assert not any(sql.lstrip().startswith('INSERT') for sql in comandos)
+        assert c.obter('k') == 1
+    finally:
+        conn.set_trace_callback(None)
+
+def test_token_no_ultimo_segundo_nao_fica_em_cache(monkeypatch):
+    token_utils._tokens_verificados.limpar()
+    token = token_utils.gerar_token(910001)
+    expiracao = token_utils.extrair_info_token(token)['expiracao']
+
+    monkeypatch.setattr(time, 'time', lambda: float(expiracao))
+    assert token_utils.verificar_token(token) == 910001
+    assert token_utils._tokens_verificados.obter(token) is None
+
+    monkeypatch.setattr(time, 'time', lambda: float(expiracao + 10 ** 6))
+    assert token_utils.verificar_token(token) is None
+
+def test_token_em_cache_reconfere_expiracao(monkeypatch):
+    token = token_utils.gerar_token(910002)
+    assert token_utils.verificar_token(token) == 910002
+    expiracao = token_utils._tokens_verificados.obter(token)[1]
+
+    monkeypatch.setattr(time, 'time', lambda: float(expiracao + 1))
+    assert token_utils.verificar_token(token) is None
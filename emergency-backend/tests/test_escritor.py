@@ -0,0 +1,94 @@
+"""
+Testes do escritor único: um SAVEPOINT por operação dentro do commit de
+grupo e cancelamento das operações cujo prazo vence na fila
+"""
+
+import sqlite3
+import time
+import pytest
+from database import escritor as modulo_escritor
+from database.escritor import EscritorUnico, executar_escrita
+from utils import metrics, prazos
+
+INSERIR = "INSERT INTO itens (id, nome) VALUES (?, ?)"
+
+@pytest.fixture
+def caminho(tmp_path):
+    caminho = tmp_path / 'escritor.db'
+    conn = sqlite3.connect(str(caminho))
+    conn.execute("CREATE TABLE itens (id INTEGER PRIMARY KEY, nome TEXT NOT NULL UNIQUE)")
+    conn.commit()
+    conn.close()
+    return caminho
+
+@pytest.fixture
+def escritor(caminho):
+    escritor = EscritorUnico(caminho, lote_maximo=16, espera=0)
+    yield escritor
+    escritor.encerrar()
+
+@pytest.fixture
+def bloqueio(caminho):
+    """Segura o lock de escrita do arquivo até liberar() ser chamado"""
+    conn = sqlite3.connect(str(caminho), isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+
+    class Bloqueio:
+        def liberar(self):
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+
+    yield Bloqueio()
+    Bloqueio().liberar()
+    conn.close()
+
+def _nomes(caminho):
+    conn = sqlite3.connect(str(caminho))
+    try:
+        return [row[0] for row in conn.execute("SELECT nome FROM itens ORDER BY id")]
+    finally:
+        conn.close()
+
+def test_erro_de_uma_operacao_nao_desfaz_as_outras_do_lote(caminho, escritor, bloqueio):
+    commits = metrics.obter_contador('escritor.commits')
+
+    # A primeira operação prende a thread no BEGIN IMMEDIATE; as seguintes
+    # acumulam na fila e entram juntas no próximo lote
+    primeira = escritor.enviar(INSERIR, (1, 'a'))
+    time.sleep(0.2)
+    futuros = [escritor.enviar(INSERIR, (2, 'b')),
+               escritor.enviar(INSERIR, (3, 'a')),
+               escritor.enviar("UPDATE itens SET nome = 'b2' WHERE id = 2")]
+    bloqueio.liberar()
+
+    assert primeira.result(5).rowcount == 1
+    assert futuros[0].result(5).lastrowid == 2
+    with pytest.raises(sqlite3.IntegrityError):
+        futuros[1].result(5)
+    assert futuros[2].result(5).rowcount == 1
+
+    assert metrics.obter_contador('escritor.commits') - commits == 2
+    assert _nomes(caminho) == ['a', 'b2']
+
+def test_operacao_com_prazo_vencido_na_fila_e_cancelada(caminho, escritor, bloqueio,
+                                                      monkeypatch):
+    monkeypatch.setitem(modulo_escritor._escritores, 'teste', escritor)
+    bloqueador = escritor.enviar(INSERIR, (1, 'a'))
+    time.sleep(0.2)
+
+    prazos.iniciar('teste', 0.2)
+    try:
+        inicio = time.monotonic()
+        with pytest.raises(prazos.PrazoExcedidoError) as erro:
+            executar_escrita(INSERIR, (2, 'cancelada'), shard='teste')
+        assert time.monotonic() - inicio < 1
+        assert erro.value.tipo == prazos.ESPERA_LOCK
+        assert erro.value.status == 503
+    finally:
+        prazos.finalizar()
+
+    bloqueio.liberar()
+    bloqueador.result(5)
+    # A operação cancelada não é aplicada depois que o lock é liberado
+    assert escritor.enviar(INSERIR, (3, 'c')).result(5).rowcount == 1
+    assert _nomes(caminho) == ['a', 'c']
@@ -0,0 +1,123 @@
+"""
+Testes do feed de eventos (SSE): retomada pelo Last-Event-ID, pedido de
+ressincronização, consumidor lento e limite de conexões por usuário
+"""
+
+import pytest
+from config.settings import Config
+from core.eventos import BarramentoEventos, barramento, RESSINCRONIZAR, PROJETO_ATUALIZADO
+from utils import metrics
+
+def _tipos(assinatura):
+    tipos = []
+    while True:
+        evento = assinatura.obter(timeout=0)
+        if evento is None:
+            return tipos
+        tipos.append((evento['tipo'], evento['dados']))
+
+def test_retomada_dentro_do_historico():
+    eventos = BarramentoEventos(tamanho_historico=10, tamanho_fila=10)
+    ids = [eventos.publicar(1, PROJETO_ATUALIZADO, {'id': n})['id'] for n in range(3)]
+    eventos.publicar(2, PROJETO_ATUALIZADO, {'id': 99})
+
+    assinatura = eventos.assinar(1, ids[0])
+    # Só os eventos do usuário posteriores ao último recebido
+    assert _tipos(assinatura) == [(PROJETO_ATUALIZADO, {'id': 1}), (PROJETO_ATUALIZADO, {'id': 2})]
+
+@pytest.mark.parametrize('ultimo_id', ['outraepoca-1', 'invalido'])
+def test_id_de_outro_processo_pede_ressincronizacao(ultimo_id):
+    eventos = BarramentoEventos(tamanho_historico=10, tamanho_fila=10)
+    eventos.publicar(1, PROJETO_ATUALIZADO, {'id': 1})
+
+    assert _tipos(eventos.assinar(1, ultimo_id)) == [(RESSINCRONIZAR, None)]
+
+def test_id_anterior_ao_historico_pede_ressincronizacao():
+    eventos = BarramentoEventos(tamanho_historico=2, tamanho_fila=10)
+    ids = [eventos.publicar(1, PROJETO_ATUALIZADO, {'id': n})['id'] for n in range(4)]
+
+    assert _tipos(eventos.assinar(1, ids[0])) == [(RESSINCRONIZAR, None)]
+    # O último descartado do histórico ainda pode ser retomado
+    assert _tipos(eventos.assinar(1, ids[1])) == [(PROJETO_ATUALIZADO, {'id': 2}),
+                                                  (PROJETO_ATUALIZADO, {'id': 3})]
+
+def test_consumidor_lento_recebe_uma_ressincronizacao():
+    eventos = BarramentoEventos(tamanho_historico=10, tamanho_fila=2)
+    assinatura = eventos.assinar(1)
+    descartados = metrics.obter_contador('eventos.descartados')
+
+    for n in range(10):
+        eventos.publicar(1, PROJETO_ATUALIZADO, {'id': n})
+
+    # A cada estouro o que estava na fila vira uma única ressincronização:
+    # nunca há duas, e o que chega depois dela continua sendo entregue
+    assert _tipos(assinatura) == [(RESSINCRONIZAR, None), (PROJETO_ATUALIZADO, {'id': 9})]
+    assert metrics.obter_contador('eventos.descartados') > descartados
+
+    eventos.publicar(1, PROJETO_ATUALIZADO, {'id': 10})
+    assert _tipos(assinatura) == [(PROJETO_ATUALIZADO, {'id': 10})]
+
+def _ler_eventos(resposta, quantidade):
+    """Blocos SSE de eventos (sem retry e pings) até a quantidade pedida"""
+    blocos = []
+    for pedaco in resposta.response:
+        texto = pedaco.decode('utf-8') if isinstance(pedaco, bytes) else pedaco
+        if texto.startswith('id:'):
+            blocos.append(texto)
+            if len(blocos) == quantidade:
+                return blocos
+    return blocos
+
+def test_rota_retoma_pelo_last_event_id(cliente, cadastrar, monkeypatch):
+    monkeypatch.setattr(Config, 'EVENTOS_HEARTBEAT', 0.05)
+    usuario_id, headers = cadastrar()
+    ids = [barramento.publicar(usuario_id, PROJETO_ATUALIZADO, {'id': n})['id']
+           for n in range(3)]
+
+    resposta = cliente.get('/api/eventos', headers=dict(headers, **{'Last-Event-ID': ids[0]}),
+                           buffered=False)
+    try:
+        assert resposta.status_code == 200
+        assert resposta.mimetype == 'text/event-stream'
+        blocos = _ler_eventos(resposta, 2)
+    finally:
+        resposta.close()
+
+    assert [bloco.split('\n')[0] for bloco in blocos] == [f'id: {ids[1]}', f'id: {ids[2]}']
+    assert blocos[0].split('\n')[1] == f'event: {PROJETO_ATUALIZADO}'
+
+def test_rota_com_id_desconhecido_pede_ressincronizacao(cliente, cadastrar, monkeypatch):
+    monkeypatch.setattr(Config, 'EVENTOS_HEARTBEAT', 0.05)
+    _, headers = cadastrar()
+
+    resposta = cliente.get('/api/eventos?ultimo_id=outraepoca-7', headers=headers,
+                           buffered=False)
+    try:
+        blocos = _ler_eventos(resposta, 1)
+    finally:
+        resposta.close()
+    assert blocos[0].split('\n')[1] == f'event: {RESSINCRONIZAR}'
+
+def test_limite_de_conexoes_por_usuario(cliente, cadastrar, monkeypatch):
+    monkeypatch.setattr(Config, 'EVENTOS_MAX_CONEXOES_USUARIO', 2)
+    monkeypatch.setattr(Config, 'EVENTOS_HEARTBEAT', 0.05)
+    _, headers = cadastrar()
+    _, outro = cadastrar()
+
+    abertas = [cliente.get('/api/eventos', headers=headers, buffered=False) for _ in range(2)]
+    try:
+        assert [r.status_code for r in abertas] == [200, 200]
+        assert cliente.get('/api/eventos', headers=headers).status_code == 429
+
+        # O limite é por usuário
+        resposta = cliente.get('/api/eventos', headers=outro, buffered=False)
+        assert resposta.status_code == 200
+        resposta.close()
+
+        # Uma conexão fechada libera a vaga
+        abertas.pop().close()
+        abertas.append(cliente.get('/api/eventos', headers=headers, buffered=False))
+        assert abertas[-1].status_code == 200
+    finally:
+        for resposta in abertas:
+            resposta.close()
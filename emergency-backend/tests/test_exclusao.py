@@ -0,0 +1,111 @@
+"""
+Testes da exclusão lógica: contador de projetos mantido pelos triggers,
+janela de restauração, purga e salvamentos pendentes no autosave
+"""
+
+from config.settings import Config
+from database import purga
+from database.db import execute_query, get_database_info, invalidar_cache_info
+from utils.patch_utils import calcular_hash
+
+def _total_projetos():
+    invalidar_cache_info()
+    return get_database_info()['projetos_total']
+
+def _criar(cliente, headers, html='<p>hello</p>'):
+    resposta = cliente.post('/api/salvar_projeto', json={'titulo': 'T', 'conteudo_html': html},
+                            headers=headers)
+    assert resposta.status_code == 200
+    return resposta.get_json()['dados']['id']
+
+def _linhas(projeto_id):
+    return (execute_query("SELECT COUNT(*) AS n FROM projetos WHERE id = ?",
+                          (projeto_id,), fetch_one=True)['n'],
+            execute_query("SELECT COUNT(*) AS n FROM projetos_excluidos WHERE projeto_id = ?",
+                          (projeto_id,), fetch_one=True)['n'])
+
+def test_exclusao_e_restauracao_mantem_contador(cliente, cadastrar):
+    _, headers = cadastrar()
+    projeto_id = _criar(cliente, headers)
+    total = _total_projetos()
+
+    assert cliente.delete(f'/api/deletar_projeto/{projeto_id}', headers=headers).status_code == 200
+    assert _total_projetos() == total - 1
+    assert _linhas(projeto_id) == (1, 1)
+    assert cliente.get(f'/api/carregar_projeto/{projeto_id}', headers=headers).status_code == 404
+    listagem = cliente.get('/api/listar_projetos', headers=headers).get_json()['dados']
+    assert projeto_id not in [p['id'] for p in listagem]
+
+    # Excluir de novo não desconta outra vez
+    assert cliente.delete(f'/api/deletar_projeto/{projeto_id}', headers=headers).status_code == 404
+    assert _total_projetos() == total - 1
+
+    resposta = cliente.post(f'/api/restaurar_projeto/{projeto_id}', headers=headers)
+    assert resposta.status_code == 200
+    assert resposta.get_json()['dados']['id'] == projeto_id
+    assert _total_projetos() == total
+    assert _linhas(projeto_id) == (1, 0)
+    assert cliente.get(f'/api/carregar_projeto/{projeto_id}', headers=headers).status_code == 200
+
+def test_restauracao_so_pelo_dono(cliente, cadastrar):
+    _, headers = cadastrar()
+    _, outro = cadastrar()
+    projeto_id = _criar(cliente, headers)
+
+    assert cliente.delete(f'/api/deletar_projeto/{projeto_id}', headers=outro).status_code == 404
+    cliente.delete(f'/api/deletar_projeto/{projeto_id}', headers=headers)
+    assert cliente.post(f'/api/restaurar_projeto/{projeto_id}', headers=outro).status_code == 404
+
+def test_janela_vencida_e_purga(cliente, cadastrar, monkeypatch):
+    _, headers = cadastrar()
+    projeto_id = _criar(cliente, headers)
+    cliente.delete(f'/api/deletar_projeto/{projeto_id}', headers=headers)
+    total = _total_projetos()
+
+    # Dentro da janela a purga não remove nada
+    purga.purgar_shard(0)
+    assert _linhas(projeto_id) == (1, 1)
+
+    monkeypatch.setattr(Config, 'EXCLUSAO_JANELA_RESTAURACAO', 0)
+    assert cliente.post(f'/api/restaurar_projeto/{projeto_id}', headers=headers).status_code == 404
+
+    assert purga.purgar_shard(0, lote=1) >= 1
+    assert _linhas(projeto_id) == (0, 0)
+    # A linha purgada já tinha sido descontada
+    assert _total_projetos() == total
+
+def test_exclusao_de_usuario_com_projeto_excluido(cliente, cadastrar):
+    usuario_id, headers = cadastrar()
+    vivo = _criar(cliente, headers)
+    excluido = _criar(cliente, headers)
+    cliente.delete(f'/api/deletar_projeto/{excluido}', headers=headers)
+    total = _total_projetos()
+
+    execute_query("DELETE FROM usuarios WHERE id = ?", (usuario_id,), commit=True)
+
+    assert _linhas(vivo) == (0, 0)
+    assert _linhas(excluido) == (0, 0)
+    assert _total_projetos() == total - 1
+
+def test_restauracao_traz_salvamentos_pendentes_do_autosave(cliente, cadastrar, monkeypatch):
+    monkeypatch.setattr(Config, 'AUTOSAVE_HABILITADO', True)
+    _, headers = cadastrar()
+    projeto_id = _criar(cliente, headers)
+
+    resposta = cliente.post('/api/salvar_projeto', json={
+        'projeto_id': projeto_id, 'titulo': 'T', 'conteudo_html': '<p>v2</p>'
+    }, headers=headers)
+    assert resposta.get_json()['dados']['versao'] == 2
+    resposta = cliente.post('/api/salvar_projeto', json={
+        'projeto_id': projeto_id, 'titulo': 'T', 'hash_base': calcular_hash('<p>v2</p>'),
+        'patch': [{'pos': 4, 'remover': 1, 'inserir': '3'}]
+    }, headers=headers)
+    assert resposta.status_code == 200
+    assert resposta.get_json()['dados']['versao'] == 3
+
+    cliente.delete(f'/api/deletar_projeto/{projeto_id}', headers=headers)
+    restaurado = cliente.post(f'/api/restaurar_projeto/{projeto_id}', headers=headers)
+    assert restaurado.get_json()['dados']['versao'] == 3
+
+    projeto = cliente.get(f'/api/carregar_projeto/{projeto_id}', headers=headers).get_json()['dados']
+    assert projeto['conteudo_html'] == '<p>v3</p>'
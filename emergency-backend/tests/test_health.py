@@ -0,0 +1,126 @@
+"""
+Testes dos probes de saúde
+"""
+
+import threading
+from config.settings import Config
+from database.db import contar_conexoes_abertas, contar_threads_com_conexao, execute_query
+from utils import health
+
+def test_conexoes_de_threads_encerradas_nao_contam(app):
+    # Servidor threaded: cada requisição roda em uma thread nova
+    antes = contar_conexoes_abertas()
+
+    def requisicao():
+        assert app.test_client().get('/api/status').status_code == 200
+        execute_query("SELECT 1", fetch_one=True)
+
+    for _ in range(40):
+        thread = threading.Thread(target=requisicao)
+        thread.start()
+        thread.join()
+
+    assert contar_conexoes_abertas() <= antes + 1
+
+def test_conexoes_de_threads_vivas_contam(app):
+    antes = contar_conexoes_abertas()
+    pronta = threading.Event()
+    liberar = threading.Event()
+
+    def segurar_conexao():
+        execute_query("SELECT 1", fetch_one=True)
+        pronta.set()
+        liberar.wait(5)
+
+    thread = threading.Thread(target=segurar_conexao)
+    thread.start()
+    pronta.wait(5)
+    assert contar_conexoes_abertas() == antes + 1
+    liberar.set()
+    thread.join()
+    assert contar_conexoes_abertas() == antes
+
+def test_prontidao_apos_muitas_requisicoes(app):
+    def requisicao():
+        app.test_client().get('/api/status')
+
+    for _ in range(40):
+        thread = threading.Thread(target=requisicao)
+        thread.start()
+        thread.join()
+
+    resposta = app.test_client().get('/health/ready')
+    assert resposta.status_code == 200
+    assert resposta.get_json()['dados']['verificacoes']['conexoes']['abertas'] < 40
+
+def test_threads_simultaneas_contam_separadamente(app):
+    antes = contar_conexoes_abertas()
+    prontas = threading.Barrier(6)
+    liberar = threading.Event()
+
+    def segurar_conexao():
+        execute_query("SELECT 1", fetch_one=True)
+        prontas.wait(5)
+        liberar.wait(5)
+
+    threads = [threading.Thread(target=segurar_conexao) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    prontas.wait(5)
+    assert contar_conexoes_abertas() == antes + 5
+    liberar.set()
+    for thread in threads:
+        thread.join()
+    assert contar_conexoes_abertas() == antes
+
+def test_capacidade_derivada_dos_limites_de_admissao(monkeypatch):
+    monkeypatch.setattr(Config, 'DB_MAX_CONEXOES', None)
+    limites = sum(classe['limite'] for classe in Config.ADMISSAO_CLASSES.values())
+    assert health.capacidade_conexoes() == \
+        limites + Config.WS_WORKERS + Config.DB_CONEXOES_RESERVA
+
+    monkeypatch.setattr(Config, 'DB_MAX_CONEXOES', 10)
+    assert health.capacidade_conexoes() == 10
+
+def test_thread_com_conexoes_em_dois_shards_conta_uma_vez(app):
+    antes = contar_threads_com_conexao()
+    pronta = threading.Event()
+    liberar = threading.Event()
+
+    def segurar_conexoes():
+        # Um arquivo fora da numeração de shards (não entra em listar_shards)
+        execute_query("SELECT 1", fetch_one=True, shard=0)
+        execute_query("SELECT 1", fetch_one=True, shard='saude')
+        pronta.set()
+        liberar.wait(5)
+
+    thread = threading.Thread(target=segurar_conexoes)
+    thread.start()
+    pronta.wait(5)
+    assert contar_threads_com_conexao() == antes + 1
+    assert contar_conexoes_abertas() >= 2
+    liberar.set()
+    thread.join()
+
+def test_saturacao_sozinha_so_degrada(app, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_MAX_CONEXOES', 1)
+    prontas = threading.Barrier(4)
+    liberar = threading.Event()
+
+    def segurar_conexao():
+        execute_query("SELECT 1", fetch_one=True)
+        prontas.wait(5)
+        liberar.wait(5)
+
+    threads = [threading.Thread(target=segurar_conexao) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    prontas.wait(5)
+    try:
+        conexoes = health._verificar_conexoes()
+        assert conexoes['saturacao'] >= 3
+        assert conexoes['estado'] == health.DEGRADADO
+    finally:
+        liberar.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,51 @@
+"""
+Testes do provider JSON: mesma saída do provider padrão do Flask para os
+tipos que ele aceita, com os dois encoders
+"""
+
+import dataclasses
+import datetime
+import decimal
+import json
+import uuid
+import pytest
+from flask.json.provider import DefaultJSONProvider
+from utils.json_utils import ENCODERS_DISPONIVEIS, codificar_json
+
+@dataclasses.dataclass
+class Ponto:
+    x: int
+    y: int
+
+class Marcado:
+    def __html__(self):
+        return '<b>ok</b>'
+
+VALORES = {
+    'data_hora': datetime.datetime(2024, 1, 15, 10, 30, tzinfo=datetime.timezone.utc),
+    'data': datetime.date(2024, 1, 15),
+    'decimal': decimal.Decimal('10.50'),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'dataclass': Ponto(1, 2),
+    'html': Marcado()
+}
+
+@pytest.mark.parametrize('encoder', ENCODERS_DISPONIVEIS)
+def test_mesma_saida_do_provider_do_flask(app, encoder):
+    esperado = json.loads(DefaultJSONProvider(app).dumps(VALORES))
+
+    assert json.loads(codificar_json(VALORES, encoder)) == esperado
+    assert esperado['data_hora'] == 'Mon, 15 Jan 2024 10:30:00 GMT'
+    assert esperado['decimal'] == '10.50'
+
+@pytest.mark.parametrize('encoder', ENCODERS_DISPONIVEIS)
+def test_tipos_extras(encoder):
+    dados = {'bytes': b'abc', 'conjunto': {1}, 'hora': datetime.time(10, 30)}
+
+    assert json.loads(codificar_json(dados, encoder)) == \
+        {'bytes': 'abc', 'conjunto': [1], 'hora': '10:30:00'}
+
+@pytest.mark.parametrize('encoder', ENCODERS_DISPONIVEIS)
+def test_tipo_desconhecido_falha(encoder):
+    with pytest.raises(TypeError):
+        codificar_json({'objeto': object()}, encoder)
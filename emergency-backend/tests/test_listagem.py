@@ -0,0 +1,77 @@
+"""
+Testes do ETag da listagem de projetos: If-None-Match responde 304 e o
+ETag muda a cada alteração dos projetos do usuário
+"""
+
+from core.autosave import buffer_autosave
+
+def _etag(cliente, headers):
+    """ETag atual da listagem, conferindo que ele mesmo responde 304"""
+    resposta = cliente.get('/api/listar_projetos', headers=headers)
+    assert resposta.status_code == 200
+    etag = resposta.headers['ETag']
+
+    nao_modificado = cliente.get('/api/listar_projetos',
+                                 headers=dict(headers, **{'If-None-Match': etag}))
+    assert nao_modificado.status_code == 304
+    assert nao_modificado.headers['ETag'] == etag
+    assert nao_modificado.get_data() == b''
+    return etag
+
+def _salvar(cliente, headers, **dados):
+    resposta = cliente.post('/api/salvar_projeto', headers=headers,
+                            json=dict({'titulo': 'T'}, **dados))
+    assert resposta.status_code == 200, resposta.get_json()
+    return resposta.get_json()['dados']
+
+def test_if_none_match_com_etag_antigo_lista_de_novo(cliente, cadastrar):
+    _, headers = cadastrar()
+    antigo = _etag(cliente, headers)
+    _salvar(cliente, headers, conteudo_html='<p>1</p>')
+
+    resposta = cliente.get('/api/listar_projetos',
+                           headers=dict(headers, **{'If-None-Match': antigo}))
+    assert resposta.status_code == 200
+    assert len(resposta.get_json()['dados']) == 1
+
+def test_etag_muda_a_cada_alteracao(cliente, cadastrar):
+    _, headers = cadastrar()
+    vistos = [_etag(cliente, headers)]
+
+    def mudou():
+        etag = _etag(cliente, headers)
+        assert etag not in vistos
+        vistos.append(etag)
+
+    # Criação
+    projeto_id = _salvar(cliente, headers, conteudo_html='<p>1</p>')['id']
+    mudou()
+
+    # Atualização que fica no buffer de autosave
+    _salvar(cliente, headers, projeto_id=projeto_id, conteudo_html='<p>2</p>')
+    mudou()
+
+    # Gravação do buffer em background
+    assert buffer_autosave.descarregar(projeto_id)['versao'] == 2
+    mudou()
+
+    # Atualização gravada direto ("salvar agora")
+    _salvar(cliente, headers, projeto_id=projeto_id, conteudo_html='<p>3</p>',
+            salvar_agora=True)
+    mudou()
+
+    # Exclusão e restauração
+    assert cliente.delete(f'/api/deletar_projeto/{projeto_id}',
+                          headers=headers).status_code == 200
+    mudou()
+    assert cliente.post(f'/api/restaurar_projeto/{projeto_id}',
+                        headers=headers).status_code == 200
+    mudou()
+
+def test_etag_e_por_usuario(cliente, cadastrar):
+    _, headers = cadastrar()
+    _, outro = cadastrar()
+    etag = _etag(cliente, headers)
+
+    _salvar(cliente, outro, conteudo_html='<p>1</p>')
+    assert _etag(cliente, headers) == etag
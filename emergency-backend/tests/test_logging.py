@@ -0,0 +1,36 @@
+"""
+Testes do pipeline de logging: o token da query string não chega aos registros
+"""
+
+import logging
+from utils.log_utils import FiltroSegredos
+
+def _registro(mensagem, args):
+    return logging.LogRecord('werkzeug', logging.INFO, __file__, 1, mensagem, args, None)
+
+def test_log_de_acesso_redige_token_da_query():
+    registro = _registro('127.0.0.1 - - [01/Jan/2026 00:00:00] "%s" %s %s',
+                         ('GET /api/eventos?token=eyJkYXRh%3D%3D&x=1 HTTP/1.1', '200', '-'))
+
+    assert FiltroSegredos().filter(registro)
+    mensagem = registro.getMessage()
+    assert 'eyJkYXRh' not in mensagem
+    assert '/api/eventos?token=[redigido]&x=1 HTTP/1.1' in mensagem
+
+def test_token_na_mensagem_e_como_ultimo_parametro():
+    registro = _registro('GET /api/ws?a=1&token=abc+/def HTTP/1.1', ())
+
+    FiltroSegredos().filter(registro)
+    assert registro.getMessage() == 'GET /api/ws?a=1&token=[redigido] HTTP/1.1'
+
+def test_registros_sem_token_nao_mudam():
+    registro = _registro('Projeto %s salvo por %s', (7, 'tokenizer=1'))
+
+    FiltroSegredos().filter(registro)
+    assert registro.args == (7, 'tokenizer=1')
+    assert registro.getMessage() == 'Projeto 7 salvo por tokenizer=1'
+
+def test_filtro_instalado_no_logging_da_aplicacao(app):
+    filtros = [type(filtro) for handler in logging.getLogger().handlers
+               for filtro in handler.filters]
+    assert FiltroSegredos in filtros
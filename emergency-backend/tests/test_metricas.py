@@ -0,0 +1,26 @@
+"""
+Testes do acesso a /metrics: token Bearer quando configurado, senão só
+clientes locais
+"""
+
+from config.settings import Config
+
+def test_sem_token_so_clientes_locais(cliente, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICAS_TOKEN', None)
+
+    assert cliente.get('/metrics').status_code == 200
+    resposta = cliente.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.7'})
+    assert resposta.status_code == 403
+    assert resposta.get_json()['dados'] is None
+
+def test_com_token_exige_bearer(cliente, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICAS_TOKEN', 'segredo')
+    remoto = {'REMOTE_ADDR': '203.0.113.7'}
+
+    assert cliente.get('/metrics').status_code == 401
+    assert cliente.get('/metrics', headers={'Authorization': 'Bearer errado'},
+                       environ_base=remoto).status_code == 401
+    resposta = cliente.get('/metrics', headers={'Authorization': 'Bearer segredo'},
+                           environ_base=remoto)
+    assert resposta.status_code == 200
+    assert 'contadores' in resposta.get_json()['dados']
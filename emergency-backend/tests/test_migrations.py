@@ -0,0 +1,122 @@
+"""
+Testes das migrações: cadeia completa a partir do banco anterior às
+migrações (versão 0), idempotência e falha de uma migração
+"""
+
+import os
+import shutil
+import sqlite3
+import pytest
+from database.migrations import (MIGRACOES_PRINCIPAL, MIGRACOES_SHARD, migrar, versao_atual,
+                                 versao_mais_recente, _validar)
+
+# Banco versionado criado antes das migrações (user_version = 0)
+BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'database', 'emergency_backend.db')
+
+@pytest.fixture
+def banco_v0(tmp_path):
+    """Cópia do banco da versão 0 com mais um usuário e dois projetos dele"""
+    caminho = tmp_path / 'v0.db'
+    shutil.copy(BASELINE, caminho)
+    conn = sqlite3.connect(str(caminho))
+    usuario_id = conn.execute("INSERT INTO usuarios (nome, email, senha_hash) "
+                              "VALUES ('Ana', 'migracao@exemplo.com', 'h')").lastrowid
+    conn.executemany("INSERT INTO projetos (usuario_id, titulo, conteudo_html) VALUES (?, ?, ?)",
+                     [(usuario_id, 'P1', '<p>1</p>'), (usuario_id, 'P2', '<p>2</p>')])
+    conn.commit()
+    conn.close()
+    return caminho
+
+def _consultar(caminho, sql, params=()):
+    conn = sqlite3.connect(str(caminho))
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+def _colunas(caminho, tabela):
+    return {row[1] for row in _consultar(caminho, f"PRAGMA table_info({tabela})")}
+
+def _objetos(caminho, tipo):
+    return {row[0] for row in _consultar(
+        caminho, "SELECT name FROM sqlite_master WHERE type = ?", (tipo,))}
+
+def test_cadeia_completa_a_partir_da_versao_0(banco_v0):
+    assert versao_atual(banco_v0) == 0
+    usuarios = _consultar(banco_v0, "SELECT COUNT(*) FROM usuarios")[0][0]
+    projetos = _consultar(banco_v0, "SELECT COUNT(*) FROM projetos")[0][0]
+
+    assert migrar(banco_v0, MIGRACOES_PRINCIPAL) == len(MIGRACOES_PRINCIPAL)
+    assert versao_atual(banco_v0) == versao_mais_recente(MIGRACOES_PRINCIPAL)
+
+    assert {'versao', 'hash_conteudo', 'tamanho_arquivo'} <= _colunas(banco_v0, 'projetos')
+    assert {'shards_usuarios', 'contadores', 'projetos_excluidos'} <= _objetos(banco_v0, 'table')
+    assert 'idx_usuarios_email' not in _objetos(banco_v0, 'index')
+
+    # Os dados anteriores são preservados e contados
+    assert _consultar(banco_v0, "SELECT titulo, versao FROM projetos ORDER BY id")[-2:] == \
+        [('P1', 1), ('P2', 1)]
+    assert dict(_consultar(banco_v0, "SELECT nome, valor FROM contadores")) == \
+        {'usuarios': usuarios, 'projetos': projetos}
+
+def test_migrar_de_novo_nao_faz_nada(banco_v0):
+    migrar(banco_v0, MIGRACOES_PRINCIPAL)
+    esquema = _consultar(banco_v0, "SELECT type, name, sql FROM sqlite_master ORDER BY name")
+
+    assert migrar(banco_v0, MIGRACOES_PRINCIPAL) == 0
+    assert _consultar(banco_v0, "SELECT type, name, sql FROM sqlite_master ORDER BY name") == esquema
+
+def test_cadeia_a_partir_de_versao_intermediaria(banco_v0):
+    assert migrar(banco_v0, MIGRACOES_PRINCIPAL[:4]) == 4
+    assert versao_atual(banco_v0) == 4
+    assert 'tamanho_arquivo' not in _colunas(banco_v0, 'projetos')
+
+    assert migrar(banco_v0, MIGRACOES_PRINCIPAL) == len(MIGRACOES_PRINCIPAL) - 4
+    assert 'tamanho_arquivo' in _colunas(banco_v0, 'projetos')
+
+def test_triggers_de_exclusao_logica_apos_a_cadeia(banco_v0):
+    migrar(banco_v0, MIGRACOES_PRINCIPAL)
+    conn = sqlite3.connect(str(banco_v0))
+    try:
+        projeto_id, usuario_id = conn.execute(
+            "SELECT id, usuario_id FROM projetos ORDER BY id DESC LIMIT 1").fetchone()
+        contador = "SELECT valor FROM contadores WHERE nome = 'projetos'"
+        total = conn.execute(contador).fetchone()[0]
+
+        conn.execute("INSERT INTO projetos_excluidos (projeto_id, usuario_id) VALUES (?, ?)",
+                     (projeto_id, usuario_id))
+        assert conn.execute(contador).fetchone()[0] == total - 1
+        # Purga: a linha já descontada sai sem mexer no contador e leva a marca
+        conn.execute("DELETE FROM projetos WHERE id = ?", (projeto_id,))
+        assert conn.execute(contador).fetchone()[0] == total - 1
+        assert conn.execute("SELECT COUNT(*) FROM projetos_excluidos").fetchone() == (0,)
+    finally:
+        conn.close()
+
+def test_shard_novo(tmp_path):
+    caminho = tmp_path / 'projetos_1.db'
+    assert migrar(caminho, MIGRACOES_SHARD) == len(MIGRACOES_SHARD)
+    assert versao_atual(caminho) == versao_mais_recente(MIGRACOES_SHARD)
+    assert 'usuarios' not in _objetos(caminho, 'table')
+    assert {'versao', 'hash_conteudo', 'tamanho_arquivo'} <= _colunas(caminho, 'projetos')
+
+def test_falha_desfaz_so_a_migracao_que_falhou(tmp_path):
+    caminho = tmp_path / 'falha.db'
+
+    def criar_a(conn):
+        conn.execute("CREATE TABLE a (id INTEGER)")
+
+    def falhar(conn):
+        conn.execute("CREATE TABLE b (id INTEGER)")
+        raise RuntimeError("falha proposital")
+
+    with pytest.raises(RuntimeError):
+        migrar(caminho, [(1, "a", criar_a), (2, "b", falhar)])
+
+    assert versao_atual(caminho) == 1
+    assert _objetos(caminho, 'table') == {'a'}
+
+def test_sequencia_com_lacuna_e_recusada():
+    with pytest.raises(RuntimeError):
+        _validar([(1, "a", None), (3, "c", None)])
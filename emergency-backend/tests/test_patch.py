@@ -0,0 +1,43 @@
+"""
+Testes do salvamento por delta: posições em unidades UTF-16 (índices de
+string do JavaScript)
+"""
+
+import pytest
+from utils.patch_utils import aplicar_patch, PatchInvalidoError
+
+def test_posicoes_depois_de_um_emoji_contam_duas_unidades():
+    base = '<p>😀 oi</p>'
+    # Em JavaScript: base.indexOf('oi') === 6
+    assert aplicar_patch(base, [{'pos': 6, 'remover': 2, 'inserir': 'olá'}]) == '<p>😀 olá</p>'
+    assert aplicar_patch(base, [{'pos': 3, 'remover': 2, 'inserir': '🎉'}]) == '<p>🎉 oi</p>'
+
+def test_conteudo_so_do_bmp_usa_os_indices_do_python():
+    base = '<p>ação</p>'
+    assert aplicar_patch(base, [{'pos': 3, 'remover': 4, 'inserir': 'fim'}]) == '<p>fim</p>'
+
+def test_posicao_no_meio_de_um_par_substituto_e_rejeitada():
+    with pytest.raises(PatchInvalidoError):
+        aplicar_patch('<p>😀</p>', [{'pos': 4, 'remover': 0, 'inserir': 'x'}])
+
+def test_limite_e_o_tamanho_em_unidades_utf16():
+    base = '😀😀'
+    assert aplicar_patch(base, [{'pos': 4, 'remover': 0, 'inserir': '!'}]) == '😀😀!'
+    with pytest.raises(PatchInvalidoError):
+        aplicar_patch(base, [{'pos': 5, 'remover': 0, 'inserir': '!'}])
+
+def test_patch_utf16_pela_rota(cliente, cadastrar):
+    _, headers = cadastrar()
+    dados = cliente.post('/api/salvar_projeto', headers=headers, json={
+        'titulo': 'T', 'conteudo_html': '<p>😀 oi</p>'}).get_json()['dados']
+
+    resposta = cliente.post('/api/salvar_projeto', headers=headers, json={
+        'titulo': 'T', 'projeto_id': dados['id'], 'hash_base': dados['hash_conteudo'],
+        'patch': [{'pos': 6, 'remover': 2, 'inserir': 'olá'}]})
+    assert resposta.get_json()['dados']['conteudo_html'] == '<p>😀 olá</p>'
+
+    resposta = cliente.post('/api/salvar_projeto', headers=headers, json={
+        'titulo': 'T', 'projeto_id': dados['id'],
+        'hash_base': resposta.get_json()['dados']['hash_conteudo'],
+        'patch': [{'pos': 4, 'remover': 0, 'inserir': 'x'}]})
+    assert resposta.status_code == 400
@@ -0,0 +1,85 @@
+"""
+Testes dos prazos de requisição: lock de escrita preso além do prazo da
+rota (503 com Retry-After), consulta longa interrompida pelo progress
+handler (504) e contadores de cancelamento
+"""
+
+import contextlib
+import sqlite3
+import time
+from config.settings import Config
+from core import actions
+from database import escritor as modulo_escritor
+from database.db import execute_query
+from utils import metrics, prazos
+
+# Consulta sem fim: só termina interrompida
+CONSULTA_INFINITA = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+                     "SELECT COUNT(*) AS total FROM c")
+
+def _contadores(tipo, rota):
+    return (metrics.obter_contador(f'prazos.cancelamentos.{tipo}'),
+            metrics.obter_contador(f'prazos.cancelamentos.{rota}'))
+
+@contextlib.contextmanager
+def _lock_escrita():
+    """Segura o lock de escrita do banco principal"""
+    conn = sqlite3.connect(str(Config.DATABASE_PATH), isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    # Uma escrita do escritor fica presa no BEGIN IMMEDIATE: as seguintes
+    # esperam na fila, onde o prazo as cancela
+    bloqueador = modulo_escritor._escritor(0).enviar(
+        "UPDATE contadores SET valor = valor WHERE nome = 'usuarios'")
+    time.sleep(0.2)
+    try:
+        yield
+    finally:
+        conn.execute("COMMIT")
+        conn.close()
+        bloqueador.result(5)
+
+def test_lock_preso_alem_do_prazo_responde_503(cliente, cadastrar, monkeypatch):
+    rota = 'api.routes.salvar_projeto_route'
+    _, headers = cadastrar()
+    monkeypatch.setitem(Config.PRAZOS_ROTAS, rota, 0.3)
+    antes = _contadores(prazos.ESPERA_LOCK, rota)
+
+    with _lock_escrita():
+        inicio = time.monotonic()
+        resposta = cliente.post('/api/salvar_projeto', headers=headers, json={
+            'titulo': 'T', 'conteudo_html': '<p>1</p>'})
+        assert time.monotonic() - inicio < 2
+
+    assert resposta.status_code == 503
+    assert resposta.headers['Retry-After'] == '1'
+    assert resposta.get_json()['mensagem'] == "Banco de dados ocupado, tente novamente"
+    # Um cancelamento por requisição, contado por tipo e por rota
+    depois = _contadores(prazos.ESPERA_LOCK, rota)
+    assert (depois[0] - antes[0], depois[1] - antes[1]) == (1, 1)
+
+def test_consulta_longa_interrompida_responde_504(cliente, cadastrar, monkeypatch):
+    rota = 'api.routes.listar_projetos_route'
+    _, headers = cadastrar()
+    monkeypatch.setitem(Config.PRAZOS_ROTAS, rota, 0.3)
+    monkeypatch.setattr(actions.Projeto, 'listar_por_usuario',
+                        staticmethod(lambda *args, **kwargs: execute_query(
+                            CONSULTA_INFINITA, fetch_all=True)))
+    antes = _contadores(prazos.CONSULTA, rota)
+
+    inicio = time.monotonic()
+    resposta = cliente.get('/api/listar_projetos', headers=headers)
+    assert time.monotonic() - inicio < 2
+
+    # listar_projetos trata o erro como lista vazia; a resposta é a do prazo
+    assert resposta.status_code == 504
+    assert 'Retry-After' not in resposta.headers
+    depois = _contadores(prazos.CONSULTA, rota)
+    assert (depois[0] - antes[0], depois[1] - antes[1]) == (1, 1)
+
+def test_sem_prazo_vencido_nada_e_contado(cliente, cadastrar):
+    rota = 'api.routes.listar_projetos_route'
+    _, headers = cadastrar()
+    antes = (_contadores(prazos.CONSULTA, rota), _contadores(prazos.ESPERA_LOCK, rota))
+
+    assert cliente.get('/api/listar_projetos', headers=headers).status_code == 200
+    assert (_contadores(prazos.CONSULTA, rota), _contadores(prazos.ESPERA_LOCK, rota)) == antes
@@ -0,0 +1,56 @@
+"""
+Testes do modo pre-fork: o master recria workers que morrem e encerra
+todos no SIGTERM
+"""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason="pre-fork requer os.fork")
+
+def _porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _pid_worker(porta, prazo=10.0, diferente_de=None):
+    """pid do worker que atendeu /health/live (espera o servidor subir)"""
+    limite = time.monotonic() + prazo
+    while True:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{porta}/health/live', timeout=1) as r:
+                pid = json.load(r)['dados']['pid']
+            if pid != diferente_de:
+                return pid
+        except OSError:
+            pass
+        if time.monotonic() > limite:
+            raise AssertionError("servidor não respondeu a tempo")
+        time.sleep(0.1)
+
+def test_master_recria_worker_e_encerra_no_sigterm():
+    porta = _porta_livre()
+    master = subprocess.Popen([sys.executable, 'prefork.py', '--workers', '1',
+                               '--host', '127.0.0.1', '--port', str(porta)],
+                              cwd=RAIZ, env=dict(os.environ),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        worker = _pid_worker(porta)
+        os.kill(worker, signal.SIGKILL)
+        assert _pid_worker(porta, diferente_de=worker) != worker
+
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=10) == 0
+    finally:
+        if master.poll() is None:
+            master.kill()
+            master.wait()
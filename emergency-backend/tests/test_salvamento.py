@@ -0,0 +1,72 @@
+"""
+Testes do salvamento de projetos existentes: HTML completo sem leitura
+prévia, salvamentos sem alteração, conflito de versão e projeto inexistente
+"""
+
+import pytest
+from config.settings import Config
+from database.models import Projeto
+
+@pytest.fixture
+def leituras(monkeypatch):
+    """Conta as leituras de metadados feitas pelo salvamento"""
+    monkeypatch.setattr(Config, 'AUTOSAVE_HABILITADO', False)
+    chamadas = []
+    original = Projeto.buscar_metadados
+
+    def buscar_metadados(projeto_id, usuario_id):
+        chamadas.append(projeto_id)
+        return original(projeto_id, usuario_id)
+
+    monkeypatch.setattr(Projeto, 'buscar_metadados', staticmethod(buscar_metadados))
+    return chamadas
+
+def _salvar(cliente, headers, **dados):
+    return cliente.post('/api/salvar_projeto', json=dict({'titulo': 'T'}, **dados),
+                        headers=headers)
+
+def test_atualizacao_com_mudanca_nao_le_antes(cliente, cadastrar, leituras):
+    _, headers = cadastrar()
+    projeto_id = _salvar(cliente, headers, conteudo_html='<p>v1</p>').get_json()['dados']['id']
+
+    resposta = _salvar(cliente, headers, projeto_id=projeto_id, conteudo_html='<p>v2</p>',
+                       versao=1)
+    assert resposta.status_code == 200
+    assert resposta.get_json()['dados']['versao'] == 2
+    assert leituras == []
+
+def test_salvamento_sem_alteracao_nao_grava(cliente, cadastrar, leituras):
+    _, headers = cadastrar()
+    projeto_id = _salvar(cliente, headers, conteudo_html='<p>v1</p>').get_json()['dados']['id']
+
+    resposta = _salvar(cliente, headers, projeto_id=projeto_id, conteudo_html='<p>v1</p>',
+                       versao=1)
+    assert resposta.status_code == 200
+    assert resposta.get_json()['dados']['versao'] == 1
+    assert resposta.get_json()['dados']['conteudo_html'] == '<p>v1</p>'
+    # A linha só é lida porque o UPDATE não afetou nada
+    assert leituras == [projeto_id]
+
+def test_sem_alteracao_com_versao_antiga_e_conflito(cliente, cadastrar, leituras):
+    _, headers = cadastrar()
+    projeto_id = _salvar(cliente, headers, conteudo_html='<p>v1</p>').get_json()['dados']['id']
+    _salvar(cliente, headers, projeto_id=projeto_id, conteudo_html='<p>v2</p>')
+
+    resposta = _salvar(cliente, headers, projeto_id=projeto_id, conteudo_html='<p>v2</p>',
+                       versao=1)
+    assert resposta.status_code == 409
+    assert resposta.get_json()['dados']['versao_atual'] == 2
+
+    resposta = _salvar(cliente, headers, projeto_id=projeto_id, conteudo_html='<p>v3</p>',
+                       versao=1)
+    assert resposta.status_code == 409
+
+def test_projeto_inexistente_ou_de_outro_usuario(cliente, cadastrar, leituras):
+    _, headers = cadastrar()
+    _, outro = cadastrar()
+    projeto_id = _salvar(cliente, headers, conteudo_html='<p>v1</p>').get_json()['dados']['id']
+
+    assert _salvar(cliente, outro, projeto_id=projeto_id,
+                   conteudo_html='<p>v1</p>').status_code == 404
+    assert _salvar(cliente, headers, projeto_id=10 ** 9,
+                   conteudo_html='<p>v1</p>').status_code == 404
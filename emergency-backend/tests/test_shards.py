@@ -0,0 +1,59 @@
+"""
+Testes do roteamento de shards: o mapa usuário -> shard é lido uma vez por
+requisição
+"""
+
+import pytest
+from config.settings import Config
+from database import shards
+from database.db import init_database, execute_query
+
+@pytest.fixture
+def leituras_mapa(monkeypatch):
+    """Dois shards ativos; conta as leituras do mapa de cada usuário"""
+    monkeypatch.setattr(Config, 'NUM_SHARDS', 2)
+    monkeypatch.setattr(Config, 'AUTOSAVE_HABILITADO', False)
+    monkeypatch.setattr(shards, '_ativo', None)
+    init_database()
+
+    chamadas = []
+    original = shards._ler_shard
+
+    def ler_shard(usuario_id):
+        chamadas.append(usuario_id)
+        return original(usuario_id)
+
+    monkeypatch.setattr(shards, '_ler_shard', ler_shard)
+    yield chamadas
+
+    # Os outros testes rodam com um único shard
+    execute_query("DELETE FROM shards_usuarios WHERE shard <> 0")
+
+def test_salvamento_le_o_mapa_uma_vez(cliente, cadastrar, leituras_mapa):
+    usuario_id, headers = cadastrar()
+    resposta = cliente.post('/api/salvar_projeto', json={'titulo': 'T', 'conteudo_html': '<p>1</p>'},
+                            headers=headers)
+    projeto_id = resposta.get_json()['dados']['id']
+    assert shards.shard_do_usuario(usuario_id) == usuario_id % 2
+
+    leituras_mapa.clear()
+    resposta = cliente.post('/api/salvar_projeto', json={
+        'projeto_id': projeto_id, 'titulo': 'T', 'conteudo_html': '<p>2</p>', 'versao': 1
+    }, headers=headers)
+    assert resposta.get_json()['dados']['versao'] == 2
+    assert leituras_mapa == [usuario_id]
+
+    # Cada requisição lê o mapa de novo
+    leituras_mapa.clear()
+    projeto = cliente.get(f'/api/carregar_projeto/{projeto_id}', headers=headers).get_json()['dados']
+    assert projeto['conteudo_html'] == '<p>2</p>'
+    assert leituras_mapa == [usuario_id]
+
+def test_projeto_nao_encontrado_rele_o_mapa(cliente, cadastrar, leituras_mapa):
+    usuario_id, headers = cadastrar()
+    cliente.get('/api/listar_projetos', headers=headers)
+
+    leituras_mapa.clear()
+    assert cliente.get('/api/carregar_projeto/999999999', headers=headers).status_code == 404
+    # Nada encontrado: a segunda leitura verifica se o usuário mudou de shard
+    assert leituras_mapa == [usuario_id, usuario_id]
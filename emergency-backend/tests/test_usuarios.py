@@ -0,0 +1,28 @@
+"""
+Testes do cadastro de usuários: só a constraint UNIQUE de email vira
+"email em uso"
+"""
+
+import sqlite3
+import uuid
+import pytest
+from database.models import Usuario, EmailEmUsoError
+
+def test_email_duplicado_responde_409(cliente):
+    dados = {'nome': 'Ana', 'email': f'{uuid.uuid4().hex}@exemplo.com', 'senha': 'senha123'}
+
+    assert cliente.post('/api/cadastro', json=dados).status_code == 200
+    resposta = cliente.post('/api/cadastro', json=dados)
+    assert resposta.status_code == 409
+    assert resposta.get_json()['mensagem'] == "Email já está em uso"
+
+def test_email_duplicado_no_modelo(app):
+    email = f'{uuid.uuid4().hex}@exemplo.com'
+    Usuario.criar_usuario('Ana', email, 'senha123')
+
+    with pytest.raises(EmailEmUsoError):
+        Usuario.criar_usuario('Outra Ana', email, 'senha123')
+
+def test_outra_constraint_nao_vira_email_em_uso(app):
+    with pytest.raises(sqlite3.IntegrityError, match='NOT NULL'):
+        Usuario.criar_usuario(None, f'{uuid.uuid4().hex}@exemplo.com', 'senha123')
@@ -0,0 +1,146 @@
+"""
+Testes do canal WebSocket: ordem dos comandos de um mesmo projeto, limite
+de comandos em voo por conexão e autenticação no handshake
+"""
+
+import json
+import queue
+import threading
+import time
+import pytest
+from api import websocket
+from api.websocket import ConexaoComandos
+from config.settings import Config
+from utils import metrics
+
+class _SocketFalso:
+    """Socket com as mensagens do cliente numa fila e as respostas numa lista"""
+
+    def __init__(self):
+        self.entrada = queue.Queue()
+        self.enviadas = []
+        self._cond = threading.Condition()
+
+    def receive(self):
+        return self.entrada.get()
+
+    def send(self, dados):
+        with self._cond:
+            self.enviadas.append(json.loads(dados))
+            self._cond.notify_all()
+
+    def close(self, *args):
+        pass
+
+    def esperar_respostas(self, quantidade, prazo=5):
+        with self._cond:
+            assert self._cond.wait_for(lambda: len(self.enviadas) >= quantidade, prazo)
+            return list(self.enviadas)
+
+def _abrir(ws):
+    conexao = ConexaoComandos(ws, 1, time.time() + 60, 'stdlib')
+    thread = threading.Thread(target=conexao.executar, daemon=True)
+    thread.start()
+    return thread
+
+def test_comandos_do_mesmo_projeto_executam_em_ordem(monkeypatch):
+    executados = []
+
+    def processar_comando(usuario_id, acao, dados):
+        # O primeiro salvamento do projeto 5 é o mais lento
+        if dados['id'] == 1:
+            time.sleep(0.3)
+        executados.append(dados['id'])
+        return {'status': 'success', 'dados': None}
+
+    monkeypatch.setattr(websocket, 'processar_comando', processar_comando)
+    ws = _SocketFalso()
+    thread = _abrir(ws)
+    for id_requisicao, projeto_id in [(1, 5), (2, '5'), (3, 6)]:
+        ws.entrada.put(json.dumps({'id': id_requisicao, 'acao': 'salvar_projeto',
+                                   'projeto_id': projeto_id}))
+    ws.entrada.put(None)
+
+    ws.esperar_respostas(3)
+    thread.join(5)
+    # O projeto 6 não espera o 5; o segundo comando do 5 espera o primeiro
+    assert executados == [3, 1, 2]
+
+def test_limite_de_comandos_em_voo(monkeypatch):
+    monkeypatch.setattr(Config, 'WS_MAX_EM_VOO', 2)
+    liberar = threading.Event()
+    em_execucao = []
+    maximo = []
+    lock = threading.Lock()
+
+    def processar_comando(usuario_id, acao, dados):
+        with lock:
+            em_execucao.append(dados['id'])
+            maximo.append(len(em_execucao))
+        liberar.wait(5)
+        with lock:
+            em_execucao.remove(dados['id'])
+        return {'status': 'success', 'dados': None}
+
+    monkeypatch.setattr(websocket, 'processar_comando', processar_comando)
+    ws = _SocketFalso()
+    thread = _abrir(ws)
+    for id_requisicao in range(5):
+        ws.entrada.put(json.dumps({'id': id_requisicao, 'acao': 'listar_projetos'}))
+    ws.entrada.put(None)
+
+    time.sleep(0.3)
+    # A leitura parou: o resto das mensagens continua no socket
+    assert len(em_execucao) == 2
+    assert ws.entrada.qsize() > 0
+
+    liberar.set()
+    respostas = ws.esperar_respostas(5)
+    thread.join(5)
+    assert max(maximo) == 2
+    assert sorted(r['id'] for r in respostas) == list(range(5))
+
+def test_salvamento_pelo_canal_conta_os_bytes_enviados(monkeypatch):
+    monkeypatch.setattr(websocket, 'processar_comando',
+                        lambda usuario_id, acao, dados: {'status': 'success', 'dados': None})
+    salvamentos = metrics.obter_contador('salvar_projeto.delta')
+    ws = _SocketFalso()
+    thread = _abrir(ws)
+    ws.entrada.put(json.dumps({'id': 1, 'acao': 'salvar_projeto', 'projeto_id': 1,
+                               'patch': [], 'hash_base': 'h'}))
+    ws.entrada.put(None)
+
+    ws.esperar_respostas(1)
+    thread.join(5)
+    assert metrics.obter_contador('salvar_projeto.delta') == salvamentos + 1
+
+@pytest.fixture
+def servidor(app):
+    """Servidor HTTP real (o handshake WebSocket não passa pelo test client)"""
+    from werkzeug.serving import make_server
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f'ws://127.0.0.1:{servidor.server_port}/api/ws'
+    servidor.shutdown()
+
+def test_handshake_com_token_valido(servidor, cadastrar):
+    simple_websocket = pytest.importorskip('simple_websocket')
+    _, headers = cadastrar()
+    token = headers['Authorization'].split(' ')[1]
+
+    ws = simple_websocket.Client.connect(f'{servidor}?token={token}')
+    try:
+        ws.send(json.dumps({'id': 'a', 'acao': 'listar_projetos'}))
+        resposta = json.loads(ws.receive(timeout=5))
+        assert resposta['id'] == 'a' and resposta['status'] == 'success'
+    finally:
+        ws.close()
+
+def test_handshake_com_token_invalido_fecha_com_1008(servidor):
+    simple_websocket = pytest.importorskip('simple_websocket')
+
+    ws = simple_websocket.Client.connect(f'{servidor}?token=invalido')
+    with pytest.raises(simple_websocket.ConnectionClosed) as erro:
+        ws.receive(timeout=5)
+    assert erro.value.reason == websocket.FECHAMENTO_POLITICA
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Emergency Backend - Gerador de Dados Sintéticos
+Popula usuarios e projetos em volume de produção, com HTML no formato
+gerado pelo editor, para testes de escala e benchmarks reproduzíveis
+
+Uso:
+    python tools/gerar_dados.py --usuarios 1000 --projetos 5
+    python tools/gerar_dados.py --usuarios 200 --projetos uniforme:0,20 \\
+        --tamanho lognormal:24,1.0 --semente 7
+
+Distribuições (--projetos em unidades, --tamanho em KB):
+    fixo:N | N            sempre N
+    uniforme:A,B          inteiro uniforme entre A e B
+    lognormal:MEDIANA,SIGMA
+
+A mesma semente, os mesmos parâmetros e um banco vazio geram sempre os mesmos
+dados (exceto o salt do hash de senha, sorteado pelo werkzeug). Use as mesmas variáveis de ambiente do servidor (DATABASE_PATH,
+NUM_SHARDS, SHARDS_DIR, ARMAZENAMENTO, ARQUIVOS_DIR). Todos os usuários
+gerados têm a senha de --senha
+"""
+
+import argparse
+import base64
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+from config.settings import Config
+from database.db import init_database, get_db_connection, execute_query, inicializar_shard
+from database.shards import alocar_id_projeto
+from database.armazenamento import armazenamento_ativo
+from utils.patch_utils import calcular_hash
+
+# Datas geradas ficam no ano seguinte a esta (fixa, para reprodutibilidade)
+DATA_BASE = datetime(2024, 1, 1)
+
+# Mesmo <head> de generateHTML() em editor.html
+CABECALHO = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{titulo}</title>
+    <style>
+        * {{
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }}
+
+        body {{
+            margin: 0;
+            padding: 0;
+            font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
+            position: relative;
+            min-height: 100vh;
+            max-width: 375px;
+            margin: 0 auto;
+            background: #f8f9fa;
+            overflow-x: hidden;
+        }}
+
+        img, video, iframe {{
+            max-width: 100%;
+            height: auto;
+        }}
+
+        button:hover {{
+            transform: translateY(-2px);
+            transition: transform 0.2s ease;
+        }}
+
+        a {{
+            transition: color 0.2s ease;
+        }}
+
+        a:hover {{
+            opacity: 0.8;
+        }}
+    </style>
+</head>
+<body>
+"""
+
+RODAPE = "</body>\n</html>"
+
+ESTILO_BASE = 'font-family: Inter, sans-serif;'
+
+# Tipo -> (peso no sorteio, estilos padrão do editor, modelo do elemento)
+ELEMENTOS = {
+    'text': (30, ESTILO_BASE + ' font-size: 16px; color: #333; line-height: 1.5;',
+             '<p style="{estilo}">{texto}</p>'),
+    'button': (10, ESTILO_BASE + ' background: linear-gradient(135deg, #667eea, #764ba2); color: white; '
+                   'border: none; padding: 12px 24px; border-radius: 8px; cursor: pointer; '
+                   'font-weight: 500; transition: transform 0.2s;',
+               '<button style="{estilo}" onmouseover="this.style.transform=\'translateY(-2px)\'" '
+               'onmouseout="this.style.transform=\'translateY(0)\'">{curto}</button>'),
+    'image': (8, 'max-width: 100%; height: auto; border-radius: 8px; box-shadow: 0 4px 16px rgba(0,0,0,0.1);',
+              '<img src="{imagem}" style="{estilo}" alt="Imagem" loading="lazy">'),
+    'link': (8, ESTILO_BASE + ' color: #667eea; text-decoration: none; font-weight: 500;',
+             '<a href="#" style="{estilo}">{curto}</a>'),
+    'header': (4, ESTILO_BASE + ' background: linear-gradient(135deg, #667eea, #764ba2); color: white; '
+                  'border-radius: 8px;',
+               '<header style="{estilo}"><h1 style="margin:0; padding:20px; text-align:center;">'
+               '{curto}</h1></header>'),
+    'section': (12, ESTILO_BASE + ' background: white; border: 1px solid #dee2e6; padding: 30px; '
+                    'border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.05);',
+                '<section style="{estilo}"><h2 style="margin:0 0 15px 0;">{curto}</h2>'
+                '<p style="margin:0;">{texto}</p></section>'),
+    'nav': (4, ESTILO_BASE + ' background: #f8f9fa; padding: 15px 20px; border-radius: 8px; '
+               'border: 1px solid #dee2e6;',
+            '<nav style="{estilo}"><a href="#" style="margin-right:15px;">Início</a>'
+            '<a href="#" style="margin-right:15px;">Sobre</a><a href="#">Contato</a></nav>'),
+    'form': (4, ESTILO_BASE + ' background: #f8f9fa; padding: 24px; border-radius: 12px; '
+                'border: 1px solid #dee2e6;',
+             '<div style="{estilo}"><form style="display:flex; flex-direction:column; gap:10px;">'
+             '<input type="text" placeholder="Nome" style="padding:8px; border:1px solid #ccc; '
+             'border-radius:4px;"><input type="email" placeholder="Email" style="padding:8px; '
+             'border:1px solid #ccc; border-radius:4px;"><button type="submit" style="padding:10px; '
+             'background:#667eea; color:white; border:none; border-radius:4px; cursor:pointer;">'
+             'Enviar</button></form></div>'),
+    'footer': (4, ESTILO_BASE + ' background: #f8f9fa; border-top: 1px solid #dee2e6; color: #6c757d; '
+                  'border-radius: 8px;',
+               '<footer style="{estilo}"><p style="margin:0; padding:20px; text-align:center;">'
+               '{curto}</p></footer>')
+}
+
+PALAVRAS = ("loja", "café", "estúdio", "consultoria", "portfólio", "evento", "clínica",
+            "escola", "padaria", "academia", "agência", "oficina", "restaurante", "viagens",
+            "moda", "design", "fotografia", "música", "saúde", "tecnologia", "serviços",
+            "contato", "promoção", "novidades", "sobre", "equipe", "produtos", "agenda")
+
+def interpretar_distribuicao(texto):
+    """
+    Converte 'uniforme:1,10' em uma função que sorteia um valor
+
+    Returns:
+        function: sortear(rng) -> float
+    """
+    tipo, _, parametros = texto.partition(':')
+    if not parametros:
+        tipo, parametros = 'fixo', tipo
+    valores = [float(v) for v in parametros.split(',')]
+
+    if tipo == 'fixo' and len(valores) == 1:
+        return lambda rng: valores[0]
+    if tipo == 'uniforme' and len(valores) == 2:
+        return lambda rng: rng.uniform(valores[0], valores[1])
+    if tipo == 'lognormal' and len(valores) == 2:
+        mu = math.log(valores[0])
+        return lambda rng: rng.lognormvariate(mu, valores[1])
+    raise ValueError(f"Distribuição inválida: {texto}")
+
+def gerar_frase(rng, minimo, maximo):
+    """Frase com palavras sorteadas"""
+    palavras = [rng.choice(PALAVRAS) for _ in range(rng.randint(minimo, maximo))]
+    return ' '.join(palavras).capitalize()
+
+def gerar_imagem(rng, limite):
+    """Data URL de uma 'imagem' de até `limite` bytes, como as enviadas no editor"""
+    tamanho = max(64, min(limite, int(rng.lognormvariate(9.5, 1.0))) * 3 // 4)
+    return 'data:image/png;base64,' + base64.b64encode(rng.randbytes(tamanho)).decode('ascii')
+
+def gerar_html(rng, titulo, tamanho_bytes):
+    """
+    Documento no formato de generateHTML(): elementos posicionados em absoluto
+    até atingir aproximadamente `tamanho_bytes`
+    """
+    partes = [CABECALHO.format(titulo=titulo)]
+    tamanho = len(partes[0]) + len(RODAPE)
+    tipos = list(ELEMENTOS)
+    pesos = [ELEMENTOS[t][0] for t in tipos]
+    y = 20
+
+    while tamanho < tamanho_bytes:
+        tipo = rng.choices(tipos, pesos)[0]
+        _, estilo_padrao, modelo = ELEMENTOS[tipo]
+        altura = rng.randint(40, 240)
+        estilo = (f"position: absolute; left: {rng.randint(0, 60)}px; top: {y}px; "
+                  f"width: {rng.randint(120, 335)}px; height: {altura}px; {estilo_padrao}")
+        campos = {'estilo': estilo}
+        if tipo == 'image':
+            campos['imagem'] = gerar_imagem(rng, tamanho_bytes - tamanho)
+        else:
+            campos['texto'] = gerar_frase(rng, 8, 40)
+            campos['curto'] = gerar_frase(rng, 1, 3)
+        elemento = '    ' + modelo.format(**campos) + '\n'
+        partes.append(elemento)
+        tamanho += len(elemento)
+        y += altura + rng.randint(10, 30)
+
+    partes.append(RODAPE)
+    return ''.join(partes)
+
+def formatar_data(data):
+    return data.strftime('%Y-%m-%d %H:%M:%S')
+
+def gerar_usuario(semente, numero, usuario_id, senha_hash, sortear_projetos, sortear_tamanho,
+                  tamanho_maximo):
+    """
+    Dados de um usuário e seus projetos
+
+    Cada usuário tem seu próprio gerador, semeado por (semente, número): o
+    resultado não depende do tamanho dos lotes nem da ordem de inserção
+
+    Returns:
+        tuple: (linha do usuário, lista de (titulo, html, criação, modificação, versão))
+    """
+    rng = random.Random(f'{semente}:{numero}')
+    criado_em = DATA_BASE + timedelta(seconds=rng.randint(0, 365 * 86400))
+    ultima_atividade = criado_em + timedelta(seconds=rng.randint(0, 90 * 86400))
+    usuario = (usuario_id, f'Usuário {numero}', f'usuario{numero}@dados.exemplo', senha_hash,
+               formatar_data(criado_em), formatar_data(ultima_atividade))
+
+    projetos = []
+    for _ in range(max(0, round(sortear_projetos(rng)))):
+        titulo = gerar_frase(rng, 1, 4)
+        tamanho = min(tamanho_maximo, max(1.0, sortear_tamanho(rng)))
+        html = gerar_html(rng, titulo, int(tamanho * 1024))
+        criacao = criado_em + timedelta(seconds=rng.randint(0, 60 * 86400))
+        modificacao = criacao + timedelta(seconds=rng.randint(0, 30 * 86400))
+        projetos.append((titulo, html, formatar_data(criacao), formatar_data(modificacao),
+                         rng.randint(1, 50)))
+
+    return usuario, projetos
+
+def inserir_projetos(shard, linhas):
+    """INSERT em lote de projetos em um shard (uma transação)"""
+    conn = get_db_connection(shard)
+    conn.executemany(
+        """
+        INSERT INTO projetos (id, usuario_id, titulo, conteudo_html, hash_conteudo,
+                              tamanho_arquivo, data_criacao, data_modificacao, versao)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        linhas
+    )
+    conn.commit()
+
+def gerar(args):
+    """
+    Gera e insere os dados em lotes de --lote usuários
+
+    Returns:
+        tuple: (usuários, projetos, bytes de HTML)
+    """
+    sortear_projetos = interpretar_distribuicao(args.projetos)
+    sortear_tamanho = interpretar_distribuicao(args.tamanho)
+    senha_hash = generate_password_hash(args.senha)
+    armazenamento = armazenamento_ativo()
+
+    existentes = execute_query("SELECT COUNT(*) AS total FROM usuarios", fetch_one=True)['total']
+    if existentes and not args.anexar:
+        raise SystemExit(f"O banco já tem {existentes} usuários: use um banco vazio "
+                         "(ou --anexar, sem garantia de reprodutibilidade)")
+
+    primeiro_id = execute_query("SELECT COALESCE(MAX(id), 0) + 1 AS id FROM usuarios",
+                                fetch_one=True)['id']
+    for shard in range(1, Config.NUM_SHARDS):
+        inicializar_shard(shard)
+
+    total_projetos = total_bytes = 0
+    conn = get_db_connection()
+
+    for inicio in range(0, args.usuarios, args.lote):
+        numeros = range(inicio, min(inicio + args.lote, args.usuarios))
+        usuarios, por_shard = [], {}
+
+        gerados = [gerar_usuario(args.semente, numero, primeiro_id + numero, senha_hash,
+                                 sortear_projetos, sortear_tamanho, args.tamanho_maximo)
+                   for numero in numeros]
+
+        quantidade = sum(len(projetos) for _, projetos in gerados)
+        proximo_id = alocar_id_projeto(quantidade) if quantidade else None
+
+        for usuario, projetos in gerados:
+            usuarios.append(usuario)
+            usuario_id = usuario[0]
+            shard = usuario_id % Config.NUM_SHARDS
+            for titulo, html, criacao, modificacao, versao in projetos:
+                hash_conteudo = calcular_hash(html)
+                coluna_html, tamanho_arquivo = armazenamento.gravar(html, hash_conteudo)
+                por_shard.setdefault(shard, []).append(
+                    (proximo_id, usuario_id, titulo, coluna_html, hash_conteudo,
+                     tamanho_arquivo, criacao, modificacao, versao))
+                if proximo_id is not None:
+                    proximo_id += 1
+                total_bytes += len(html)
+            total_projetos += len(projetos)
+
+        conn.executemany(
+            """
+            INSERT INTO usuarios (id, nome, email, senha_hash, data_criacao, ultima_atividade)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            usuarios
+        )
+        if Config.NUM_SHARDS > 1:
+            conn.executemany(
+                "INSERT INTO shards_usuarios (usuario_id, shard) VALUES (?, ?)",
+                [(u[0], u[0] % Config.NUM_SHARDS) for u in usuarios]
+            )
+        conn.commit()
+
+        for shard, linhas in por_shard.items():
+            inserir_projetos(shard, linhas)
+
+        print(f"{numeros.stop}/{args.usuarios} usuários, {total_projetos} projetos, "
+              f"{total_bytes / 1048576:.1f} MB de HTML")
+
+    return args.usuarios, total_projetos, total_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de dados sintéticos")
+    parser.add_argument('--usuarios', type=int, required=True, help="Número de usuários")
+    parser.add_argument('--projetos', default='5',
+                        help="Projetos por usuário (número ou distribuição)")
+    parser.add_argument('--tamanho', default='lognormal:24,1.0',
+                        help="Tamanho do HTML em KB (distribuição)")
+    parser.add_argument('--tamanho-maximo', type=float, default=4096,
+                        help="Teto do tamanho do HTML em KB")
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--lote', type=int, default=500,
+                        help="Usuários por transação")
+    parser.add_argument('--senha', default='senha123',
+                        help="Senha de todos os usuários gerados")
+    parser.add_argument('--anexar', action='store_true',
+                        help="Permite gerar em um banco que já tem usuários")
+    args = parser.parse_args()
+
+    init_database()
+
+    inicio = time.monotonic()
+    usuarios, projetos, total_bytes = gerar(args)
+    decorrido = time.monotonic() - inicio
+
+    print(f"\n{usuarios} usuários e {projetos} projetos ({total_bytes / 1048576:.1f} MB) "
+          f"em {decorrido:.1f}s ({projetos / decorrido if decorrido else 0:.0f} projetos/s) "
+          f"-> {Config.DATABASE_PATH}")
+
+if __name__ == '__main__':
+    main()
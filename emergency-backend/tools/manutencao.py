@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Emergency Backend - Manutenção do Banco
+Mostra os projetos excluídos aguardando purga e o espaço livre de cada
+arquivo, executa a purga fora do ciclo do servidor e liga o auto_vacuum
+incremental em bancos criados antes dele
+
+Uso:
+    python tools/manutencao.py status
+    python tools/manutencao.py purgar [--janela 86400] [--lote 20] [--paginas 0]
+    python tools/manutencao.py auto-vacuum [--executar]
+
+Use as mesmas variáveis de ambiente do servidor (DATABASE_PATH, NUM_SHARDS,
+SHARDS_DIR, EXCLUSAO_JANELA_RESTAURACAO). A purga pode rodar com o servidor
+no ar. O auto-vacuum reescreve o arquivo inteiro com VACUUM, que bloqueia
+as escritas até terminar: rode com o servidor parado. Sem --executar ele só
+mostra os arquivos que seriam convertidos
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import Config
+from database.db import init_database, execute_query, caminho_shard, listar_shards
+from database.purga import purgar_shard, liberar_paginas
+
+_MODOS_AUTO_VACUUM = {0: 'none', 1: 'full', 2: 'incremental'}
+
+def _pragmas(shard):
+    """auto_vacuum, páginas livres e tamanho de página do arquivo do shard"""
+    conn = sqlite3.connect(str(caminho_shard(shard)), timeout=30.0)
+    try:
+        return {nome: conn.execute(f"PRAGMA {nome}").fetchone()[0]
+                for nome in ('auto_vacuum', 'freelist_count', 'page_size')}
+    finally:
+        conn.close()
+
+def mostrar_status():
+    """Imprime, por shard, projetos vivos, excluídos e o espaço livre do arquivo"""
+    janela = f"-{int(Config.EXCLUSAO_JANELA_RESTAURACAO)} seconds"
+    print(f"{'shard':>5} {'vivos':>8} {'excluidos':>10} {'purgaveis':>10} "
+          f"{'livre_mb':>9} {'arquivo_mb':>11}  auto_vacuum")
+    for shard in listar_shards():
+        row = execute_query(
+            """
+            SELECT (SELECT COUNT(*) FROM projetos) AS total,
+                   (SELECT COUNT(*) FROM projetos_excluidos) AS excluidos,
+                   (SELECT COUNT(*) FROM projetos_excluidos
+                    WHERE deletado_em <= datetime('now', ?)) AS purgaveis
+            """,
+            (janela,),
+            fetch_one=True,
+            shard=shard
+        )
+        pragmas = _pragmas(shard)
+        livre = pragmas['freelist_count'] * pragmas['page_size']
+        caminho = caminho_shard(shard)
+        tamanho = caminho.stat().st_size if caminho.exists() else 0
+        print(f"{shard:>5} {row['total'] - row['excluidos']:>8} {row['excluidos']:>10} "
+              f"{row['purgaveis']:>10} {livre / 1048576:>9.2f} {tamanho / 1048576:>11.2f}  "
+              f"{_MODOS_AUTO_VACUUM.get(pragmas['auto_vacuum'], pragmas['auto_vacuum'])}")
+
+def purgar(janela, lote, paginas):
+    """
+    Purga todos os shards e libera as páginas livres
+
+    Returns:
+        tuple: (projetos removidos, páginas liberadas)
+    """
+    removidos = liberadas = 0
+    for shard in listar_shards():
+        removidos += purgar_shard(shard, janela, lote)
+        liberadas += liberar_paginas(shard, paginas or _pragmas(shard)['freelist_count'])
+    return removidos, liberadas
+
+def ligar_auto_vacuum(executar):
+    """
+    Liga auto_vacuum = INCREMENTAL nos arquivos que ainda não o têm
+
+    Returns:
+        list: Shards convertidos (ou a converter, sem executar)
+    """
+    pendentes = [shard for shard in listar_shards() if _pragmas(shard)['auto_vacuum'] != 2]
+    for shard in pendentes:
+        caminho = caminho_shard(shard)
+        print(f"shard {shard}: {caminho}")
+        if executar:
+            conn = sqlite3.connect(str(caminho), timeout=30.0, isolation_level=None)
+            try:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+    return pendentes
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção do banco de projetos")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    comandos.add_parser('status', help="Projetos excluídos e espaço livre por shard")
+
+    purga = comandos.add_parser('purgar', help="Remove os projetos com a janela vencida")
+    purga.add_argument('--janela', type=float, default=Config.EXCLUSAO_JANELA_RESTAURACAO,
+                       help="Idade mínima (s) da exclusão; 0 purga todos os excluídos")
+    purga.add_argument('--lote', type=int, default=Config.PURGA_LOTE)
+    purga.add_argument('--paginas', type=int, default=0,
+                       help="Páginas livres a devolver por arquivo (0: todas)")
+
+    auto_vacuum = comandos.add_parser('auto-vacuum',
+                                      help="Liga auto_vacuum incremental (VACUUM completo)")
+    auto_vacuum.add_argument('--executar', action='store_true',
+                             help="Converte os arquivos (sem isso, só mostra)")
+
+    args = parser.parse_args()
+
+    init_database()
+
+    if args.comando == 'status':
+        mostrar_status()
+
+    elif args.comando == 'purgar':
+        removidos, liberadas = purgar(args.janela, args.lote, args.paginas)
+        print(f"{removidos} projetos removidos, {liberadas} páginas liberadas")
+
+    else:
+        pendentes = ligar_auto_vacuum(args.executar)
+        if not pendentes:
+            print("Todos os arquivos já usam auto_vacuum incremental")
+        elif args.executar:
+            print()
+            mostrar_status()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Emergency Backend - Migração do Armazenamento de Conteúdo
+Move o HTML dos projetos entre o SQLite e o armazenamento de arquivos e
+remove arquivos de conteúdo que nenhum projeto referencia mais
+
+Uso:
+    python tools/migrar_armazenamento.py status
+    python tools/migrar_armazenamento.py para-arquivos [--lote 200]
+    python tools/migrar_armazenamento.py para-sqlite [--lote 200]
+    python tools/migrar_armazenamento.py coletar [--idade 3600] [--executar]
+
+Use as mesmas variáveis de ambiente do servidor (DATABASE_PATH, NUM_SHARDS,
+SHARDS_DIR, ARQUIVOS_DIR). A migração pode rodar com o servidor no ar: cada
+projeto é convertido em um UPDATE condicional à versão lida, e um projeto
+salvo no meio do caminho é pulado (rode de novo para pegá-lo). Ajuste
+ARMAZENAMENTO no servidor para o destino antes de migrar, senão os próximos
+salvamentos voltam para o formato antigo
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.db import init_database, execute_query, listar_shards
+from database.armazenamento import armazenamento_arquivos
+from utils.patch_utils import calcular_hash
+
+def mostrar_status():
+    """Imprime, por shard, quantos projetos estão em cada formato"""
+    print(f"{'shard':>5} {'sqlite':>8} {'arquivos':>9}")
+    for shard in listar_shards():
+        row = execute_query(
+            """
+            SELECT SUM(tamanho_arquivo IS NULL) AS sqlite,
+                   SUM(tamanho_arquivo IS NOT NULL) AS arquivos
+            FROM projetos
+            """,
+            fetch_one=True,
+            shard=shard
+        )
+        print(f"{shard:>5} {row['sqlite'] or 0:>8} {row['arquivos'] or 0:>9}")
+
+    arquivos = armazenamento_arquivos()
+    total = tamanho = 0
+    for _, caminho in arquivos.listar_hashes():
+        total += 1
+        tamanho += caminho.stat().st_size
+    print(f"\n{total} arquivos de conteúdo ({tamanho / 1048576:.2f} MB) em {arquivos.raiz}")
+
+def _lotes(shard, condicao, colunas, lote):
+    """Itera as linhas de projetos que satisfazem `condicao`, em lotes por id"""
+    ultimo_id = 0
+    while True:
+        linhas = execute_query(
+            f"SELECT {colunas} FROM projetos WHERE {condicao} AND id > ? ORDER BY id LIMIT ?",
+            (ultimo_id, lote),
+            fetch_all=True,
+            shard=shard
+        )
+        if not linhas:
+            return
+        yield from linhas
+        ultimo_id = linhas[-1]['id']
+
+def para_arquivos(lote):
+    """
+    Grava o HTML de cada projeto no SQLite como arquivo e esvazia a coluna
+
+    Returns:
+        tuple: (migrados, pulados por salvamento concorrente)
+    """
+    arquivos = armazenamento_arquivos()
+    migrados = pulados = 0
+
+    for shard in listar_shards():
+        for linha in _lotes(shard, "tamanho_arquivo IS NULL",
+                            "id, versao, conteudo_html, hash_conteudo", lote):
+            hash_conteudo = linha['hash_conteudo'] or calcular_hash(linha['conteudo_html'])
+            coluna_html, tamanho = arquivos.gravar(linha['conteudo_html'], hash_conteudo)
+
+            cursor = execute_query(
+                """
+                UPDATE projetos SET conteudo_html = ?, tamanho_arquivo = ?, hash_conteudo = ?
+                WHERE id = ? AND versao = ? AND tamanho_arquivo IS NULL
+                """,
+                (coluna_html, tamanho, hash_conteudo, linha['id'], linha['versao']),
+                shard=shard
+            )
+            if cursor.rowcount:
+                migrados += 1
+            else:
+                pulados += 1
+
+    return migrados, pulados
+
+def para_sqlite(lote):
+    """
+    Copia o HTML de cada arquivo de volta para a coluna conteudo_html
+
+    Os arquivos ficam no disco até a próxima coleta
+
+    Returns:
+        tuple: (migrados, pulados por salvamento concorrente)
+    """
+    arquivos = armazenamento_arquivos()
+    migrados = pulados = 0
+
+    for shard in listar_shards():
+        for linha in _lotes(shard, "tamanho_arquivo IS NOT NULL",
+                            "id, versao, hash_conteudo", lote):
+            conteudo_html = arquivos.ler(linha['hash_conteudo'])
+
+            cursor = execute_query(
+                """
+                UPDATE projetos SET conteudo_html = ?, tamanho_arquivo = NULL
+                WHERE id = ? AND versao = ? AND hash_conteudo = ?
+                  AND tamanho_arquivo IS NOT NULL
+                """,
+                (conteudo_html, linha['id'], linha['versao'], linha['hash_conteudo']),
+                shard=shard
+            )
+            if cursor.rowcount:
+                migrados += 1
+            else:
+                pulados += 1
+
+    return migrados, pulados
+
+def coletar(idade, executar):
+    """
+    Remove arquivos de conteúdo sem projeto que os referencie
+
+    Só são candidatos arquivos sem modificação há `idade` segundos: um
+    salvamento grava (ou toca) o arquivo antes de gravar a linha, então
+    arquivos recentes podem estar prestes a ser referenciados
+
+    Returns:
+        tuple: (removidos, bytes liberados)
+    """
+    arquivos = armazenamento_arquivos()
+    limite = time.time() - idade
+
+    candidatos = [(hash_conteudo, caminho) for hash_conteudo, caminho in arquivos.listar_hashes()
+                  if caminho.stat().st_mtime < limite]
+
+    # Referências lidas depois da lista de candidatos
+    referenciados = set()
+    for shard in listar_shards():
+        linhas = execute_query(
+            "SELECT DISTINCT hash_conteudo FROM projetos WHERE tamanho_arquivo IS NOT NULL",
+            fetch_all=True,
+            shard=shard
+        )
+        referenciados.update(linha['hash_conteudo'] for linha in linhas)
+
+    removidos = liberados = 0
+    for hash_conteudo, caminho in candidatos:
+        if hash_conteudo in referenciados:
+            continue
+        try:
+            estado = caminho.stat()
+            if estado.st_mtime >= limite:
+                continue
+            if executar:
+                caminho.unlink()
+        except FileNotFoundError:
+            continue
+        removidos += 1
+        liberados += estado.st_size
+
+    # Temporários de escritas interrompidas
+    for temporario in arquivos.raiz.glob('*/*/.tmp-*'):
+        try:
+            if temporario.stat().st_mtime < limite and executar:
+                temporario.unlink()
+        except FileNotFoundError:
+            pass
+
+    return removidos, liberados
+
+def main():
+    parser = argparse.ArgumentParser(description="Migração do armazenamento de conteúdo")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    comandos.add_parser('status', help="Projetos em cada formato")
+
+    for nome, ajuda in (('para-arquivos', "Move o HTML do SQLite para arquivos"),
+                        ('para-sqlite', "Move o HTML dos arquivos para o SQLite")):
+        migrar = comandos.add_parser(nome, help=ajuda)
+        migrar.add_argument('--lote', type=int, default=200,
+                            help="Projetos lidos por consulta")
+
+    coleta = comandos.add_parser('coletar', help="Remove arquivos sem referência")
+    coleta.add_argument('--idade', type=float, default=3600,
+                        help="Idade mínima (s) de um arquivo para ser removido")
+    coleta.add_argument('--executar', action='store_true',
+                        help="Remove de fato (sem isso, só conta)")
+
+    args = parser.parse_args()
+
+    init_database()
+
+    if args.comando == 'status':
+        mostrar_status()
+
+    elif args.comando == 'coletar':
+        removidos, liberados = coletar(args.idade, args.executar)
+        acao = "removidos" if args.executar else "seriam removidos"
+        print(f"{removidos} arquivos {acao} ({liberados / 1048576:.2f} MB)")
+
+    else:
+        migrar = para_arquivos if args.comando == 'para-arquivos' else para_sqlite
+        migrados, pulados = migrar(args.lote)
+        print(f"{migrados} projetos migrados, {pulados} pulados (salvos durante a migração)")
+        if args.comando == 'para-sqlite' and migrados:
+            print("Para liberar o disco: python tools/migrar_armazenamento.py coletar --executar")
+
+if __name__ == '__main__':
+    main()
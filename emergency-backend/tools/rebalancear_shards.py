@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Emergency Backend - Rebalanceamento de Shards
+Mostra a distribuição de usuários e projetos entre os shards e move usuários
+entre eles com o servidor no ar
+
+Uso:
+    python tools/rebalancear_shards.py status
+    python tools/rebalancear_shards.py mover USUARIO_ID SHARD [--espera 2]
+    python tools/rebalancear_shards.py auto [--tolerancia 0.1] [--max-movimentos 50] [--executar]
+
+Use as mesmas variáveis de ambiente do servidor (DATABASE_PATH, NUM_SHARDS,
+SHARDS_DIR). Sem --executar, o modo auto só mostra o plano
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import Config
+from database.db import init_database, execute_query, caminho_shard, listar_shards
+from database.shards import mover_usuario
+
+def carga_por_usuario():
+    """
+    Bytes de HTML de cada usuário, por shard
+
+    Returns:
+        dict: {shard: {usuario_id: bytes}}
+    """
+    cargas = {}
+    for shard in listar_shards():
+        linhas = execute_query(
+            """
+            SELECT usuario_id, SUM(COALESCE(tamanho_arquivo, LENGTH(conteudo_html))) AS bytes
+            FROM projetos GROUP BY usuario_id
+            """,
+            fetch_all=True,
+            shard=shard
+        )
+        cargas[shard] = {linha['usuario_id']: linha['bytes'] for linha in linhas}
+    return cargas
+
+def mostrar_status():
+    """Imprime usuários, projetos e tamanho de cada shard"""
+    cargas = carga_por_usuario()
+    print(f"{'shard':>5} {'usuarios':>9} {'projetos':>9} {'html_mb':>9} {'arquivo_mb':>11}  arquivo")
+    for shard in listar_shards():
+        projetos = execute_query("SELECT COUNT(*) AS total FROM projetos",
+                                 fetch_one=True, shard=shard)['total']
+        caminho = caminho_shard(shard)
+        tamanho = caminho.stat().st_size if caminho.exists() else 0
+        html = sum(cargas[shard].values())
+        print(f"{shard:>5} {len(cargas[shard]):>9} {projetos:>9} "
+              f"{html / 1048576:>9.2f} {tamanho / 1048576:>11.2f}  {caminho}")
+
+def planejar(cargas, tolerancia, max_movimentos):
+    """
+    Plano guloso: move o usuário do shard mais carregado para o menos
+    carregado enquanto isso reduzir a diferença entre eles
+
+    Só considera os shards 0..NUM_SHARDS-1 como destino; shards fora dessa
+    faixa são esvaziados
+
+    Returns:
+        list: Movimentos (usuario_id, origem, destino, bytes)
+    """
+    ativos = list(range(Config.NUM_SHARDS))
+    totais = {shard: sum(usuarios.values()) for shard, usuarios in cargas.items()}
+    usuarios = {shard: dict(u) for shard, u in cargas.items()}
+    plano = []
+
+    # Shards desativados (ex: NUM_SHARDS reduzido) são esvaziados primeiro
+    for shard in [s for s in cargas if s not in ativos]:
+        for usuario_id, tamanho in sorted(usuarios[shard].items(), key=lambda i: -i[1]):
+            destino = min(ativos, key=lambda s: totais[s])
+            plano.append((usuario_id, shard, destino, tamanho))
+            totais[destino] += tamanho
+            totais[shard] -= tamanho
+            usuarios[destino][usuario_id] = tamanho
+        usuarios[shard] = {}
+
+    media = sum(totais[s] for s in ativos) / len(ativos)
+
+    while len(plano) < max_movimentos:
+        origem = max(ativos, key=lambda s: totais[s])
+        destino = min(ativos, key=lambda s: totais[s])
+        diferenca = totais[origem] - totais[destino]
+
+        if diferenca <= tolerancia * media or not usuarios[origem]:
+            break
+
+        # Usuário cujo tamanho mais se aproxima de metade da diferença
+        usuario_id, tamanho = min(usuarios[origem].items(),
+                                  key=lambda i: abs(i[1] - diferenca / 2))
+        if tamanho >= diferenca:
+            break
+
+        plano.append((usuario_id, origem, destino, tamanho))
+        totais[origem] -= tamanho
+        totais[destino] += tamanho
+        usuarios[destino][usuario_id] = usuarios[origem].pop(usuario_id)
+
+    return plano
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebalanceamento de shards de projetos")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    comandos.add_parser('status', help="Distribuição atual")
+
+    mover = comandos.add_parser('mover', help="Move um usuário para outro shard")
+    mover.add_argument('usuario_id', type=int)
+    mover.add_argument('shard', type=int)
+    mover.add_argument('--espera', type=float, default=2.0,
+                       help="Carência (s) para requisições em andamento terminarem")
+
+    auto = comandos.add_parser('auto', help="Equilibra os shards por bytes de HTML")
+    auto.add_argument('--tolerancia', type=float, default=0.1,
+                      help="Diferença aceitável entre shards, relativa à média")
+    auto.add_argument('--max-movimentos', type=int, default=50)
+    auto.add_argument('--espera', type=float, default=2.0)
+    auto.add_argument('--executar', action='store_true',
+                      help="Executa o plano (sem isso, só mostra)")
+
+    args = parser.parse_args()
+
+    if args.comando != 'status' and Config.NUM_SHARDS <= 1:
+        parser.error("Defina NUM_SHARDS > 1 (mesmo valor usado pelo servidor)")
+
+    init_database()
+
+    if args.comando == 'status':
+        mostrar_status()
+
+    elif args.comando == 'mover':
+        movidos = mover_usuario(args.usuario_id, args.shard, args.espera)
+        print(f"Usuário {args.usuario_id}: {movidos} projetos movidos para o shard {args.shard}")
+
+    else:
+        plano = planejar(carga_por_usuario(), args.tolerancia, args.max_movimentos)
+        if not plano:
+            print("Shards já equilibrados")
+        for usuario_id, origem, destino, tamanho in plano:
+            print(f"usuário {usuario_id}: shard {origem} -> {destino} ({tamanho / 1024:.1f} KB)")
+            if args.executar:
+                mover_usuario(usuario_id, destino, args.espera)
+        if plano and args.executar:
+            print()
+            mostrar_status()
+
+if __name__ == '__main__':
+    main()
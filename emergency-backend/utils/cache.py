@@ -0,0 +1,520 @@
+"""
+Emergency Backend - Cache
+Abstração de cache com dois backends de mesma interface:
+
+- local: memória do processo (LRU com TTL). Cada worker do pre-fork tem o
+  seu e as invalidações só valem nele
+- compartilhado: arquivo SQLite no mesmo host, visto por todos os workers.
+  Cada processo mantém na frente um cache local curto; quem grava ou remove
+  uma chave registra a invalidação em uma tabela que os outros processos
+  leem periodicamente (difusão de invalidações)
+
+criar_cache(namespace) escolhe o backend por Config.CACHE_BACKEND. Os valores
+precisam ser serializáveis em JSON e None significa ausência. Falhas do
+arquivo compartilhado nunca chegam a quem chamou: contam como falha de cache
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from config.settings import Config
+from database.migrations import migrar, MIGRACOES_CACHE
+from utils import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOCAL = 'local'
+COMPARTILHADO = 'compartilhado'
+
+# Tempo (segundos) que as invalidações ficam na tabela. O cache local de um
+# processo vive no máximo metade disso, então uma entrada nunca sobrevive a
+# uma invalidação já apagada
+_RETENCAO_INVALIDACOES = 60.0
+
+# A cada N invalidações registradas, as antigas são apagadas
+_LIMPEZA_A_CADA = 256
+
+def _copiar(valor):
+    """Cópia rasa de dicts e listas: quem recebe pode alterar sem afetar o cache"""
+    if isinstance(valor, dict):
+        return dict(valor)
+    if isinstance(valor, list):
+        return list(valor)
+    return valor
+
+class CacheLocal:
+    """Cache em memória do processo, LRU limitado por número de entradas"""
+
+    compartilhado = False
+
+    def __init__(self, namespace, ttl=None, max_entradas=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entradas = max_entradas or Config.CACHE_LOCAL_MAX_ENTRADAS
+        # chave -> (valor, momento monotonic em que expira ou None)
+        self._entradas = OrderedDict()
+        self._contadores = {}
+        self._lock = threading.Lock()
+        _instancias.add(self)
+
+    def _buscar(self, chave):
+        """Valor guardado (sem métricas) ou None"""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if expira is not None and expira <= time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return valor
+
+    def _guardar(self, chave, valor, ttl):
+        """Guarda com ttl em segundos (None: não expira; <= 0: já expirado, não guarda)"""
+        with self._lock:
+            if ttl is not None and ttl <= 0:
+                self._entradas.pop(chave, None)
+                return
+            expira = None if ttl is None else time.monotonic() + ttl
+            self._entradas[chave] = (valor, expira)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def obter(self, chave):
+        """
+        Valor guardado em uma chave
+
+        Returns:
+            Valor (cópia rasa de dicts/listas) ou None se ausente ou expirado
+        """
+        valor = self._buscar(str(chave))
+        metrics.incrementar(f'cache.{self.namespace}.' + ('acertos' if valor is not None else 'falhas'))
+        return _copiar(valor)
+
+    def definir(self, chave, valor, ttl=None):
+        """
+        Guarda um valor
+
+        Args:
+            chave: Chave (convertida para str)
+            valor: Valor serializável em JSON (não None)
+            ttl (float, opcional): Segundos até expirar (padrão: o do cache);
+                0 ou negativo não guarda nada
+        """
+        self._guardar(str(chave), _copiar(valor), self.ttl if ttl is None else ttl)
+
+    def adicionar(self, chave, valor, ttl=None):
+        """
+        Guarda um valor só se a chave estiver ausente ou expirada
+
+        Returns:
+            bool: True se o valor foi guardado
+        """
+        chave = str(chave)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and (entrada[1] is None or entrada[1] > time.monotonic()):
+                return False
+        self._guardar(chave, _copiar(valor), self.ttl if ttl is None else ttl)
+        return True
+
+    def remover(self, chave):
+        """Remove uma chave (ausente: nada acontece)"""
+        with self._lock:
+            self._entradas.pop(str(chave), None)
+
+    def incrementar(self, chave):
+        """
+        Incrementa um contador (começa em 0; contadores não expiram)
+
+        Returns:
+            int: Novo valor
+        """
+        chave = str(chave)
+        with self._lock:
+            valor = self._contadores.get(chave, 0) + 1
+            self._contadores[chave] = valor
+            return valor
+
+    def contador(self, chave):
+        """Valor atual de um contador (0 se nunca incrementado)"""
+        with self._lock:
+            return self._contadores.get(str(chave), 0)
+
+    def limpar(self):
+        """Esvazia o cache (entradas e contadores)"""
+        with self._lock:
+            self._entradas.clear()
+            self._contadores.clear()
+
+    def reiniciar_apos_fork(self):
+        self._lock = threading.Lock()
+        self._entradas.clear()
+        self._contadores.clear()
+
+class _ArquivoCompartilhado:
+    """
+    Arquivo SQLite do cache compartilhado (um objeto por processo)
+
+    Guarda as conexões por thread e aplica nos caches locais as invalidações
+    registradas pelos outros processos
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._lock_sincronizacao = threading.Lock()
+        self._caminho = None
+        # namespace -> caches compartilhados do processo (para invalidar o local)
+        self._caches = {}
+        self._ultimo_seq = None
+        self._proxima_sincronizacao = 0.0
+        self._invalidacoes = 0
+
+    def caminho(self):
+        """CACHE_COMPARTILHADO_PATH ou, sem ele, '<DATABASE_PATH>-cache'"""
+        if Config.CACHE_COMPARTILHADO_PATH:
+            return Config.CACHE_COMPARTILHADO_PATH
+        return Config.DATABASE_PATH.with_name(Config.DATABASE_PATH.name + '-cache')
+
+    def registrar(self, cache):
+        with self._lock:
+            self._caches.setdefault(cache.namespace, weakref.WeakSet()).add(cache)
+
+    def conexao(self):
+        """Conexão da thread atual (criada e migrada no primeiro uso)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        with self._lock:
+            if self._caminho is None:
+                caminho = self.caminho()
+                caminho.parent.mkdir(parents=True, exist_ok=True)
+                migrar(caminho, MIGRACOES_CACHE)
+                self._caminho = caminho
+
+        conn = sqlite3.connect(str(self._caminho), timeout=Config.CACHE_COMPARTILHADO_TIMEOUT,
+                               isolation_level=None)
+        conn.execute("PRAGMA journal_mode = WAL")
+        # O conteúdo é descartável: sem fsync a cada escrita
+        conn.execute("PRAGMA synchronous = OFF")
+
+        with self._lock:
+            if self._ultimo_seq is None:
+                # Primeira conexão do processo: nada entrou no cache local
+                # ainda, então as invalidações anteriores não interessam
+                row = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidacoes").fetchone()
+                self._ultimo_seq = row[0]
+
+        self._local.conn = conn
+        return conn
+
+    def difundir(self, conn, namespace, chave):
+        """Registra a invalidação de uma chave para os outros processos"""
+        agora = time.time()
+        conn.execute(
+            "INSERT INTO invalidacoes (namespace, chave, origem, criado_em) VALUES (?, ?, ?, ?)",
+            (namespace, chave, os.getpid(), agora)
+        )
+        with self._lock:
+            self._invalidacoes += 1
+            limpar = self._invalidacoes % _LIMPEZA_A_CADA == 0
+        if limpar:
+            conn.execute("DELETE FROM invalidacoes WHERE criado_em < ?",
+                         (agora - _RETENCAO_INVALIDACOES,))
+            conn.execute("DELETE FROM entradas WHERE expira IS NOT NULL AND expira < ?", (agora,))
+
+    def sincronizar(self):
+        """
+        Aplica as invalidações novas dos outros processos nos caches locais
+
+        Roda no máximo uma vez por CACHE_INVALIDACAO_INTERVALO_MS; enquanto
+        uma thread sincroniza, as outras seguem sem esperar
+        """
+        agora = time.monotonic()
+        if agora < self._proxima_sincronizacao:
+            return
+        if not self._lock_sincronizacao.acquire(blocking=False):
+            return
+        try:
+            self._proxima_sincronizacao = agora + Config.CACHE_INVALIDACAO_INTERVALO_MS / 1000
+            conn = self.conexao()
+
+            rows = conn.execute(
+                "SELECT seq, namespace, chave, origem FROM invalidacoes WHERE seq > ? ORDER BY seq",
+                (self._ultimo_seq,)
+            ).fetchall()
+            if not rows:
+                return
+
+            with self._lock:
+                caches = {namespace: list(conjunto) for namespace, conjunto in self._caches.items()}
+
+            if rows[0][0] != self._ultimo_seq + 1:
+                # Invalidações apagadas antes de serem lidas: descarta tudo
+                for lista in caches.values():
+                    for cache in lista:
+                        cache.local.limpar()
+                metrics.incrementar('cache.compartilhado.sincronizacoes_perdidas')
+            else:
+                pid = os.getpid()
+                recebidas = 0
+                for _, namespace, chave, origem in rows:
+                    if origem == pid:
+                        continue
+                    for cache in caches.get(namespace, ()):
+                        cache.local.remover(chave)
+                    recebidas += 1
+                if recebidas:
+                    metrics.incrementar('cache.compartilhado.invalidacoes_recebidas', recebidas)
+
+            self._ultimo_seq = rows[-1][0]
+
+        except sqlite3.Error as e:
+            _registrar_erro('sincronizar', e)
+        finally:
+            self._lock_sincronizacao.release()
+
+    def reiniciar_apos_fork(self):
+        # A conexão herdada do pai não pode ser usada no filho
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._lock_sincronizacao = threading.Lock()
+        self._ultimo_seq = None
+        self._proxima_sincronizacao = 0.0
+
+def _registrar_erro(operacao, erro):
+    metrics.incrementar('cache.compartilhado.erros')
+    logger.warning("Erro no cache compartilhado (%s): %s", operacao, erro,
+                   extra={'operacao': operacao})
+
+class CacheCompartilhado:
+    """Cache no arquivo compartilhado entre workers, com cache local na frente"""
+
+    compartilhado = True
+
+    def __init__(self, namespace, ttl=None, max_entradas=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        ttl_local = min(Config.CACHE_COMPARTILHADO_TTL_LOCAL, _RETENCAO_INVALIDACOES / 2)
+        self.local = CacheLocal(namespace, ttl_local, max_entradas)
+        _arquivo.registrar(self)
+
+    def obter(self, chave):
+        """
+        Valor guardado em uma chave (cache local ou arquivo)
+
+        Returns:
+            Valor (cópia rasa de dicts/listas) ou None se ausente ou expirado
+        """
+        chave = str(chave)
+        _arquivo.sincronizar()
+
+        valor = self.local._buscar(chave)
+        if valor is not None:
+            metrics.incrementar(f'cache.{self.namespace}.acertos')
+            return _copiar(valor)
+
+        try:
+            row = _arquivo.conexao().execute(
+                "SELECT valor, expira FROM entradas WHERE namespace = ? AND chave = ?",
+                (self.namespace, chave)
+            ).fetchone()
+        except sqlite3.Error as e:
+            _registrar_erro('obter', e)
+            row = None
+
+        agora = time.time()
+        if row is None or (row[1] is not None and row[1] <= agora):
+            metrics.incrementar(f'cache.{self.namespace}.falhas')
+            return None
+
+        valor = json.loads(row[0])
+        ttl_local = self.local.ttl if row[1] is None else min(self.local.ttl, row[1] - agora)
+        self.local._guardar(chave, valor, ttl_local)
+        metrics.incrementar(f'cache.{self.namespace}.acertos')
+        return _copiar(valor)
+
+    def definir(self, chave, valor, ttl=None):
+        """Guarda um valor para todos os processos (ver CacheLocal.definir)"""
+        chave = str(chave)
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            conn = _arquivo.conexao()
+            conn.execute(
+                "INSERT OR REPLACE INTO entradas (namespace, chave, valor, expira) VALUES (?, ?, ?, ?)",
+                (self.namespace, chave, json.dumps(valor), None if ttl is None else time.time() + ttl)
+            )
+            _arquivo.difundir(conn, self.namespace, chave)
+        except sqlite3.Error as e:
+            _registrar_erro('definir', e)
+            self.local.remover(chave)
+            return
+        self.local._guardar(chave, _copiar(valor),
+                            self.local.ttl if ttl is None else min(ttl, self.local.ttl))
+
+    def adicionar(self, chave, valor, ttl=None):
+        """
+        Guarda um valor só se a chave estiver ausente ou expirada em todos os
+        processos (ex: "só um worker executa isto por minuto")
+
+        A chave ainda válida no cache local responde sem tocar no arquivo, e
+        o arquivo é lido antes de escrever: o lock de escrita só é disputado
+        quando a chave está ausente ou expirada
+
+        Returns:
+            bool: True se o valor foi guardado
+        """
+        chave = str(chave)
+        ttl = self.ttl if ttl is None else ttl
+        _arquivo.sincronizar()
+
+        if self.local._buscar(chave) is not None:
+            return False
+
+        agora = time.time()
+        try:
+            conn = _arquivo.conexao()
+            row = conn.execute(
+                "SELECT valor, expira FROM entradas WHERE namespace = ? AND chave = ?",
+                (self.namespace, chave)
+            ).fetchone()
+            if row is not None and (row[1] is None or row[1] > agora):
+                ttl_local = self.local.ttl if row[1] is None else min(self.local.ttl, row[1] - agora)
+                self.local._guardar(chave, json.loads(row[0]), ttl_local)
+                return False
+
+            cursor = conn.execute(
+                """
+                INSERT INTO entradas (namespace, chave, valor, expira) VALUES (?, ?, ?, ?)
+                ON CONFLICT (namespace, chave) DO UPDATE
+                    SET valor = excluded.valor, expira = excluded.expira
+                    WHERE entradas.expira IS NOT NULL AND entradas.expira <= ?
+                """,
+                (self.namespace, chave, json.dumps(valor), None if ttl is None else agora + ttl, agora)
+            )
+        except sqlite3.Error as e:
+            _registrar_erro('adicionar', e)
+            return False
+
+        if cursor.rowcount == 0:
+            # Outro processo guardou a chave entre a leitura e o INSERT
+            return False
+        self.local._guardar(chave, _copiar(valor),
+                            self.local.ttl if ttl is None else min(ttl, self.local.ttl))
+        return True
+
+    def remover(self, chave):
+        """Remove uma chave em todos os processos"""
+        chave = str(chave)
+        self.local.remover(chave)
+        try:
+            conn = _arquivo.conexao()
+            conn.execute("DELETE FROM entradas WHERE namespace = ? AND chave = ?",
+                         (self.namespace, chave))
+            _arquivo.difundir(conn, self.namespace, chave)
+        except sqlite3.Error as e:
+            _registrar_erro('remover', e)
+
+    def incrementar(self, chave):
+        """
+        Incrementa um contador compartilhado (começa em 0; não expira)
+
+        Returns:
+            int: Novo valor ou None se o arquivo estiver inacessível
+        """
+        try:
+            conn = _arquivo.conexao()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    """
+                    INSERT INTO contadores (namespace, chave, valor) VALUES (?, ?, 1)
+                    ON CONFLICT (namespace, chave) DO UPDATE SET valor = valor + 1
+                    """,
+                    (self.namespace, str(chave))
+                )
+                valor = conn.execute(
+                    "SELECT valor FROM contadores WHERE namespace = ? AND chave = ?",
+                    (self.namespace, str(chave))
+                ).fetchone()[0]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return valor
+        except sqlite3.Error as e:
+            _registrar_erro('incrementar', e)
+            return None
+
+    def contador(self, chave):
+        """
+        Valor atual de um contador, lido sempre do arquivo
+
+        Returns:
+            int: Valor (0 se nunca incrementado) ou None se o arquivo estiver
+                 inacessível
+        """
+        try:
+            row = _arquivo.conexao().execute(
+                "SELECT valor FROM contadores WHERE namespace = ? AND chave = ?",
+                (self.namespace, str(chave))
+            ).fetchone()
+        except sqlite3.Error as e:
+            _registrar_erro('contador', e)
+            return None
+        return row[0] if row else 0
+
+    def limpar(self):
+        """Esvazia o namespace em todos os processos"""
+        self.local.limpar()
+        try:
+            conn = _arquivo.conexao()
+            for chave, in conn.execute("SELECT chave FROM entradas WHERE namespace = ?",
+                                       (self.namespace,)).fetchall():
+                _arquivo.difundir(conn, self.namespace, chave)
+            conn.execute("DELETE FROM entradas WHERE namespace = ?", (self.namespace,))
+            conn.execute("DELETE FROM contadores WHERE namespace = ?", (self.namespace,))
+        except sqlite3.Error as e:
+            _registrar_erro('limpar', e)
+
+# Caches locais do processo (para recriar os locks após fork)
+_instancias = weakref.WeakSet()
+
+_arquivo = _ArquivoCompartilhado()
+
+def criar_cache(namespace, ttl=None, max_entradas=None, compartilhado=None):
+    """
+    Cria um cache com o backend configurado
+
+    Args:
+        namespace (str): Nome do cache (separa as chaves e nomeia as métricas)
+        ttl (float, opcional): Segundos até as entradas expirarem (None: não expiram)
+        max_entradas (int, opcional): Limite do cache local (padrão: CACHE_LOCAL_MAX_ENTRADAS)
+        compartilhado (bool, opcional): Força um backend; None segue
+                                        Config.CACHE_BACKEND
+
+    Returns:
+        CacheLocal ou CacheCompartilhado
+    """
+    if compartilhado is None:
+        compartilhado = Config.CACHE_BACKEND == COMPARTILHADO
+    if compartilhado:
+        return CacheCompartilhado(namespace, ttl, max_entradas)
+    return CacheLocal(namespace, ttl, max_entradas)
+
+def _reiniciar_apos_fork():
+    _arquivo.reiniciar_apos_fork()
+    for cache in list(_instancias):
+        cache.reiniciar_apos_fork()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
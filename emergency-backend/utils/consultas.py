@@ -0,0 +1,128 @@
+"""
+Emergency Backend - Contabilidade de Consultas
+Conta as consultas SQL de cada requisição (quantidade, tempo de banco e
+linhas lidas), compara com o orçamento da rota e detecta a mesma instrução
+repetida várias vezes (padrão N+1)
+
+execute_query e executar_escrita chamam registrar(); fora de uma requisição
+(threads de background, ferramentas) a chamada não faz nada
+"""
+
+import contextvars
+from config.settings import Config
+from utils import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Limites do histograma de consultas por requisição
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50)
+
+class Contabilidade:
+    """Consultas de uma requisição"""
+
+    __slots__ = ('rota', 'consultas', 'tempo', 'linhas', 'instrucoes')
+
+    def __init__(self, rota):
+        self.rota = rota
+        self.consultas = 0
+        self.tempo = 0.0
+        self.linhas = 0
+        # Execuções por texto SQL (os parâmetros variam em um N+1)
+        self.instrucoes = {}
+
+    @property
+    def tempo_ms(self):
+        return round(self.tempo * 1000, 3)
+
+    def repetidas(self, limite):
+        """Instruções executadas pelo menos `limite` vezes: {sql: execuções}"""
+        return {sql: vezes for sql, vezes in self.instrucoes.items() if vezes >= limite}
+
+_atual = contextvars.ContextVar('contabilidade_consultas', default=None)
+
+def iniciar(rota):
+    """
+    Começa a contabilidade de uma requisição na thread (contexto) atual
+
+    Args:
+        rota (str): Identificador da rota (endpoint do Flask)
+
+    Returns:
+        Contabilidade: Objeto que acumula as consultas
+    """
+    contabilidade = Contabilidade(rota)
+    _atual.set(contabilidade)
+    return contabilidade
+
+def atual():
+    """Contabilidade da requisição em andamento ou None"""
+    return _atual.get()
+
+def registrar(query, duracao, linhas=0):
+    """
+    Registra uma consulta executada
+
+    Args:
+        query (str): Texto SQL (sem os parâmetros)
+        duracao (float): Tempo da execução em segundos
+        linhas (int): Linhas lidas pelo fetch
+    """
+    contabilidade = _atual.get()
+    if contabilidade is None:
+        return
+
+    contabilidade.consultas += 1
+    contabilidade.tempo += duracao
+    contabilidade.linhas += linhas
+    contabilidade.instrucoes[query] = contabilidade.instrucoes.get(query, 0) + 1
+
+def _resumir_sql(query):
+    """SQL em uma linha e truncado, para logs"""
+    return ' '.join(query.split())[:200]
+
+def finalizar():
+    """
+    Encerra a contabilidade da requisição atual: métricas, orçamento e N+1
+
+    Returns:
+        Contabilidade: A contabilidade encerrada ou None se não havia
+    """
+    contabilidade = _atual.get()
+    if contabilidade is None:
+        return None
+    _atual.set(None)
+
+    rota = contabilidade.rota
+    metrics.observar(f'consultas.{rota}', contabilidade.consultas, BUCKETS_CONSULTAS)
+    metrics.observar(f'consultas_ms.{rota}', contabilidade.tempo * 1000)
+    metrics.incrementar(f'consultas_linhas.{rota}', contabilidade.linhas)
+
+    orcamento = Config.ORCAMENTO_CONSULTAS.get(rota)
+    if orcamento is not None and contabilidade.consultas > orcamento:
+        metrics.incrementar(f'consultas.orcamento_excedido.{rota}')
+        logger.warning("Rota %s executou %s consultas (orçamento: %s)",
+                       rota, contabilidade.consultas, orcamento,
+                       extra={'rota': rota, 'consultas': contabilidade.consultas,
+                              'orcamento': orcamento, 'db_ms': contabilidade.tempo_ms})
+
+    for sql, vezes in contabilidade.repetidas(Config.CONSULTAS_REPETIDAS_LIMITE).items():
+        metrics.incrementar(f'consultas.repetidas.{rota}')
+        logger.warning("Possível N+1 em %s: mesma consulta executada %s vezes",
+                       rota, vezes, extra={'rota': rota, 'sql': _resumir_sql(sql)})
+
+    return contabilidade
+
+def cabecalhos(contabilidade):
+    """
+    Cabeçalhos de depuração com o resumo da requisição
+
+    Server-Timing aparece na aba de rede das ferramentas do navegador
+    """
+    return {
+        'X-DB-Consultas': str(contabilidade.consultas),
+        'X-DB-Tempo-Ms': f'{contabilidade.tempo * 1000:.3f}',
+        'X-DB-Linhas': str(contabilidade.linhas),
+        'Server-Timing': f'db;dur={contabilidade.tempo * 1000:.3f};'
+                         f'desc="{contabilidade.consultas} consultas"'
+    }
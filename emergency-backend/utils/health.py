@@ -0,0 +1,187 @@
+"""
+Emergency Backend - Probes de Saúde
+Liveness e readiness com orçamento de latência para o orquestrador
+"""
+
+import os
+import threading
+import time
+from config.settings import Config
+from database.db import ping_database, contar_conexoes_abertas, contar_threads_com_conexao
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Estados possíveis, do melhor para o pior
+SAUDAVEL = "saudavel"
+DEGRADADO = "degradado"
+INDISPONIVEL = "indisponivel"
+
+_ORDEM_ESTADOS = [SAUDAVEL, DEGRADADO, INDISPONIVEL]
+
+# Verificações extras registradas por outros módulos (ex: flusher em background)
+_verificacoes = {}
+
+# Último resultado de prontidão, reaproveitado por HEALTH_CACHE_SECONDS
+_cache = {'resultado': None, 'expira_em': 0.0}
+_cache_lock = threading.Lock()
+
+_inicio_processo = time.time()
+
+def _reiniciar_apos_fork():
+    """Cache de prontidão e uptime passam a ser do worker"""
+    global _cache_lock, _inicio_processo
+    _cache_lock = threading.Lock()
+    _cache['resultado'] = None
+    _cache['expira_em'] = 0.0
+    _inicio_processo = time.time()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
+
+def registrar_verificacao(nome, funcao):
+    """
+    Registra uma verificação adicional para o probe de prontidão
+
+    Args:
+        nome (str): Nome exibido no resultado
+        funcao (callable): Função sem argumentos que retorna dict com 'estado'
+    """
+    _verificacoes[nome] = funcao
+
+def _pior_estado(estados):
+    """Retorna o estado mais grave da lista"""
+    return max(estados, key=_ORDEM_ESTADOS.index, default=SAUDAVEL)
+
+def verificar_vivacidade():
+    """
+    Probe de liveness: o processo responde, sem tocar no banco
+
+    Returns:
+        dict: Estado e tempo de atividade do processo
+    """
+    return {
+        "estado": SAUDAVEL,
+        "pid": os.getpid(),
+        "uptime_segundos": round(time.time() - _inicio_processo, 1)
+    }
+
+def _verificar_banco():
+    """Ping limitado no banco e espera pelo lock de escrita"""
+    orcamento_ms = Config.HEALTH_DB_TIMEOUT_MS
+    ping = ping_database(orcamento_ms / 1000)
+
+    banco = {
+        "estado": SAUDAVEL,
+        "latencia_ms": ping["latencia_ms"],
+        "orcamento_ms": orcamento_ms
+    }
+    escrita = {
+        "estado": SAUDAVEL,
+        "espera_lock_ms": ping["espera_lock_ms"],
+        "orcamento_ms": orcamento_ms
+    }
+
+    if ping["latencia_ms"] is None:
+        banco["estado"] = INDISPONIVEL
+        banco["erro"] = ping["erro"]
+        escrita["estado"] = INDISPONIVEL
+    elif ping["latencia_ms"] > Config.HEALTH_LATENCIA_DEGRADADO_MS:
+        banco["estado"] = DEGRADADO
+
+    if ping["latencia_ms"] is not None:
+        if ping["espera_lock_ms"] is None:
+            # Leitura ok, mas o lock de escrita não saiu dentro do orçamento
+            escrita["estado"] = DEGRADADO
+            escrita["erro"] = ping["erro"]
+        elif ping["espera_lock_ms"] > Config.HEALTH_LOCK_DEGRADADO_MS:
+            escrita["estado"] = DEGRADADO
+
+    return banco, escrita
+
+def capacidade_conexoes():
+    """
+    Threads com conexão que o processo comporta
+
+    Returns:
+        int: DB_MAX_CONEXOES ou o derivado dos limites de admissão; None se
+             nada limita as requisições simultâneas (admissão desligada)
+    """
+    if Config.DB_MAX_CONEXOES:
+        return Config.DB_MAX_CONEXOES
+    if not Config.ADMISSAO_HABILITADA:
+        return None
+    return (sum(classe['limite'] for classe in Config.ADMISSAO_CLASSES.values())
+            + Config.WS_WORKERS + Config.DB_CONEXOES_RESERVA)
+
+def _verificar_conexoes():
+    """
+    Saturação das threads com conexão frente à capacidade
+
+    Conexões ocupadas não impedem o processo de atender (a admissão enfileira
+    o excedente), então a saturação sozinha no máximo degrada o probe
+    """
+    threads = contar_threads_com_conexao()
+    maximo = capacidade_conexoes()
+    saturacao = round(threads / maximo, 3) if maximo else 0.0
+
+    if saturacao >= Config.HEALTH_SATURACAO_DEGRADADO:
+        estado = DEGRADADO
+    else:
+        estado = SAUDAVEL
+
+    return {
+        "estado": estado,
+        "threads": threads,
+        "abertas": contar_conexoes_abertas(),
+        "maximo": maximo,
+        "saturacao": saturacao
+    }
+
+def verificar_prontidao():
+    """
+    Probe de readiness: banco, lock de escrita, conexões e verificações registradas
+
+    O resultado é reaproveitado por HEALTH_CACHE_SECONDS para manter o probe barato
+
+    Returns:
+        dict: Estado geral e medições de cada verificação
+    """
+    agora = time.monotonic()
+    resultado = _cache['resultado']
+    if resultado is not None and agora < _cache['expira_em']:
+        return resultado
+
+    with _cache_lock:
+        agora = time.monotonic()
+        resultado = _cache['resultado']
+        if resultado is not None and agora < _cache['expira_em']:
+            return resultado
+
+        inicio = time.monotonic()
+        banco, escrita = _verificar_banco()
+        verificacoes = {
+            "banco": banco,
+            "lock_escrita": escrita,
+            "conexoes": _verificar_conexoes()
+        }
+
+        for nome, funcao in list(_verificacoes.items()):
+            try:
+                verificacoes[nome] = funcao()
+            except Exception as e:
+                logger.error("Erro na verificação de saúde '%s': %s", nome, e)
+                verificacoes[nome] = {"estado": INDISPONIVEL, "erro": str(e)}
+
+        resultado = {
+            "estado": _pior_estado(v["estado"] for v in verificacoes.values()),
+            "duracao_ms": round((time.monotonic() - inicio) * 1000, 2),
+            "verificacoes": verificacoes
+        }
+
+        if resultado["estado"] != SAUDAVEL:
+            logger.warning("Probe de prontidão: %s", resultado['estado'])
+
+        _cache['resultado'] = resultado
+        _cache['expira_em'] = time.monotonic() + Config.HEALTH_CACHE_SECONDS
+        return resultado
@@ -0,0 +1,156 @@
+"""
+Emergency Backend - Codificação JSON
+Provider JSON do Flask com encoder plugável (orjson quando disponível,
+json da stdlib como fallback) e serialização em streaming de respostas grandes
+"""
+
+import json
+import logging
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+ENCODERS_DISPONIVEIS = ['stdlib'] + (['orjson'] if orjson is not None else [])
+
+def _resolver_encoder(nome):
+    """Escolhe o encoder configurado, caindo para a stdlib se indisponível"""
+    if nome == 'auto':
+        return 'orjson' if orjson is not None else 'stdlib'
+
+    if nome not in ENCODERS_DISPONIVEIS:
+        logger.warning("Encoder JSON '%s' indisponível, usando stdlib", nome)
+        return 'stdlib'
+
+    return nome
+
+def _json_default(obj):
+    """
+    Tipos extras aceitos nas respostas
+
+    Primeiro os do provider padrão do Flask, com a mesma saída (datas em
+    HTTP-date, Decimal e UUID como str, dataclasses, __html__); depois bytes,
+    conjuntos e horários (isoformat)
+    """
+    try:
+        return DefaultJSONProvider.default(obj)
+    except TypeError:
+        pass
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode('utf-8')
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Objeto do tipo {type(obj).__name__} não é serializável em JSON")
+
+def codificar_json(obj, encoder='stdlib'):
+    """
+    Codifica um objeto em JSON compacto (UTF-8)
+
+    Args:
+        obj: Objeto a ser codificado
+        encoder (str): 'stdlib' ou 'orjson'
+
+    Returns:
+        bytes: Documento JSON
+    """
+    if encoder == 'orjson':
+        try:
+            # Datas passam pelo default, como no Flask (HTTP-date, não ISO)
+            return orjson.dumps(obj, default=_json_default,
+                                option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            # orjson só aceita chaves str; objetos atípicos ficam com a stdlib
+            pass
+
+    # ensure_ascii mantém a saída ASCII, o que torna o encode final trivial
+    return json.dumps(obj, separators=(',', ':'), default=_json_default).encode('ascii')
+
+class JSONProviderRapido(DefaultJSONProvider):
+    """
+    Provider JSON da aplicação
+
+    Gera respostas compactas, sem ordenar chaves, usando o encoder definido
+    em Config.JSON_ENCODER
+    """
+
+    sort_keys = False
+    compact = True
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.encoder = _resolver_encoder(app.config.get('JSON_ENCODER', 'auto'))
+        logger.info("Encoder JSON ativo: %s", self.encoder)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Chamadas com opções específicas (indent, sort_keys...) usam a stdlib
+            kwargs.setdefault('default', _json_default)
+            return json.dumps(obj, **kwargs)
+
+        return codificar_json(obj, self.encoder).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(codificar_json(obj, self.encoder),
+                                        mimetype=self.mimetype)
+
+def gerar_envelope_streaming(status, mensagem, dados, campo, tamanho_chunk=65536,
+                             encoder='stdlib'):
+    """
+    Gera o envelope {"status","mensagem","dados"} em pedaços
+
+    O campo grande de `dados` (ex: conteudo_html) é codificado em blocos de
+    `tamanho_chunk` caracteres, sem montar o documento inteiro em memória
+
+    Args:
+        status (str): Status da resposta
+        mensagem (str): Mensagem da resposta
+        dados (dict): Dados, contendo a string `campo`
+        campo (str): Nome do campo transmitido em pedaços
+        tamanho_chunk (int): Caracteres por pedaço
+        encoder (str): Encoder usado para as partes pequenas
+
+    Yields:
+        bytes: Pedaços do documento JSON
+    """
+    texto = dados[campo]
+    resto = {chave: valor for chave, valor in dados.items() if chave != campo}
+
+    cabecalho = codificar_json({"status": status, "mensagem": mensagem}, encoder)
+    dados_sem_campo = codificar_json(resto, encoder)
+
+    # {"status":..,"mensagem":.. + ,"dados":{...resto, + "campo":"
+    yield cabecalho[:-1] + b',"dados":' + dados_sem_campo[:-1]
+    yield (b',' if resto else b'') + codificar_json(campo, encoder) + b':"'
+
+    for inicio in range(0, len(texto), tamanho_chunk):
+        pedaco = codificar_json(texto[inicio:inicio + tamanho_chunk], encoder)
+        yield pedaco[1:-1]
+
+    yield b'"}}'
+
+def resposta_streaming(app, status, mensagem, dados, campo):
+    """
+    Cria uma Response Flask com o envelope transmitido em streaming
+
+    Args:
+        app: Aplicação Flask (usa JSON_STREAM_CHUNK_CHARS e o encoder ativo)
+        status (str): Status da resposta
+        mensagem (str): Mensagem da resposta
+        dados (dict): Dados da resposta
+        campo (str): Campo grande transmitido em pedaços
+
+    Returns:
+        Response: Resposta com corpo gerado sob demanda
+    """
+    encoder = getattr(app.json, 'encoder', 'stdlib')
+    corpo = gerar_envelope_streaming(status, mensagem, dados, campo,
+                                     app.config['JSON_STREAM_CHUNK_CHARS'], encoder)
+    return Response(corpo, mimetype='application/json')
@@ -0,0 +1,223 @@
+"""
+Emergency Backend - Pipeline de Logging
+Logs estruturados em JSON gravados por uma thread dedicada
+As threads de requisição apenas enfileiram registros (sem formatar e sem I/O)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+
+# Atributos padrão de LogRecord; qualquer outro veio de extra={...}
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_handler_fila = None
+
+class FormatadorJSON(logging.Formatter):
+    """Formata cada registro como uma linha JSON"""
+
+    def format(self, record):
+        registro = {
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))
+                  + '.%03d' % record.msecs,
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensagem": record.getMessage(),
+            "thread": record.threadName,
+            "pid": record.process
+        }
+
+        # Campos estruturados passados via extra={...}
+        for chave, valor in record.__dict__.items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith('_'):
+                registro[chave] = valor
+
+        if record.exc_info:
+            registro["excecao"] = self.formatException(record.exc_info)
+
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+class FiltroAmostragem(logging.Filter):
+    """
+    Amostra mensagens de sucesso (INFO e abaixo) por prefixo de logger
+
+    Avisos e erros nunca são descartados
+    """
+
+    def __init__(self, taxas):
+        super().__init__()
+        # Prefixos mais longos primeiro para que 'core.actions' vença 'core'
+        self.taxas = sorted(taxas.items(), key=lambda item: len(item[0]), reverse=True)
+        self._cache = {}
+
+    def _taxa(self, nome):
+        taxa = self._cache.get(nome)
+        if taxa is None:
+            taxa = 1.0
+            for prefixo, valor in self.taxas:
+                if nome == prefixo or nome.startswith(prefixo + '.'):
+                    taxa = valor
+                    break
+            self._cache[nome] = taxa
+        return taxa
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+
+        taxa = self._taxa(record.name)
+        return taxa >= 1.0 or random.random() < taxa
+
+class FiltroSegredos(logging.Filter):
+    """
+    Redige o parâmetro de query `token` (SSE e WebSocket) nos registros
+
+    O log de acesso do werkzeug grava a linha da requisição com a query
+    inteira; o token passa a aparecer como `token=[redigido]`. Só a mensagem
+    e os argumentos em texto são examinados, sem formatar o registro
+    """
+
+    _PADRAO = re.compile(r'([?&]token=)[^&\s"]*')
+    _SUBSTITUTO = r'\1[redigido]'
+
+    def _redigir(self, valor):
+        if isinstance(valor, str) and 'token=' in valor:
+            return self._PADRAO.sub(self._SUBSTITUTO, valor)
+        return valor
+
+    def filter(self, record):
+        record.msg = self._redigir(record.msg)
+        if isinstance(record.args, tuple):
+            record.args = tuple(self._redigir(arg) for arg in record.args)
+        return True
+
+class HandlerFilaNaoBloqueante(logging.handlers.QueueHandler):
+    """
+    QueueHandler que nunca bloqueia a thread chamadora
+
+    A formatação fica para a thread escritora; com a fila cheia o registro é
+    descartado e contabilizado em `descartados`
+    """
+
+    def __init__(self, fila):
+        super().__init__(fila)
+        self.descartados = 0
+        self._lock_descartes = threading.Lock()
+
+    def prepare(self, record):
+        # Fila em memória: não é preciso serializar nem formatar aqui
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_descartes:
+                self.descartados += 1
+
+class ListenerFila(logging.handlers.QueueListener):
+    """QueueListener cujo sentinela de parada espera espaço na fila limitada"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+def configurar_logging(config):
+    """
+    Configura o logging da aplicação uma única vez por processo
+
+    Registros passam pelos filtros de amostragem e de segredos e vão para
+    uma fila limitada; um QueueListener em thread própria formata e grava no
+    destino final
+
+    Args:
+        config: Classe de configuração (usa LOG_LEVEL, LOG_FORMATO,
+                LOG_FILA_TAMANHO e LOG_AMOSTRAGEM)
+
+    Returns:
+        QueueListener: Listener em execução
+    """
+    global _listener, _handler_fila
+
+    if _listener is not None:
+        return _listener
+
+    destino = logging.StreamHandler(sys.stderr)
+    if config.LOG_FORMATO == 'json':
+        destino.setFormatter(FormatadorJSON())
+    else:
+        destino.setFormatter(logging.Formatter(config.LOG_FORMAT))
+
+    _handler_fila = HandlerFilaNaoBloqueante(queue.Queue(maxsize=config.LOG_FILA_TAMANHO))
+    _handler_fila.addFilter(FiltroAmostragem(config.LOG_AMOSTRAGEM))
+    _handler_fila.addFilter(FiltroSegredos())
+
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(_handler_fila)
+    raiz.setLevel(config.LOG_LEVEL)
+
+    _listener = ListenerFila(_handler_fila.queue, destino, respect_handler_level=True)
+    _listener.start()
+
+    # Esvazia a fila antes de o processo terminar
+    atexit.register(encerrar_logging)
+
+    return _listener
+
+def encerrar_logging():
+    """
+    Para a thread escritora depois de gravar os registros pendentes
+
+    Registros emitidos depois disso (ex: outros handlers de atexit) passam a
+    ir direto para o destino, de forma síncrona
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+
+        raiz = logging.getLogger()
+        raiz.removeHandler(_handler_fila)
+        for destino in _listener.handlers:
+            for filtro in _handler_fila.filters:
+                destino.addFilter(filtro)
+            raiz.addHandler(destino)
+
+        _listener = None
+
+def _reiniciar_apos_fork():
+    """
+    Recria fila e thread escritora no processo filho
+
+    A thread do listener não existe após o fork e a fila herdada pode estar
+    com o lock interno preso; os registros pendentes do pai ficam com o pai
+    """
+    global _listener
+
+    if _listener is None:
+        return
+
+    _handler_fila.queue = queue.Queue(maxsize=_handler_fila.queue.maxsize)
+    _handler_fila.descartados = 0
+    _handler_fila._lock_descartes = threading.Lock()
+
+    _listener = ListenerFila(_handler_fila.queue, *_listener.handlers,
+                             respect_handler_level=True)
+    _listener.start()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
+
+def obter_registros_descartados():
+    """Retorna quantos registros foram descartados por fila cheia"""
+    return _handler_fila.descartados if _handler_fila else 0
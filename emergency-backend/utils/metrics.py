@@ -0,0 +1,102 @@
+"""
+Emergency Backend - Métricas
+Contadores, medidores e histogramas em memória, expostos em /metrics
+"""
+
+import bisect
+import os
+import threading
+
+# Limites padrão dos histogramas (ms para latências, bytes para tamanhos)
+BUCKETS_PADRAO = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_lock = threading.Lock()
+_contadores = {}
+_medidores = {}
+_histogramas = {}
+
+class _Histograma:
+    """Histograma cumulativo com buckets fixos"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.contagens = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.buckets, valor)] += 1
+        self.total += 1
+        self.soma += valor
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def exportar(self):
+        acumulado = 0
+        buckets = {}
+        for limite, contagem in zip(self.buckets, self.contagens):
+            acumulado += contagem
+            buckets[f"le_{limite}"] = acumulado
+        buckets["le_inf"] = self.total
+
+        return {
+            "total": self.total,
+            "soma": round(self.soma, 3),
+            "media": round(self.soma / self.total, 3) if self.total else 0.0,
+            "maximo": round(self.maximo, 3),
+            "buckets": buckets
+        }
+
+def incrementar(nome, valor=1):
+    """Soma `valor` ao contador `nome`"""
+    with _lock:
+        _contadores[nome] = _contadores.get(nome, 0) + valor
+
+def definir(nome, valor):
+    """Define o valor atual do medidor `nome`"""
+    with _lock:
+        _medidores[nome] = valor
+
+def observar(nome, valor, buckets=BUCKETS_PADRAO):
+    """Registra `valor` no histograma `nome`"""
+    with _lock:
+        histograma = _histogramas.get(nome)
+        if histograma is None:
+            histograma = _histogramas[nome] = _Histograma(buckets)
+        histograma.observar(valor)
+
+def obter_contador(nome):
+    """Retorna o valor atual de um contador (0 se nunca incrementado)"""
+    return _contadores.get(nome, 0)
+
+def obter_metricas():
+    """
+    Retorna um snapshot de todas as métricas
+
+    Returns:
+        dict: contadores, medidores e histogramas
+    """
+    with _lock:
+        return {
+            "contadores": dict(_contadores),
+            "medidores": dict(_medidores),
+            "histogramas": {nome: h.exportar() for nome, h in _histogramas.items()}
+        }
+
+def reiniciar_metricas():
+    """Zera todas as métricas (ex: processo filho após fork)"""
+    with _lock:
+        _contadores.clear()
+        _medidores.clear()
+        _histogramas.clear()
+
+def _reiniciar_apos_fork():
+    """Cada worker começa com métricas próprias e um lock novo"""
+    global _lock
+    _lock = threading.Lock()
+    reiniciar_metricas()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reiniciar_apos_fork)
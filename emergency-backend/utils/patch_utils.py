@@ -0,0 +1,89 @@
+"""
+Emergency Backend - Utilitários de Patch
+Hash de conteúdo e aplicação de patches (deltas) sobre o HTML de projetos
+"""
+
+import hashlib
+import re
+
+# Caracteres fora do BMP: ocupam duas unidades UTF-16 (um par substituto)
+_FORA_DO_BMP = re.compile('[\U00010000-\U0010FFFF]')
+
+class PatchInvalidoError(ValueError):
+    """Patch malformado ou incompatível com o conteúdo base"""
+
+def calcular_hash(conteudo):
+    """
+    Calcula o hash SHA-256 de um conteúdo
+
+    Args:
+        conteudo (str): Conteúdo HTML
+
+    Returns:
+        str: Hash em hexadecimal
+    """
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+def aplicar_patch(base, operacoes):
+    """
+    Aplica uma lista de operações de substituição sobre o conteúdo base
+
+    Cada operação é {"pos": int, "remover": int, "inserir": str}, com posições
+    relativas ao conteúdo base, em ordem crescente e sem sobreposição.
+    Posições e tamanhos são contados em unidades UTF-16, como os índices de
+    string do JavaScript: um emoji conta 2
+
+    Args:
+        base (str): Conteúdo original
+        operacoes (list): Operações do patch
+
+    Returns:
+        str: Conteúdo resultante
+
+    Raises:
+        PatchInvalidoError: Se o patch for malformado
+    """
+    if not isinstance(operacoes, list):
+        raise PatchInvalidoError("Patch deve ser uma lista de operações")
+
+    if base.isascii() or not _FORA_DO_BMP.search(base):
+        # Sem pares substitutos, unidades UTF-16 e caracteres coincidem
+        return _aplicar(operacoes, len(base), lambda inicio, fim: base[inicio:fim])
+
+    unidades = base.encode('utf-16-le')
+
+    def fatia(inicio, fim):
+        try:
+            return unidades[2 * inicio:2 * fim].decode('utf-16-le')
+        except UnicodeDecodeError:
+            raise PatchInvalidoError("Posição no meio de um par substituto UTF-16") from None
+
+    return _aplicar(operacoes, len(unidades) // 2, fatia)
+
+def _aplicar(operacoes, tamanho, fatia):
+    """Monta o resultado de um base de tamanho unidades, lido por fatia(inicio, fim)"""
+    partes = []
+    cursor = 0
+
+    for indice, operacao in enumerate(operacoes):
+        if not isinstance(operacao, dict):
+            raise PatchInvalidoError(f"Operação {indice} deve ser um objeto")
+
+        pos = operacao.get('pos')
+        remover = operacao.get('remover', 0)
+        inserir = operacao.get('inserir', '')
+
+        if isinstance(pos, bool) or not isinstance(pos, int) \
+                or isinstance(remover, bool) or not isinstance(remover, int) \
+                or not isinstance(inserir, str):
+            raise PatchInvalidoError(f"Operação {indice} com campos inválidos")
+
+        if pos < cursor or remover < 0 or pos + remover > tamanho:
+            raise PatchInvalidoError(f"Operação {indice} fora de ordem ou dos limites")
+
+        partes.append(fatia(cursor, pos))
+        partes.append(inserir)
+        cursor = pos + remover
+
+    partes.append(fatia(cursor, tamanho))
+    return ''.join(partes)
@@ -0,0 +1,131 @@
+"""
+Emergency Backend - Prazos de Requisição
+Cada requisição recebe um prazo (Config.PRAZOS_ROTAS) que vale dentro do
+SQLite: execute_query limita a espera pelo lock ao tempo restante e
+interrompe consultas que passem dele pelo progress handler
+
+Os modelos e ações tratam erros devolvendo None, então o prazo vencido fica
+registrado no contexto da requisição: as consultas seguintes falham na hora
+e a resposta é trocada por 503 (banco ocupado) ou 504 (consulta interrompida)
+"""
+
+import contextvars
+import time
+from config.settings import Config
+from utils import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Prazo vencido esperando o lock de escrita (ou a fila do escritor): o banco
+# está ocupado e a requisição pode ser repetida
+ESPERA_LOCK = 'espera_lock'
+
+# Prazo vencido durante a execução de uma consulta
+CONSULTA = 'consulta'
+
+class PrazoExcedidoError(Exception):
+    """O prazo da requisição venceu durante uma operação no banco"""
+
+    def __init__(self, tipo, rota=None):
+        super().__init__(f"Prazo da requisição excedido ({tipo})")
+        self.tipo = tipo
+        self.rota = rota
+        self.status = 503 if tipo == ESPERA_LOCK else 504
+
+class _Prazo:
+    """Prazo de uma requisição"""
+
+    __slots__ = ('rota', 'limite', 'erro')
+
+    def __init__(self, rota, limite):
+        self.rota = rota
+        # time.monotonic() em que o prazo vence
+        self.limite = limite
+        # PrazoExcedidoError depois que o prazo venceu
+        self.erro = None
+
+_atual = contextvars.ContextVar('prazo_requisicao', default=None)
+
+def prazo_da_rota(rota):
+    """Prazo em segundos de uma rota (None: sem prazo)"""
+    return Config.PRAZOS_ROTAS.get(rota, Config.PRAZO_PADRAO_SEGUNDOS)
+
+def iniciar(rota, segundos):
+    """
+    Define o prazo da requisição em andamento
+
+    Args:
+        rota (str): Identificador da rota (endpoint do Flask)
+        segundos (float): Duração do prazo; None ou <= 0 para nenhum
+    """
+    if segundos is None or segundos <= 0:
+        _atual.set(None)
+        return
+    _atual.set(_Prazo(rota, time.monotonic() + segundos))
+
+def limite():
+    """
+    Momento (monotonic) em que o prazo atual vence
+
+    Returns:
+        float: Limite ou None sem prazo
+
+    Raises:
+        PrazoExcedidoError: Se o prazo já venceu
+    """
+    prazo = _atual.get()
+    if prazo is None:
+        return None
+    if prazo.erro is not None:
+        raise prazo.erro
+    if time.monotonic() >= prazo.limite:
+        raise expirar(CONSULTA)
+    return prazo.limite
+
+def vencido():
+    """
+    Indica se o prazo da requisição atual já venceu (sem levantar erro)
+
+    Usado como progress handler das conexões: retornar True interrompe a
+    consulta em execução
+    """
+    prazo = _atual.get()
+    return prazo is not None and time.monotonic() >= prazo.limite
+
+def expirar(tipo):
+    """
+    Registra o vencimento do prazo da requisição atual
+
+    Só o primeiro vencimento é contado nas métricas; os seguintes devolvem
+    o mesmo erro
+
+    Args:
+        tipo (str): ESPERA_LOCK ou CONSULTA
+
+    Returns:
+        PrazoExcedidoError: Erro para quem chamou levantar
+    """
+    prazo = _atual.get()
+    if prazo is None:
+        return PrazoExcedidoError(tipo)
+    if prazo.erro is None:
+        prazo.erro = PrazoExcedidoError(tipo, prazo.rota)
+        metrics.incrementar(f'prazos.cancelamentos.{tipo}')
+        metrics.incrementar(f'prazos.cancelamentos.{prazo.rota}')
+        logger.warning("Prazo da rota %s excedido (%s)", prazo.rota, tipo,
+                       extra={'rota': prazo.rota, 'tipo': tipo})
+    return prazo.erro
+
+def finalizar():
+    """
+    Encerra o prazo da requisição atual
+
+    Returns:
+        PrazoExcedidoError: O erro se o prazo venceu, senão None
+    """
+    prazo = _atual.get()
+    if prazo is None:
+        return None
+    _atual.set(None)
+    return prazo.erro
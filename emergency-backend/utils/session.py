@@ -5,10 +5,16 @@ Valida sessão ativa com token recebido nos headers
 
 from .token_utils import verificar_token, extrair_info_token
 from database.models import Usuario
+from config.settings import Config
+from utils.cache import criar_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Usuários com ultima_atividade gravada no intervalo atual (com o backend
+# compartilhado, vale entre todos os workers)
+_atividade_registrada = criar_cache('atividade')
+
 def validar_sessao(usuario_id, token):
     """
     Valida se uma sessão está ativa e válida
@@ -25,28 +31,29 @@ def validar_sessao(usuario_id, token):
         token_usuario_id = verificar_token(token)
         
         if not token_usuario_id:
-            logger.warning(f"Token inválido na validação de sessão para usuário {usuario_id}")
+            logger.warning("Token inválido na validação de sessão para usuário %s", usuario_id)
             return False
         
         # Verificar se o usuario_id do token corresponde ao solicitado
         if token_usuario_id != usuario_id:
-            logger.warning(f"Mismatch de usuário: token={token_usuario_id}, solicitado={usuario_id}")
+            logger.warning("Mismatch de usuário: token=%s, solicitado=%s", token_usuario_id, usuario_id)
             return False
         
         # Verificar se o usuário ainda existe no banco
         usuario = Usuario.buscar_por_id(usuario_id)
         if not usuario:
-            logger.warning(f"Usuário {usuario_id} não encontrado durante validação de sessão")
+            logger.warning("Usuário %s não encontrado durante validação de sessão", usuario_id)
             return False
         
-        # Atualizar última atividade
-        Usuario.atualizar_ultima_atividade(usuario_id)
+        # Atualizar última atividade (no máximo uma vez por intervalo)
+        if _atividade_registrada.adicionar(usuario_id, True, Config.SESSAO_ATIVIDADE_INTERVALO):
+            Usuario.atualizar_ultima_atividade(usuario_id)
         
-        logger.info(f"Sessão validada com sucesso para usuário {usuario_id}")
+        logger.info("Sessão validada com sucesso para usuário %s", usuario_id)
         return True
         
     except Exception as e:
-        logger.error(f"Erro ao validar sessão: {e}")
+        logger.error("Erro ao validar sessão: %s", e)
         return False
 
 def obter_info_sessao(token):
@@ -98,7 +105,7 @@ def obter_info_sessao(token):
         return info_sessao
         
     except Exception as e:
-        logger.error(f"Erro ao obter informações da sessão: {e}")
+        logger.error("Erro ao obter informações da sessão: %s", e)
         return None
 
 def invalidar_sessao(usuario_id):
@@ -118,11 +125,11 @@ def invalidar_sessao(usuario_id):
         # Atualizar última atividade
         Usuario.atualizar_ultima_atividade(usuario_id)
         
-        logger.info(f"Logout registrado para usuário {usuario_id}")
+        logger.info("Logout registrado para usuário %s", usuario_id)
         return True
         
     except Exception as e:
-        logger.error(f"Erro ao invalidar sessão: {e}")
+        logger.error("Erro ao invalidar sessão: %s", e)
         return False
 
 def sessao_ativa(token):
@@ -144,7 +151,7 @@ def sessao_ativa(token):
         return validar_sessao(usuario_id, token)
         
     except Exception as e:
-        logger.error(f"Erro ao verificar sessão ativa: {e}")
+        logger.error("Erro ao verificar sessão ativa: %s", e)
         return False
 
 def obter_usuario_da_sessao(token):
@@ -169,5 +176,5 @@ def obter_usuario_da_sessao(token):
         return Usuario.buscar_por_id(usuario_id)
         
     except Exception as e:
-        logger.error(f"Erro ao obter usuário da sessão: {e}")
+        logger.error("Erro ao obter usuário da sessão: %s", e)
         return None
\ No newline at end of file
@@ -9,10 +9,18 @@ import time
 import json
 import base64
 from config.settings import Config
+from utils.cache import criar_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Tokens já verificados -> [usuario_id, expiracao]. Sempre local: o resultado não muda até
+# a expiração e verificar de novo custa menos que ler o arquivo compartilhado
+_tokens_verificados = criar_cache('tokens', compartilhado=False)
+
+# Tempo máximo (segundos) de um token no cache, mesmo que expire depois
+_TTL_TOKEN_VERIFICADO = 300
+
 def gerar_token(usuario_id):
     """
     Gera um token de autenticação baseado no ID do usuário
@@ -55,11 +63,11 @@ def gerar_token(usuario_id):
         token_json = json.dumps(token_final)
         token_base64 = base64.b64encode(token_json.encode('utf-8')).decode('utf-8')
         
-        logger.info(f"Token gerado para usuário {usuario_id}, expira em {expiracao}")
+        logger.info("Token gerado para usuário %s, expira em %s", usuario_id, expiracao)
         return token_base64
         
     except Exception as e:
-        logger.error(f"Erro ao gerar token: {e}")
+        logger.error("Erro ao gerar token: %s", e)
         return None
 
 def verificar_token(token):
@@ -73,6 +81,15 @@ def verificar_token(token):
         int or None: ID do usuário se válido, None caso contrário
     """
     try:
+        verificado = _tokens_verificados.obter(token)
+        if verificado is not None:
+            usuario_id, expiracao = verificado
+            if int(time.time()) <= expiracao:
+                return usuario_id
+            _tokens_verificados.remover(token)
+            logger.warning("Token expirado para usuário %s", usuario_id)
+            return None
+        
         # Decodificar base64
         token_json = base64.b64decode(token.encode('utf-8')).decode('utf-8')
         token_data = json.loads(token_json)
@@ -92,7 +109,7 @@ def verificar_token(token):
         # Verificar expiração
         timestamp_atual = int(time.time())
         if timestamp_atual > expiracao:
-            logger.warning(f"Token expirado para usuário {usuario_id}")
+            logger.warning("Token expirado para usuário %s", usuario_id)
             return None
         
         # Verificar hash
@@ -102,14 +119,20 @@ def verificar_token(token):
         ).hexdigest()
         
         if hash_recebido != hash_esperado:
-            logger.warning(f"Token com hash inválido para usuário {usuario_id}")
+            logger.warning("Token com hash inválido para usuário %s", usuario_id)
             return None
         
-        logger.info(f"Token válido verificado para usuário {usuario_id}")
+        # No último segundo de validade não há o que guardar (ttl 0 não expira)
+        restante = expiracao - timestamp_atual
+        if restante > 0:
+            _tokens_verificados.definir(token, [usuario_id, expiracao],
+                                        min(restante, _TTL_TOKEN_VERIFICADO))
+        
+        logger.info("Token válido verificado para usuário %s", usuario_id)
         return usuario_id
         
     except Exception as e:
-        logger.error(f"Erro ao verificar token: {e}")
+        logger.error("Erro ao verificar token: %s", e)
         return None
 
 def extrair_info_token(token):
@@ -141,7 +164,7 @@ def extrair_info_token(token):
         return data
         
     except Exception as e:
-        logger.error(f"Erro ao extrair informações do token: {e}")
+        logger.error("Erro ao extrair informações do token: %s", e)
         return None
 
 def token_expirado(token):
@@ -164,7 +187,7 @@ def token_expirado(token):
         return timestamp_atual > info['expiracao']
         
     except Exception as e:
-        logger.error(f"Erro ao verificar expiração do token: {e}")
+        logger.error("Erro ao verificar expiração do token: %s", e)
         return True
 
 def renovar_token(token):
@@ -187,7 +210,7 @@ def renovar_token(token):
         return gerar_token(usuario_id)
         
     except Exception as e:
-        logger.error(f"Erro ao renovar token: {e}")
+        logger.error("Erro ao renovar token: %s", e)
         return None
 
 def gerar_token_temporario(usuario_id, duracao_minutos=60):
@@ -225,9 +248,9 @@ def gerar_token_temporario(usuario_id, duracao_minutos=60):
         token_json = json.dumps(token_final)
         token_base64 = base64.b64encode(token_json.encode('utf-8')).decode('utf-8')
         
-        logger.info(f"Token temporário gerado para usuário {usuario_id}, duração: {duracao_minutos}min")
+        logger.info("Token temporário gerado para usuário %s, duração: %smin", usuario_id, duracao_minutos)
         return token_base64
         
     except Exception as e:
-        logger.error(f"Erro ao gerar token temporário: {e}")
+        logger.error("Erro ao gerar token temporário: %s", e)
         return None
\ No newline at end of file